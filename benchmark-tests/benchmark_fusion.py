@@ -0,0 +1,65 @@
+import random
+import time
+import uuid
+from memas.corpus.score_fusion import ScoreFusion, SearchCandidate
+
+
+WORDS = ["memory", "agent", "sunshine", "weather", "umbrella", "phone", "grip", "python", "corpus", "vector",
+         "search", "recall", "memorize", "chat", "message", "sentence", "document", "is", "the", "a", "great"]
+
+
+def make_sentence() -> str:
+    return " ".join(random.choices(WORDS, k=random.randint(6, 20))).capitalize() + "."
+
+
+def make_hits(num_chunks: int, num_vectors: int, chunk_len: int = 1536):
+    corpus_id = uuid.uuid4()
+    doc_results, sentences = [], []
+    for _ in range(num_chunks):
+        document_id = uuid.uuid4()
+        text, offsets = "", []
+        while len(text) < chunk_len:
+            sentence = make_sentence()
+            offsets.append((len(text), len(text) + len(sentence)))
+            text += sentence + " "
+        doc_results.append(SearchCandidate(random.uniform(1, 10), corpus_id, document_id, text, 0, len(text)))
+        sentences.extend([(document_id, text[start:end], start, end) for start, end in offsets])
+
+    vec_results = []
+    for _ in range(num_vectors):
+        # Roughly half of the vector hits come from the retrieved chunks
+        if random.random() < 0.5:
+            document_id, sentence, start, end = random.choice(sentences)
+        else:
+            document_id, sentence = uuid.uuid4(), make_sentence()
+            start, end = 0, len(sentence)
+        vec_results.append(SearchCandidate(random.uniform(0, 2), corpus_id, document_id, sentence, start, end))
+    return doc_results, vec_results
+
+
+def substring_combine(doc_results: list[SearchCandidate], vec_results: list[SearchCandidate]):
+    """The previous O(D*V*L) fusion, matching every vector hit against every chunk by substring containment
+    """
+    duplicate_vec_indicies = []
+    for doc_result in doc_results:
+        for vec_index, vec_result in enumerate(vec_results):
+            if vec_result.text in doc_result.text:
+                duplicate_vec_indicies.append(vec_index)
+    return [x for j, x in enumerate(vec_results) if j not in duplicate_vec_indicies]
+
+
+def benchmark(fn, doc_results, vec_results, repeat: int = 5) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(doc_results, vec_results)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    print(f"{'chunks':>8} {'vectors':>8} {'substring (ms)':>16} {'id/offset join (ms)':>20}")
+    for num_chunks, num_vectors in [(20, 100), (20, 500), (100, 500), (100, 2000), (500, 5000)]:
+        doc_results, vec_results = make_hits(num_chunks, num_vectors)
+        substring_ms = benchmark(substring_combine, doc_results, vec_results)
+        join_ms = benchmark(ScoreFusion().fuse, doc_results, vec_results)
+        print(f"{num_chunks:>8} {num_vectors:>8} {substring_ms:>16.2f} {join_ms:>20.2f}")
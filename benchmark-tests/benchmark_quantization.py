@@ -0,0 +1,69 @@
+"""
+Models the recall@k and searched bytes per sentence of quantized embedding storage, without needing a milvus
+deployment. Int8 scalar quantization follows IVF_SQ8, which encodes every dimension within its own min/max range in
+8 bits, while float16 is shown for reference since the current milvus client has no float16 vectors. Only the size of
+the searched codes is modeled, not whether milvus keeps the raw embeddings loaded next to them.
+"""
+import numpy as np
+
+
+DIMENSION = 512
+NUM_VECTORS = 50000
+NUM_QUERIES = 200
+K = 10
+
+
+def make_embeddings(num_vectors: int, num_topics: int = 200, rng=None) -> np.ndarray:
+    # Sentence embeddings cluster by topic, which makes neighbors harder to tell apart than uniform noise
+    topics = rng.normal(size=(num_topics, DIMENSION))
+    vectors = topics[rng.integers(num_topics, size=num_vectors)] + 0.6 * rng.normal(size=(num_vectors, DIMENSION))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def quantize_sq8(vectors: np.ndarray) -> np.ndarray:
+    low, high = vectors.min(axis=0), vectors.max(axis=0)
+    scale = (high - low) / 255
+    codes = np.round((vectors - low) / scale).astype(np.uint8)
+    # Distances are computed on the decoded vectors, like the index does
+    return codes.astype(np.float32) * scale + low
+
+
+def squared_l2(queries: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    return (queries ** 2).sum(axis=1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(axis=1)[None, :]
+
+
+def top_k(distances: np.ndarray, k: int) -> np.ndarray:
+    best = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(best, np.argsort(np.take_along_axis(distances, best, axis=1), axis=1), axis=1)
+
+
+def recall_at_k(stored: np.ndarray, vectors: np.ndarray, queries: np.ndarray, exact: np.ndarray,
+                oversample: int) -> float:
+    candidates = top_k(squared_l2(queries, stored), K * oversample)
+    if oversample > 1:
+        # Exact rerank of the oversampled candidates with the full precision vectors
+        exact_distances = ((vectors[candidates] - queries[:, None, :]) ** 2).sum(axis=2)
+        candidates = np.take_along_axis(candidates, np.argsort(exact_distances, axis=1)[:, :K], axis=1)
+    found = sum(len(set(x) & set(y)) for x, y in zip(candidates[:, :K], exact))
+    return found / exact.size
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    vectors = make_embeddings(NUM_VECTORS, rng=rng)
+    queries = make_embeddings(NUM_QUERIES, rng=rng)
+    exact = top_k(squared_l2(queries, vectors), K)
+
+    storages = {
+        "float32": (vectors, 4),
+        "float16": (vectors.astype(np.float16).astype(np.float32), 2),
+        "int8 (IVF_SQ8)": (quantize_sq8(vectors), 1),
+    }
+    print(f"{NUM_VECTORS} vectors of {DIMENSION} dimensions, recall@{K} over {NUM_QUERIES} queries")
+    print(f"{'storage':>16} {'bytes/vector':>13} {'sentences/GB':>13} {'oversample':>11} {'recall':>7}")
+    for name, (stored, bytes_per_dim) in storages.items():
+        bytes_per_vector = DIMENSION * bytes_per_dim
+        for oversample in [1, 2, 4]:
+            recall = recall_at_k(stored, vectors, queries, exact, oversample)
+            print(f"{name:>16} {bytes_per_vector:>13} {2 ** 30 // bytes_per_vector:>13} {oversample:>11} "
+                  f"{recall:>7.3f}")
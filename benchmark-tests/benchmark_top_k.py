@@ -0,0 +1,62 @@
+import random
+import time
+import uuid
+import numpy as np
+from memas.corpus.score_fusion import SearchCandidate, interleave, top_k
+
+
+def make_candidates(num_candidates: int) -> list[SearchCandidate]:
+    corpus_id = uuid.uuid4()
+    return [SearchCandidate(random.uniform(0, 2), corpus_id, uuid.uuid4(), "text") for _ in range(num_candidates)]
+
+
+def sort_then_round_robin(backend_results: list[list[SearchCandidate]], result_limit: int):
+    """The previous merge, fully sorting every backend's candidates before interleaving them
+    """
+    sorted_results_matrix = [sorted(x, key=lambda c: c.score, reverse=True) for x in backend_results]
+    combined_results = []
+    for j in range(max([len(x) for x in sorted_results_matrix])):
+        for i in range(len(sorted_results_matrix)):
+            if j >= len(sorted_results_matrix[i]) or len(combined_results) >= result_limit:
+                break
+            combined_results.append(sorted_results_matrix[i][j])
+        if len(combined_results) >= result_limit:
+            break
+    return combined_results
+
+
+def argpartition_then_round_robin(backend_results: list[list[SearchCandidate]], result_limit: int):
+    """Partitions the scores with numpy, then only sorts the best result_limit of each backend
+    """
+    matrix = []
+    for candidates in backend_results:
+        scores = -np.fromiter((x.score for x in candidates), dtype=np.float64, count=len(candidates))
+        best = np.argpartition(scores, result_limit - 1)[:result_limit]
+        matrix.append([candidates[i] for i in best[np.argsort(scores[best], kind="stable")]])
+    return interleave(matrix, result_limit)
+
+
+def heap_merge(backend_results: list[list[SearchCandidate]], result_limit: int):
+    return interleave([top_k(x, result_limit) for x in backend_results], result_limit)
+
+
+def benchmark(fn, backend_results, result_limit: int, repeat: int = 10) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(backend_results, result_limit)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    result_limit = 5
+    print(f"{'backends':>8} {'candidates':>10} {'full sort (ms)':>15} {'argpartition (ms)':>18} {'heap (ms)':>10}")
+    for num_backends, num_candidates in [(1, 120), (2, 120), (2, 1000), (2, 10000), (4, 50000)]:
+        backend_results = [make_candidates(num_candidates) for _ in range(num_backends)]
+        expected = sort_then_round_robin(backend_results, result_limit)
+        assert heap_merge(backend_results, result_limit) == expected
+
+        sort_ms = benchmark(sort_then_round_robin, backend_results, result_limit)
+        partition_ms = benchmark(argpartition_then_round_robin, backend_results, result_limit)
+        heap_ms = benchmark(heap_merge, backend_results, result_limit)
+        print(f"{num_backends:>8} {num_candidates:>10} {sort_ms:>15.3f} {partition_ms:>18.3f} {heap_ms:>10.3f}")
@@ -21,6 +21,17 @@ def test_insert_and_get():
     assert metadata.get_document_citation(corpus_id, document_id) == citation
 
 
+def test_insert_batch():
+    corpus_id = uuid.uuid4()
+    # More documents than a single batch holds
+    documents = [(uuid.uuid4(), 1, Citation(f"uri{i}", f"source{i}", "", f"doc{i}")) for i in range(120)]
+
+    assert metadata.insert_document_metadata_batch(corpus_id, documents)
+    citations = metadata.get_document_citations([(corpus_id, document_id) for document_id, _, _ in documents])
+    assert [citations[(corpus_id, document_id)] for document_id, _, citation in documents] == \
+        [citation for _, _, citation in documents]
+
+
 def test_delete_corpus():
     corpus_id = uuid.uuid4()
     document_id = uuid.uuid4()
@@ -31,3 +42,37 @@ def test_delete_corpus():
 
     with pytest.raises(DocumentMetadataNotFound):
         metadata.get_document_citation(corpus_id, document_id)
+
+
+def test_get_document_citations():
+    corpus_id1 = uuid.uuid4()
+    corpus_id2 = uuid.uuid4()
+    document_id1 = uuid.uuid4()
+    document_id2 = uuid.uuid4()
+    document_id3 = uuid.uuid4()
+
+    citation1 = Citation("google.com", "test google", "just a simple test", "test1")
+    citation2 = Citation("bing.com", "test bing", "just another test", "test2")
+    citation3 = Citation("duckduckgo.com", "test ddg", "yet another test", "test3")
+    metadata.insert_document_metadata(corpus_id1, document_id1, 1, citation1)
+    metadata.insert_document_metadata(corpus_id1, document_id2, 1, citation2)
+    metadata.insert_document_metadata(corpus_id2, document_id3, 1, citation3)
+
+    keys = [(corpus_id1, document_id1), (corpus_id2, document_id3), (corpus_id1, document_id2),
+            (corpus_id1, document_id1)]
+    assert metadata.get_document_citations(keys) == {
+        (corpus_id1, document_id1): citation1,
+        (corpus_id1, document_id2): citation2,
+        (corpus_id2, document_id3): citation3,
+    }
+
+
+def test_get_document_citations_not_found():
+    corpus_id = uuid.uuid4()
+    document_id = uuid.uuid4()
+
+    citation = Citation("google.com", "test google", "just a simple test", "test")
+    metadata.insert_document_metadata(corpus_id, document_id, 1, citation)
+
+    with pytest.raises(DocumentMetadataNotFound):
+        metadata.get_document_citations([(corpus_id, document_id), (corpus_id, uuid.uuid4())])
@@ -2,7 +2,7 @@ import pytest
 from elasticsearch import Elasticsearch
 from memas.context_manager import ContextManager
 from memas.storage_driver import corpus_doc_store
-from memas.interface.storage_driver import DocumentEntity
+from memas.interface.storage_driver import DocumentEntity, make_chunk_id
 import uuid
 import time
 
@@ -44,3 +44,23 @@ def test_save_then_search(ctx: ContextManager):
 
     # check that the score is reasonable
     assert result[0][0] > 0
+
+
+def test_get_chunks(ctx: ContextManager):
+    doc_store = corpus_doc_store.ESDocumentStore(ctx.es)
+    doc_store.init()
+
+    corpus_id = uuid.uuid4()
+    document_id = uuid.uuid4()
+    chunk_id0 = make_chunk_id(document_id, 0)
+    chunk_id1 = make_chunk_id(document_id, 1)
+    assert doc_store.save_documents([
+        (chunk_id0, DocumentEntity(corpus_id, document_id, "test", "The sun is high."), 0, 16),
+        (chunk_id1, DocumentEntity(corpus_id, document_id, "test", "California sunshine is great."), 17, 46),
+    ])
+
+    # Chunks are read by id, so they don't need to be searchable yet
+    chunks = doc_store.get_chunks([chunk_id1, make_chunk_id(document_id, 2)])
+    assert list(chunks.keys()) == [chunk_id1]
+    chunk, start, end = chunks[chunk_id1]
+    assert (chunk.document, start, end) == ("California sunshine is great.", 17, 46)
@@ -0,0 +1,34 @@
+import pytest
+import uuid
+from memas.interface.corpus import Citation
+from memas.interface.exceptions import IngestionJobDoesNotExistException
+from memas.interface.storage_driver import IngestionStatus
+from memas.storage_driver.ingestion_jobs import IngestionJobStoreImpl
+
+
+ingestion_jobs = IngestionJobStoreImpl()
+
+
+def test_init():
+    ingestion_jobs.init()
+
+
+def test_create_and_update_job():
+    citation = Citation("google.com", "test google", "just a simple test", "test")
+    ingestion_id = ingestion_jobs.create_job("ns:corpus", "some document", citation)
+
+    job = ingestion_jobs.get_job(ingestion_id)
+    assert job.corpus_pathname == "ns:corpus"
+    assert job.document == "some document"
+    assert job.citation == citation
+    assert job.status == IngestionStatus.PENDING
+
+    ingestion_jobs.update_status(ingestion_id, IngestionStatus.FAILED, "some error")
+    job = ingestion_jobs.get_job(ingestion_id)
+    assert job.status == IngestionStatus.FAILED
+    assert job.error == "some error"
+
+
+def test_get_missing_job():
+    with pytest.raises(IngestionJobDoesNotExistException):
+        ingestion_jobs.get_job(uuid.uuid4())
@@ -1,7 +1,9 @@
 import pytest
 from unittest import mock
 import memas.celery_worker
+from memas.interface.corpus import Citation
 from memas.interface.exceptions import NamespaceDoesNotExistException
+from memas.interface.storage_driver import IngestionStatus
 
 
 @mock.patch("memas.celery_worker.time.sleep")
@@ -13,3 +15,22 @@ def test_delete_corpus(mock_sleep, ctx):
 
     with pytest.raises(NamespaceDoesNotExistException):
         ctx.memas_metadata.get_corpus_ids_by_name(corpus_pathname)
+
+
+def test_ingest(ctx):
+    ctx.memas_metadata.create_namespace("celery_ingest")
+    corpus_pathname = "celery_ingest:corpus1"
+    ctx.memas_metadata.create_conversation_corpus(corpus_pathname)
+
+    ingestion_id = ctx.ingestion_jobs.create_job(corpus_pathname, "What's MeMaS", Citation("", "", "", "doc"))
+    memas.celery_worker.ingest(ingestion_id)
+    assert ctx.ingestion_jobs.get_job(ingestion_id).status == IngestionStatus.SUCCEEDED
+
+
+def test_ingest_missing_corpus(ctx):
+    ingestion_id = ctx.ingestion_jobs.create_job("celery_ingest:missing", "What's MeMaS", Citation("", "", "", "doc"))
+    memas.celery_worker.ingest(ingestion_id)
+
+    job = ctx.ingestion_jobs.get_job(ingestion_id)
+    assert job.status == IngestionStatus.FAILED
+    assert "NamespaceDoesNotExistException" in job.error
@@ -1,4 +1,6 @@
 import time
+import uuid
+from unittest import mock
 
 
 def test_memorize_then_recall(test_client):
@@ -20,3 +22,71 @@ def test_memorize_then_recall(test_client):
     assert resp4.status_code == 200
     assert len(resp4.json) == 1
     assert resp4.json[0]["document"] == "What's MeMaS"
+
+
+def test_recall_result_limit(test_client):
+    namespace_pathname = "recall_limit"
+    corpus_pathname = namespace_pathname + ":recall_limit_1"
+    test_client.post("/cp/user", json={"namespace_pathname": namespace_pathname})
+    test_client.post("/cp/corpus", json={"corpus_pathname": corpus_pathname, "namespace_pathname": namespace_pathname})
+
+    documents = [{"document": f"The weather is great on day {i}.", "citation": {}} for i in range(5)]
+    resp = test_client.post("/dp/memorize_batch", json={"corpus_pathname": corpus_pathname, "documents": documents})
+    assert resp.status_code == 200
+
+    time.sleep(1)
+
+    resp = test_client.get("/dp/recall", json={"namespace_pathname": namespace_pathname, "clue": "weather",
+                                               "result_limit": 2})
+    assert resp.status_code == 200
+    assert len(resp.json) == 2
+
+    resp = test_client.get("/dp/recall", json={"namespace_pathname": namespace_pathname, "clue": "weather",
+                                               "result_limit": 0})
+    assert resp.status_code == 400
+
+
+def test_memorize_batch_then_recall(test_client):
+    namespace_pathname = "memorize_batch"
+    corpus_pathname = namespace_pathname + ":memorize_batch_1"
+    test_client.post("/cp/user", json={"namespace_pathname": namespace_pathname})
+    test_client.post("/cp/corpus", json={"corpus_pathname": corpus_pathname, "namespace_pathname": namespace_pathname})
+
+    documents = [
+        {"document": "The weather is great today, but I worry that tomorrow it won't be.",
+         "citation": {"document_name": "weather"}},
+        {"citation": {"document_name": "missing document"}},
+        {"document": "I picked up my phone and then dropped it again.", "citation": {"document_name": "phone"}},
+    ]
+    resp = test_client.post("/dp/memorize_batch", json={"corpus_pathname": corpus_pathname, "documents": documents})
+    assert resp.status_code == 200
+    assert not resp.json["success"]
+    assert [result["success"] for result in resp.json["results"]] == [True, False, True]
+    assert "error" in resp.json["results"][1]
+
+    time.sleep(1)
+
+    resp = test_client.get("/dp/recall", json={"namespace_pathname": namespace_pathname, "clue": "weather"})
+    assert resp.status_code == 200
+    assert resp.json[0]["citation"]["document_name"] == "weather"
+
+
+def test_async_memorize(test_client):
+    namespace_pathname = "async_memorize"
+    corpus_pathname = namespace_pathname + ":async_memorize_1"
+    test_client.post("/cp/user", json={"namespace_pathname": namespace_pathname})
+    test_client.post("/cp/corpus", json={"corpus_pathname": corpus_pathname, "namespace_pathname": namespace_pathname})
+
+    with mock.patch("memas.celery_worker.ingest.delay") as delay:
+        resp = test_client.post("/dp/memorize", json={"corpus_pathname": corpus_pathname, "document": "What's MeMaS",
+                                                      "citation": {}, "async": True})
+    assert resp.status_code == 200
+    ingestion_id = resp.json["ingestion_id"]
+    delay.assert_called_once_with(uuid.UUID(ingestion_id))
+
+    resp = test_client.get(f"/dp/ingestion/{ingestion_id}")
+    assert resp.status_code == 200
+    assert resp.json["status"] == "pending"
+
+    resp = test_client.get(f"/dp/ingestion/{uuid.uuid4().hex}")
+    assert resp.status_code == 404
@@ -1,12 +1,17 @@
 import sys
+import threading
 import traceback
+import click
 import yaml
 from celery import Celery, Task
 from flask import Flask
-from memas.context_manager import read_env, ContextManager
+from memas.context_manager import read_env, ContextManager, Role
 from memas.controlplane import controlplane
 from memas.dataplane import dataplane
+from memas.encoder import projection_encoder
+from memas.encoder.universal_sentence_encoder import USETextEncoder
 from memas.interface.exceptions import MemasException
+from memas.metrics import Stopwatch
 
 
 def celery_init_app(app: Flask) -> Celery:
@@ -22,19 +27,34 @@ def celery_init_app(app: Flask) -> Celery:
     return celery_app
 
 
-def create_app(*, config_filename=None, first_init=False):
+def create_app(*, config_filename=None, first_init=False, role: str = None):
+    stopwatch = Stopwatch()
     app = Flask(__name__)
 
     if config_filename is None:
         config_filename = read_env("MEMAS_CONF_FILE")
+    if role is None:
+        role = read_env("MEMAS_ROLE", Role.WEB.value)
     app.config.from_file(config_filename, load=yaml.safe_load)
-    app.ctx: ContextManager = ContextManager(app.config)
+    stopwatch.lap("config")
+
+    # First time initialization only creates tables and collections, so it never needs the encoder
+    app.ctx: ContextManager = ContextManager(app.config, Role.MAINTENANCE if first_init else Role(role))
     if first_init:
         app.ctx.first_init()
         app.logger.info("Finished first time initialization")
         sys.exit(0)
+    stopwatch.lap("context")
+
+    app.ctx.init(stopwatch)
 
-    app.ctx.init()
+    # Readiness is only reported once warm up completes
+    if not app.ctx.consts.warmup_enabled:
+        app.ctx.ready.set()
+    elif app.ctx.consts.warmup_background:
+        threading.Thread(target=app.ctx.warm_up, name="memas-warmup", daemon=True).start()
+    else:
+        app.ctx.warm_up(stopwatch)
 
     @app.errorhandler(MemasException)
     def handle_memas_exception(e: MemasException):
@@ -47,6 +67,33 @@ def create_app(*, config_filename=None, first_init=False):
     app.register_blueprint(dataplane)
     app.register_blueprint(controlplane)
 
-    app.logger.info("Finished initialization")
+    @app.cli.command("rebuild-vector-index")
+    @click.option("--allow-downtime", is_flag=True,
+                  help="Migrate a collection created before aliases were used, which briefly fails searches.")
+    def rebuild_vector_index(allow_downtime: bool):
+        """Rebuild the vector collection with the configured index, while still serving searches."""
+        new_collection = app.ctx.corpus_vec.rebuild_index(allow_downtime)
+        app.logger.info(f"Rebuilt vector index [collection={new_collection}]")
+
+    @app.cli.command("fit-projection")
+    @click.argument("sample_file")
+    @click.option("--method", type=click.Choice(projection_encoder.PROJECTION_METHODS), default="pca")
+    @click.option("--dimension", type=int, default=128)
+    @click.option("--projection-version", required=True, help="Letters, digits and underscores only.")
+    @click.option("--output", default=None, help="Defaults to a file under encoder/projections.")
+    def fit_projection(sample_file: str, method: str, dimension: int, projection_version: str, output: str):
+        """Fit an embedding projection from SAMPLE_FILE, holding one sample sentence per line."""
+        with open(sample_file, encoding="utf-8") as f:
+            sentences = [line.strip() for line in f if line.strip()]
+        encoder = USETextEncoder()
+        encoder.init()
+        projection = projection_encoder.fit_projection(encoder, sentences, method, dimension, projection_version)
+        if output is None:
+            output = f"{projection_encoder.DEFAULT_PROJECTION_DIR}/{encoder.ENCODER_NAME}_{projection.name}.npz"
+        projection.save(output)
+        app.logger.info(f"Saved projection [projection={projection.name}] [path={output}]")
+
+    stopwatch.lap("app")
+    app.logger.info(f"Finished initialization [role={role}] {stopwatch.summary()}")
 
     return app
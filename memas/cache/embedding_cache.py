@@ -0,0 +1,191 @@
+from collections import OrderedDict
+import fcntl
+import logging
+import os
+import threading
+import numpy as np
+from memas.metrics import REGISTRY, Counter
+
+
+_log = logging.getLogger(__name__)
+
+
+KEY_BYTES = 32
+# Each process needs a file of its own, so this many processes can share a cache path
+DEFAULT_MAX_SHARDS = 16
+
+
+class MmapEmbeddingCache:
+    """
+    Fixed size, least recently used cache of embeddings, kept in a memory mapped file so it survives restarts.
+    The file holds max_entries fixed size records, so its footprint never grows, while the OS decides which pages
+    stay in memory.
+
+    Every process owns its own file, found by locking the first free "shard" of the path, since the least recently
+    used order is tracked in memory. Processes therefore never see each other's entries, and the disk footprint is
+    up to max_shards times the size of a file, see total_bytes. Processes beyond max_shards run without a cache,
+    which is logged and counted. The file is opened lazily by the first get or put of each process, so forked
+    workers like celery's don't inherit their parent's file.
+    """
+
+    def __init__(self, path: str, dimension: int, max_entries: int, *, max_shards: int = DEFAULT_MAX_SHARDS,
+                 name: str = None) -> None:
+        """
+        Args:
+            path (str): path prefix of the cache files
+            dimension (int): dimension of the embeddings
+            max_entries (int): number of records of each file, the least recently used one is replaced beyond this
+            max_shards (int, optional): max number of files, and thereby processes, sharing the path. This bounds
+                the total disk footprint
+            name (str, optional): when supplied, hit/miss/eviction/unavailable counters are published to the
+                metrics registry under this name
+        """
+        self.path: str = path
+        self.dimension: int = dimension
+        self.max_entries: int = max_entries
+        self.max_shards: int = max_shards
+        # Raw key bytes, since numpy byte strings drop trailing null bytes
+        self.dtype: np.dtype = np.dtype([("key", "u1", (KEY_BYTES,)), ("last_used", "<i8"),
+                                         ("embedding", "<f4", (dimension,))])
+
+        self.hits: Counter = REGISTRY.counter(f"{name}.hits") if name else Counter()
+        self.misses: Counter = REGISTRY.counter(f"{name}.misses") if name else Counter()
+        self.evictions: Counter = REGISTRY.counter(f"{name}.evictions") if name else Counter()
+        # Processes that found every shard taken
+        self.unavailable: Counter = REGISTRY.counter(f"{name}.unavailable") if name else Counter()
+
+        self._lock = threading.Lock()
+        self._opened_pid: int = None
+        self._fd: int = None
+        self.shard_path: str = None
+        self.records: np.memmap = None
+        # key -> slot, least recently used first
+        self._slots: OrderedDict[bytes, int] = OrderedDict()
+        self._free_slots: list[int] = []
+        self._tick: int = 0
+
+    @property
+    def total_bytes(self) -> int:
+        """Max disk footprint of the cache, once every shard is in use
+        """
+        return self.dtype.itemsize * self.max_entries * self.max_shards
+
+    def _lock_shard(self) -> str:
+        # The dimension and size are part of the file name, so a changed config never reads records of another layout
+        for shard in range(self.max_shards):
+            shard_path = f"{self.path}.{self.dimension}x{self.max_entries}.{shard}"
+            fd = os.open(shard_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            self._fd = fd
+            return shard_path
+        return None
+
+    def _open(self) -> bool:
+        """Opens the file of this process, if not already open
+
+        Returns:
+            bool: whether the cache is usable, which it isn't when every shard is taken
+        """
+        if self._opened_pid == os.getpid():
+            return self.records is not None
+        # Anything inherited from a parent process belongs to the parent
+        self._opened_pid = os.getpid()
+        self._fd, self.records = None, None
+        self._slots, self._free_slots = OrderedDict(), []
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.shard_path = self._lock_shard()
+        if self.shard_path is None:
+            _log.warning(f"All embedding cache shards are taken, caching is disabled for this process, raise "
+                         f"max_shards to cover every process [path={self.path}] [max_shards={self.max_shards}] "
+                         f"[pid={self._opened_pid}]")
+            self.unavailable.inc()
+            return False
+
+        size = self.dtype.itemsize * self.max_entries
+        if os.fstat(self._fd).st_size != size:
+            # New, or left truncated by a crash
+            os.ftruncate(self._fd, 0)
+            os.ftruncate(self._fd, size)
+        self.records = np.memmap(self.shard_path, dtype=self.dtype, mode="r+", shape=(self.max_entries,))
+
+        keys = self.records["key"]
+        # Zeroed keys are free slots
+        occupied = np.flatnonzero(keys.any(axis=1))
+        last_used = self.records["last_used"][occupied]
+        for slot in occupied[np.argsort(last_used, kind="stable")]:
+            self._slots[keys[slot].tobytes()] = int(slot)
+        self._free_slots = sorted(set(range(self.max_entries)) - set(self._slots.values()), reverse=True)
+        self._tick = int(last_used.max()) if len(last_used) else 0
+        _log.info(f"Opened embedding cache [path={self.shard_path}] [entries={len(self._slots)}]")
+        return True
+
+    def _touch(self, key: bytes, slot: int):
+        self._tick += 1
+        self.records["last_used"][slot] = self._tick
+        self._slots.move_to_end(key)
+
+    def get_many(self, keys: list[bytes]) -> list[np.ndarray]:
+        """Looks up the embeddings of multiple keys
+
+        Args:
+            keys (list[bytes]): keys of exactly KEY_BYTES bytes, like sha256 digests
+
+        Returns:
+            list[np.ndarray]: copies of the cached embeddings, None for the misses
+        """
+        with self._lock:
+            if not self._open():
+                self.misses.inc(len(keys))
+                return [None] * len(keys)
+            embeddings = []
+            for key in keys:
+                slot = self._slots.get(key)
+                if slot is None:
+                    self.misses.inc()
+                    embeddings.append(None)
+                    continue
+                self._touch(key, slot)
+                self.hits.inc()
+                embeddings.append(np.array(self.records["embedding"][slot]))
+            return embeddings
+
+    def put_many(self, keys: list[bytes], embeddings: list[np.ndarray]):
+        """Inserts or replaces the embeddings of multiple keys, evicting the least recently used ones beyond the size
+        """
+        with self._lock:
+            if not self._open():
+                return
+            for key, embedding in zip(keys, embeddings):
+                slot = self._slots.get(key)
+                if slot is None:
+                    if self._free_slots:
+                        slot = self._free_slots.pop()
+                    else:
+                        _, slot = self._slots.popitem(last=False)
+                        self.evictions.inc()
+                    self._slots[key] = slot
+                # The key goes last, so a record is only valid once its embedding is written
+                self.records["key"][slot] = 0
+                self.records["embedding"][slot] = np.ravel(embedding)
+                self.records["key"][slot] = np.frombuffer(key, dtype=np.uint8)
+                self._touch(key, slot)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def close(self):
+        """Flushes the records to disk and releases this process' file
+        """
+        with self._lock:
+            if self._opened_pid != os.getpid() or self.records is None:
+                return
+            self.records.flush()
+            self.records = None
+            os.close(self._fd)
+            self._fd = None
+            self._opened_pid = None
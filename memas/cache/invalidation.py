@@ -0,0 +1,89 @@
+import json
+import logging
+import threading
+from typing import Final, Hashable
+from memas.cache.lru_cache import LRUCache
+
+
+_log = logging.getLogger(__name__)
+
+
+INVALIDATION_CHANNEL: Final[str] = "memas-cache-invalidation"
+
+
+class CacheInvalidator:
+    """
+    Invalidates entries of named caches within this process
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.caches: dict[str, list[LRUCache]] = dict()
+
+    def register(self, cache_name: str, cache: LRUCache):
+        with self._lock:
+            self.caches.setdefault(cache_name, []).append(cache)
+
+    def invalidate_local(self, cache_name: str, key: Hashable = None):
+        """Invalidates the entry within the local caches
+
+        Args:
+            cache_name (str): name of the cache
+            key (Hashable, optional): the key to invalidate. All entries are cleared if not supplied.
+        """
+        with self._lock:
+            caches = list(self.caches.get(cache_name, []))
+        for cache in caches:
+            if key is None:
+                cache.clear()
+            else:
+                cache.invalidate(key)
+
+    def invalidate(self, cache_name: str, key: Hashable = None):
+        """Invalidates the entry within all caches of this name
+
+        Args:
+            cache_name (str): name of the cache
+            key (Hashable, optional): the key to invalidate. All entries are cleared if not supplied.
+        """
+        self.invalidate_local(cache_name, key)
+
+    def shutdown(self):
+        pass
+
+
+class RedisCacheInvalidator(CacheInvalidator):
+    """
+    Broadcasts invalidations to every MeMaS process through redis pub/sub, so caches stay coherent
+    across web servers and celery workers. Keys must be json serializable.
+    """
+
+    def __init__(self, redis_url: str, channel: str = INVALIDATION_CHANNEL) -> None:
+        super().__init__()
+        # Imported here, since redis is only needed when broadcasting is enabled
+        import redis
+        self.channel: str = channel
+        self.redis = redis.Redis.from_url(redis_url)
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self.pubsub.subscribe(**{self.channel: self._handle_message})
+        self.listener = self.pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def _handle_message(self, message):
+        try:
+            data = json.loads(message["data"])
+            self.invalidate_local(data["cache"], data["key"])
+        except Exception:
+            _log.exception(f"Failed to handle cache invalidation [message={message}]")
+
+    def invalidate(self, cache_name: str, key: Hashable = None):
+        # Always invalidate locally first, the broadcast is best effort and bounded by the cache ttl
+        self.invalidate_local(cache_name, key)
+        try:
+            self.redis.publish(self.channel, json.dumps({"cache": cache_name, "key": key}))
+        except Exception:
+            _log.warning(f"Failed to broadcast cache invalidation [cache={cache_name}] [key={key}]", exc_info=True)
+
+    def shutdown(self):
+        self.listener.stop()
+        self.pubsub.close()
+        self.redis.close()
@@ -0,0 +1,77 @@
+from collections import OrderedDict
+import threading
+import time
+from typing import Any, Callable, Hashable
+from memas.metrics import REGISTRY, Counter
+
+
+class LRUCache:
+    """
+    Thread safe, bounded least recently used cache, with optional time based expiry
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float = None, *, name: str = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        Args:
+            max_size (int): max number of entries, the least recently used entry is evicted beyond this
+            ttl_seconds (float, optional): seconds after insertion an entry expires. Entries never expire if not
+                supplied.
+            name (str, optional): when supplied, hit/miss counters are published to the metrics registry under this
+                name
+            clock (Callable[[], float], optional): clock used for expiry, mostly for testing
+        """
+        self.max_size: int = max_size
+        self.ttl_seconds: float = ttl_seconds
+        self.clock: Callable[[], float] = clock
+        self._lock = threading.Lock()
+        # key -> (expiry, value)
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+        self.hits: Counter = REGISTRY.counter(f"{name}.hits") if name else Counter()
+        self.misses: Counter = REGISTRY.counter(f"{name}.misses") if name else Counter()
+
+    def _expiry(self, ttl_seconds: float) -> float:
+        if ttl_seconds is None:
+            return float("inf")
+        return self.clock() + ttl_seconds
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self.clock():
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses.inc()
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits.inc()
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any, ttl_seconds: float = None):
+        """Insert or replace an entry
+
+        Args:
+            key (Hashable): key of the entry
+            value (Any): value of the entry
+            ttl_seconds (float, optional): overrides the cache's ttl for this entry
+        """
+        with self._lock:
+            self._entries[key] = (self._expiry(ttl_seconds if ttl_seconds is not None else self.ttl_seconds), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -4,6 +4,7 @@ from celery import shared_task
 from celery.utils.log import get_task_logger
 from memas.context_manager import ctx
 from memas.interface.exceptions import NamespaceDoesNotExistException
+from memas.interface.storage_driver import IngestionStatus
 
 
 logger = get_task_logger(__name__)
@@ -31,6 +32,7 @@ def delete_corpus(parent_id: UUID, corpus_id: UUID, corpus_pathname: str):
         ctx.memas_metadata.initiate_delete_corpus(parent_id, corpus_id, corpus_pathname)
         logger.warning(
             f"Corpus deletion failed but recovered [corpus_id={corpus_id}] [corpus_pathname={corpus_pathname}]")
+    ctx.corpus_provider.invalidate_corpus(corpus_pathname)
 
     # Then delete the content within the corpus
     corpus = ctx.corpus_provider.get_corpus_by_info(corpus_info)
@@ -38,3 +40,31 @@ def delete_corpus(parent_id: UUID, corpus_id: UUID, corpus_pathname: str):
 
     # finally delete the metadata
     ctx.memas_metadata.finish_delete_corpus(parent_id, corpus_id)
+
+    # Invalidate again, in case a concurrent memorize cached the corpus after the initial delete
+    ctx.corpus_provider.invalidate_corpus(corpus_pathname)
+
+
+@shared_task(ignore_result=True)
+def ingest(ingestion_id: UUID):
+    job = ctx.ingestion_jobs.get_job(ingestion_id)
+    logger.info(f"celery ingest for [ingestion_id={ingestion_id}] [corpus_pathname={job.corpus_pathname}]")
+
+    if job.status != IngestionStatus.PENDING:
+        # The task was delivered more than once, don't memorize the document again
+        logger.warning(f"Ingestion job already processed [ingestion_id={ingestion_id}] [status={job.status.value}]")
+        return
+
+    ctx.ingestion_jobs.update_status(ingestion_id, IngestionStatus.RUNNING)
+    try:
+        corpus = ctx.corpus_provider.get_corpus_by_name(job.corpus_pathname)
+        success = corpus.store_and_index(job.document, job.citation)
+    except Exception as e:
+        logger.exception(f"Ingestion failed [ingestion_id={ingestion_id}]")
+        ctx.ingestion_jobs.update_status(ingestion_id, IngestionStatus.FAILED, f"{e.__class__.__name__}: {e}")
+        return
+
+    if success:
+        ctx.ingestion_jobs.update_status(ingestion_id, IngestionStatus.SUCCEEDED)
+    else:
+        ctx.ingestion_jobs.update_status(ingestion_id, IngestionStatus.FAILED, "Failed to store the document")
@@ -1,22 +1,60 @@
 import os
+from concurrent.futures import Executor
 from dataclasses import dataclass
+from enum import Enum
 import logging
+import threading
+import uuid
+import futurist
 from werkzeug.local import LocalProxy
 from flask import current_app, Config
 from cassandra.cluster import Cluster, Session
 from cassandra.cqlengine import connection as c_connection
 from elasticsearch import Elasticsearch
 from pymilvus import connections as milvus_connection
+from memas.cache.embedding_cache import DEFAULT_MAX_SHARDS
+from memas.cache.invalidation import CacheInvalidator, RedisCacheInvalidator
+from memas.encoder.batching_encoder import MicroBatchingTextEncoder
+from memas.encoder.cached_encoder import CachingTextEncoder, PersistentCachingTextEncoder
+from memas.encoder.process_pool_encoder import ProcessPoolTextEncoder
+from memas.encoder.projection_encoder import Projection, ProjectionTextEncoder
 from memas.encoder.universal_sentence_encoder import USETextEncoder
+from memas.interface.encoder import TextEncoder
 from memas.interface.exceptions import IllegalStateException
-from memas.interface.storage_driver import CorpusDocumentMetadataStore, CorpusDocumentStore, CorpusVectorStore, MemasMetadataStore
-from memas.storage_driver import corpus_doc_metadata, corpus_doc_store, corpus_vector_store, memas_metadata
+from memas.interface.storage_driver import (
+    CorpusDocumentMetadataStore,
+    CorpusDocumentStore,
+    CorpusVectorStore,
+    IngestionJobStore,
+    MemasMetadataStore
+)
+from memas.storage_driver import (
+    corpus_doc_metadata,
+    corpus_doc_store,
+    corpus_vector_store,
+    ingestion_jobs,
+    memas_metadata,
+    milvus_partitions
+)
 from memas.corpus.corpus_provider import CorpusProvider
+from memas.metrics import Stopwatch
 
 
 _log = logging.getLogger(__name__)
 
 
+class Role(Enum):
+    """
+    What a MeMaS process is used for, so it only sets up what it needs
+    """
+    # Serves the dataplane and controlplane apis
+    WEB = "web"
+    # Celery worker memorizing documents off the request path
+    INGESTION = "ingestion"
+    # Celery worker for maintenance tasks like corpus deletion, which never embeds text
+    MAINTENANCE = "maintenance"
+
+
 def read_env(name: str, default: str = None) -> str:
     val = os.environ.get(name)
     if not val:
@@ -40,6 +78,51 @@ class EnvironmentConstants:
 
     milvus_ip: str
     milvus_port: int
+    milvus_index_type: str
+    milvus_index_params: dict
+    milvus_search_params: dict
+    milvus_rerank_oversample: int
+    milvus_partition_placement: str
+    milvus_partition_buckets: int
+    milvus_memory_budget_mb: int
+    milvus_slim_schema: bool
+
+    search_parallel: bool
+    search_executor: str
+    search_max_workers: int
+
+    clue_cache_size: int
+    clue_cache_ttl_seconds: float
+
+    encoder_process_pool: bool
+    encoder_num_workers: int
+    encoder_timeout_seconds: float
+
+    encoder_batching: bool
+    encoder_max_batch_size: int
+    encoder_batch_window_ms: float
+
+    encoder_projection_path: str
+
+    embedding_cache_path: str
+    embedding_cache_max_entries: int
+    embedding_cache_max_shards: int
+
+    metadata_cache_size: int
+    metadata_cache_ttl_seconds: float
+    metadata_cache_negative_ttl_seconds: float
+    redis_invalidation_url: str
+
+    corpus_cache_size: int
+    corpus_cache_ttl_seconds: float
+
+    async_memorize: bool
+    ingestion_job_ttl_seconds: int
+
+    warmup_enabled: bool
+    warmup_background: bool
+    warmup_embed_batch_sizes: list[int]
+    warmup_hot_namespaces: list[str]
 
     def __init__(self, app_config: Config):
         cassandra_configs = app_config["CASSANDRA"]
@@ -56,24 +139,186 @@ class EnvironmentConstants:
         milvus_configs = app_config["MILVUS"]
         self.milvus_ip = milvus_configs["ip"]
         self.milvus_port = milvus_configs["port"]
+        milvus_index_configs = milvus_configs.get("index", {})
+        self.milvus_index_type = milvus_index_configs.get("index_type", corpus_vector_store.DEFAULT_INDEX_TYPE)
+        self.milvus_index_params = milvus_index_configs.get("params", {})
+        self.milvus_search_params = milvus_index_configs.get("search_params", {})
+        self.milvus_rerank_oversample = milvus_index_configs.get("rerank_oversample", 1)
+        milvus_partition_configs = milvus_configs.get("partitioning", {})
+        self.milvus_partition_placement = milvus_partition_configs.get(
+            "placement", milvus_partitions.PARTITION_KEY_PLACEMENT)
+        self.milvus_partition_buckets = milvus_partition_configs.get(
+            "num_buckets", milvus_partitions.DEFAULT_NUM_BUCKETS)
+        self.milvus_memory_budget_mb = milvus_partition_configs.get("memory_budget_mb", 0)
+        self.milvus_slim_schema = milvus_configs.get("slim_schema", False)
+
+        search_configs = app_config.get("SEARCH", {})
+        self.search_parallel = search_configs.get("parallel", False)
+        self.search_executor = search_configs.get("executor", "auto")
+        self.search_max_workers = search_configs.get("max_workers", 16)
+
+        clue_cache_configs = app_config.get("ENCODER", {}).get("clue_cache", {})
+        self.clue_cache_size = clue_cache_configs.get("max_size", 0)
+        self.clue_cache_ttl_seconds = clue_cache_configs.get("ttl_seconds")
+
+        process_pool_configs = app_config.get("ENCODER", {}).get("process_pool", {})
+        self.encoder_process_pool = process_pool_configs.get("enabled", False)
+        self.encoder_num_workers = process_pool_configs.get("num_workers", 2)
+        self.encoder_timeout_seconds = process_pool_configs.get("timeout_seconds", 60)
+
+        batching_configs = app_config.get("ENCODER", {}).get("batching", {})
+        self.encoder_batching = batching_configs.get("enabled", False)
+        self.encoder_max_batch_size = batching_configs.get("max_batch_size", 64)
+        self.encoder_batch_window_ms = batching_configs.get("window_ms", 5)
+
+        projection_configs = app_config.get("ENCODER", {}).get("projection", {})
+        self.encoder_projection_path = projection_configs.get("path")
+
+        embedding_cache_configs = app_config.get("ENCODER", {}).get("embedding_cache", {})
+        self.embedding_cache_path = embedding_cache_configs.get("path")
+        self.embedding_cache_max_entries = embedding_cache_configs.get("max_entries", 100000)
+        self.embedding_cache_max_shards = embedding_cache_configs.get("max_shards", DEFAULT_MAX_SHARDS)
+
+        metadata_cache_configs = app_config.get("METADATA_CACHE", {})
+        self.metadata_cache_size = metadata_cache_configs.get("max_size", 0)
+        self.metadata_cache_ttl_seconds = metadata_cache_configs.get("ttl_seconds")
+        self.metadata_cache_negative_ttl_seconds = metadata_cache_configs.get("negative_ttl_seconds")
+        # Invalidations are broadcast through the celery broker, which only works when it's redis
+        broker_url = app_config.get("CELERY", {}).get("broker_url", "")
+        self.redis_invalidation_url = None
+        if metadata_cache_configs.get("redis_invalidation", False) and broker_url.startswith("redis"):
+            self.redis_invalidation_url = broker_url
+
+        corpus_cache_configs = app_config.get("CORPUS_CACHE", {})
+        self.corpus_cache_size = corpus_cache_configs.get("max_size", 0)
+        self.corpus_cache_ttl_seconds = corpus_cache_configs.get("ttl_seconds")
+
+        ingestion_configs = app_config.get("INGESTION", {})
+        self.async_memorize = ingestion_configs.get("async_memorize", False)
+        self.ingestion_job_ttl_seconds = ingestion_configs.get("job_ttl_seconds",
+                                                               ingestion_jobs.DEFAULT_JOB_TTL_SECONDS)
+
+        warmup_configs = app_config.get("WARMUP", {})
+        self.warmup_enabled = warmup_configs.get("enabled", False)
+        self.warmup_background = warmup_configs.get("background", False)
+        self.warmup_embed_batch_sizes = warmup_configs.get("embed_batch_sizes", [1])
+        self.warmup_hot_namespaces = warmup_configs.get("hot_namespaces", [])
+
+
+def is_eventlet_patched() -> bool:
+    try:
+        from eventlet import patcher
+    except ImportError:
+        return False
+    return patcher.is_monkey_patched("thread")
+
+
+def create_search_executor(consts: EnvironmentConstants) -> Executor:
+    """Creates the executor used to fan out searches to the different data stores concurrently
+
+    Args:
+        consts (EnvironmentConstants): environment constants
+
+    Returns:
+        Executor: the executor, or None if parallel search is disabled
+    """
+    if not consts.search_parallel:
+        return None
+
+    executor_type = consts.search_executor
+    if executor_type == "auto":
+        # Under the gunicorn eventlet worker, use green threads so we don't block the hub
+        executor_type = "green" if is_eventlet_patched() else "thread"
+
+    if executor_type == "green":
+        return futurist.GreenThreadPoolExecutor(max_workers=consts.search_max_workers)
+    elif executor_type == "thread":
+        return futurist.ThreadPoolExecutor(max_workers=consts.search_max_workers)
+    raise ValueError(f"Search executor '{executor_type}' not supported")
+
+
+def create_sentence_encoder(consts: EnvironmentConstants, role: Role) -> TextEncoder:
+    """Creates the sentence encoder, wrapped according to the configs. Nothing is loaded until init.
+
+    Args:
+        consts (EnvironmentConstants): environment constants
+        role (Role): role of this process
+
+    Returns:
+        TextEncoder: the sentence encoder
+    """
+    sentence_encoder = USETextEncoder()
+    if role == Role.MAINTENANCE:
+        # Never initialized, only its name and dimension are used to find the vector collection
+        return add_projection(sentence_encoder, consts)
+
+    if consts.encoder_process_pool:
+        # Run the model in separate processes, so inference doesn't block this process
+        sentence_encoder = ProcessPoolTextEncoder(sentence_encoder, consts.encoder_num_workers,
+                                                  consts.encoder_timeout_seconds)
+    if consts.encoder_batching:
+        # Batch the embeddings of concurrent requests, the clue cache sits in front so hits skip the batching
+        sentence_encoder = MicroBatchingTextEncoder(sentence_encoder, consts.encoder_max_batch_size,
+                                                    consts.encoder_batch_window_ms)
+    return add_projection(sentence_encoder, consts)
+
+
+def add_projection(sentence_encoder: TextEncoder, consts: EnvironmentConstants) -> TextEncoder:
+    """Wraps the encoder with the configured projection, if any. The projection is loaded right away, since the
+    vector store needs the projected dimension and name before the encoder is initialized.
+    """
+    if not consts.encoder_projection_path:
+        return sentence_encoder
+    projection = Projection.load(consts.encoder_projection_path)
+    _log.info(f"Projecting embeddings [projection={projection.name}] [path={consts.encoder_projection_path}]")
+    return ProjectionTextEncoder(sentence_encoder, projection)
 
 
 class ContextManager:
-    def __init__(self, app_config: Config):
+    def __init__(self, app_config: Config, role: Role = Role.WEB):
         self.consts: EnvironmentConstants = EnvironmentConstants(app_config)
+        self.role: Role = role
 
         # Data Stores
         self.memas_metadata: MemasMetadataStore = memas_metadata.SINGLETON
         self.corpus_metadata: CorpusDocumentMetadataStore = corpus_doc_metadata.SINGLETON
-        self.corpus_vec: CorpusVectorStore = corpus_vector_store.MilvusSentenceVectorStore(USETextEncoder())
+        sentence_encoder = create_sentence_encoder(self.consts, role)
+        clue_encoder = sentence_encoder
+        if role == Role.WEB and self.consts.clue_cache_size > 0:
+            clue_encoder = CachingTextEncoder(sentence_encoder, self.consts.clue_cache_size,
+                                              self.consts.clue_cache_ttl_seconds, name="clue_cache")
+        if role != Role.MAINTENANCE and self.consts.embedding_cache_path:
+            # Only memorized sentences go through the persistent cache, clues have their own in memory cache
+            sentence_encoder = PersistentCachingTextEncoder(sentence_encoder, self.consts.embedding_cache_path,
+                                                            self.consts.embedding_cache_max_entries,
+                                                            max_shards=self.consts.embedding_cache_max_shards)
+        self.corpus_vec: CorpusVectorStore = corpus_vector_store.MilvusSentenceVectorStore(
+            sentence_encoder, clue_encoder=clue_encoder, init_encoder=role != Role.MAINTENANCE,
+            index_type=self.consts.milvus_index_type, index_params=self.consts.milvus_index_params,
+            search_params=self.consts.milvus_search_params,
+            placement=milvus_partitions.get_partition_placement(self.consts.milvus_partition_placement,
+                                                                self.consts.milvus_partition_buckets),
+            memory_budget_bytes=self.consts.milvus_memory_budget_mb * 1024 * 1024,
+            slim_schema=self.consts.milvus_slim_schema, rerank_oversample=self.consts.milvus_rerank_oversample)
         self.corpus_doc: CorpusDocumentStore
+        self.ingestion_jobs: IngestionJobStore = ingestion_jobs.SINGLETON
+        self.ingestion_jobs.job_ttl_seconds = self.consts.ingestion_job_ttl_seconds
 
         # clients
         self.es: Elasticsearch
 
+        # Executor for concurrently querying the data stores within a search
+        self.search_executor: Executor = None
+
+        # Propagates cache invalidations, potentially across processes
+        self.cache_invalidator: CacheInvalidator = None
+
         # Corpus provider
         self.corpus_provider: CorpusProvider
 
+        # Set once the process is ready to serve traffic, which is after warm up when enabled
+        self.ready: threading.Event = threading.Event()
+
     def setup_cassandra_keyspace(self):
         """Setup the cassandra keyspace. We only want to run the very first server launch. 
         """
@@ -111,23 +356,99 @@ class ContextManager:
         self.corpus_metadata.first_init()
         self.corpus_vec.first_init()
         self.corpus_doc.first_init()
+        self.ingestion_jobs.first_init()
 
-    def init_datastores(self) -> None:
+    def init_datastores(self, stopwatch: Stopwatch = None) -> None:
         if self.es is None:
             raise IllegalStateException("Attempted to initialize data stores before connectors/clients")
+        stopwatch = stopwatch if stopwatch else Stopwatch()
         self.corpus_doc = corpus_doc_store.ESDocumentStore(self.es)
 
         self.memas_metadata.init()
         self.corpus_metadata.init()
+        self.ingestion_jobs.init()
+        stopwatch.lap("cassandra_tables")
         self.corpus_vec.init()
+        stopwatch.lap("vector_store")
         self.corpus_doc.init()
 
+        if self.consts.redis_invalidation_url:
+            self.cache_invalidator = RedisCacheInvalidator(self.consts.redis_invalidation_url)
+        else:
+            self.cache_invalidator = CacheInvalidator()
+        # Every role sends invalidations, even the ones not caching anything themselves
+        self.memas_metadata.invalidator = self.cache_invalidator
+        if self.role == Role.WEB and self.consts.metadata_cache_size > 0:
+            self.memas_metadata.enable_query_corpora_cache(
+                self.consts.metadata_cache_size, self.consts.metadata_cache_ttl_seconds,
+                self.consts.metadata_cache_negative_ttl_seconds, self.cache_invalidator)
+
+        # Only the web servers search
+        if self.role == Role.WEB:
+            self.search_executor = create_search_executor(self.consts)
         self.corpus_provider = CorpusProvider(
-            self.memas_metadata, self.corpus_metadata, self.corpus_doc, self.corpus_vec)
-
-    def init(self) -> None:
+            self.memas_metadata, self.corpus_metadata, self.corpus_doc, self.corpus_vec,
+            search_executor=self.search_executor)
+        self.corpus_provider.invalidator = self.cache_invalidator
+        if self.role != Role.MAINTENANCE and self.consts.corpus_cache_size > 0:
+            self.corpus_provider.enable_corpus_cache(
+                self.consts.corpus_cache_size, self.consts.corpus_cache_ttl_seconds, self.cache_invalidator)
+        stopwatch.lap("datastores")
+
+    def init(self, stopwatch: Stopwatch = None) -> None:
+        """Connects to the data stores and initializes them
+
+        Args:
+            stopwatch (Stopwatch, optional): stopwatch recording the duration of each step
+        """
+        stopwatch = stopwatch if stopwatch else Stopwatch()
         self.init_clients()
-        self.init_datastores()
+        stopwatch.lap("clients")
+        self.init_datastores(stopwatch)
+
+    def warm_up(self, stopwatch: Stopwatch = None) -> None:
+        """Warms up the encoder, data store connections and hot metadata, then marks the process as ready.
+        Failures are logged but don't stop the process from becoming ready, since warm up is only an optimization.
+
+        Args:
+            stopwatch (Stopwatch, optional): stopwatch recording the duration of each step
+        """
+        stopwatch = stopwatch if stopwatch else Stopwatch()
+
+        for store in [self.memas_metadata, self.corpus_metadata, self.ingestion_jobs, self.corpus_doc, self.corpus_vec]:
+            try:
+                store.warm_up()
+            except Exception:
+                _log.warning(f"Failed to warm up data store [store={store.__class__.__name__}]", exc_info=True)
+        stopwatch.lap("warmup_datastores")
+
+        if self.role != Role.MAINTENANCE:
+            try:
+                encoder = self.corpus_vec.encoder
+                if isinstance(encoder, PersistentCachingTextEncoder):
+                    # The cache would dedupe the batches and keep the warm up sentences. It would also be opened
+                    # here, which in celery's prefork parent holds a cache shard that no worker can use
+                    encoder = encoder.encoder
+                # Model graphs are traced per input shape, so run the batch sizes we expect to see
+                for batch_size in self.consts.warmup_embed_batch_sizes:
+                    encoder.embed_multiple([f"MeMaS is warming up {i}." for i in range(batch_size)])
+                if self.role == Role.WEB:
+                    # Run through the whole vector search path once, including clue embedding
+                    self.corpus_vec.search_corpora([uuid.uuid4()], "MeMaS is warming up.")
+            except Exception:
+                _log.warning("Failed to warm up the encoder", exc_info=True)
+            stopwatch.lap("warmup_encoder")
+
+        if self.role == Role.WEB:
+            for namespace_pathname in self.consts.warmup_hot_namespaces:
+                try:
+                    self.memas_metadata.get_query_corpora(namespace_pathname)
+                except Exception:
+                    _log.warning(f"Failed to prefetch [namespace_pathname=\"{namespace_pathname}\"]", exc_info=True)
+            stopwatch.lap("warmup_namespaces")
+
+        _log.info(f"Finished warm up {stopwatch.summary()}")
+        self.ready.set()
 
     def first_init(self) -> None:
         """Init function used only for initializing the first time
@@ -138,6 +459,11 @@ class ContextManager:
         self.shutdown()
 
     def shutdown(self) -> None:
+        if self.search_executor is not None:
+            self.search_executor.shutdown()
+        if self.cache_invalidator is not None:
+            self.cache_invalidator.shutdown()
+        self.corpus_vec.encoder.shutdown()
         self.es.close()
         milvus_connection.disconnect("default")
         c_connection.unregister_connection("default")
@@ -2,6 +2,7 @@ from flask import Blueprint, current_app, request
 import memas.celery_worker as worker
 from memas.context_manager import ctx
 from memas.interface.corpus import CorpusType
+from memas.metrics import REGISTRY
 
 controlplane = Blueprint("cp", __name__, url_prefix="/cp")
 
@@ -70,5 +71,18 @@ def delete_corpus(namespace_pathname: str, corpus_pathname: str):
 
     # Now initiate the delete, so the corpus can't be accessed by users
     ctx.memas_metadata.initiate_delete_corpus(parent_id, corpus_id, corpus_pathname)
+    ctx.corpus_provider.invalidate_corpus(corpus_pathname)
 
     return {"success": True}
+
+
+@controlplane.route('/metrics', methods=["GET"])
+def metrics():
+    return REGISTRY.snapshot()
+
+
+@controlplane.route('/ready', methods=["GET"])
+def ready():
+    if not ctx.ready.is_set():
+        return {"ready": False}, 503
+    return {"ready": True}
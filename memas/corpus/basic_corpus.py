@@ -1,12 +1,15 @@
-# from search_redirect import SearchSettings
+from concurrent.futures import Executor
+import itertools
 import logging
 import uuid
-from memas.interface.corpus import Corpus, CorpusInfo, CorpusFactory
+from memas.interface.corpus import Corpus, CorpusInfo, CorpusFactory, SearchSettings
 from memas.interface.corpus import Citation
-from memas.interface.storage_driver import CorpusDocumentMetadataStore, CorpusDocumentStore, CorpusVectorStore, DocumentEntity
-from memas.interface.exceptions import SentenceLengthOverflowException
-from memas.text_parsing.text_parsers import segment_document
-from memas.corpus.corpus_searching import normalize_and_combine
+from memas.interface.storage_driver import (CorpusDocumentMetadataStore, CorpusDocumentStore, CorpusVectorStore,
+                                            DocumentEntity, make_chunk_id)
+from memas.text_parsing.text_parsers import locate_segments, segment_document
+from memas.corpus.corpus_searching import (MISSING_CHUNK_OVERFETCH, basic_candidates_search, resolve_citations,
+                                          resolved_stream)
+from memas.corpus.score_fusion import DEFAULT_FUSION, get_fusion_strategy, top_k
 
 MAX_SEGMENT_LENGTH = 1536
 
@@ -15,11 +18,29 @@ _log = logging.getLogger(__name__)
 
 class BasicCorpus(Corpus):
 
-    def __init__(self, corpus_info: CorpusInfo, metadata_store: CorpusDocumentMetadataStore, doc_store: CorpusDocumentStore, vec_store: CorpusVectorStore):
+    def __init__(self, corpus_info: CorpusInfo, metadata_store: CorpusDocumentMetadataStore,
+                 doc_store: CorpusDocumentStore, vec_store: CorpusVectorStore, *, search_executor: Executor = None):
         super().__init__(corpus_info)
         self.metadata_store: CorpusDocumentMetadataStore = metadata_store
         self.doc_store: CorpusDocumentStore = doc_store
         self.vec_store: CorpusVectorStore = vec_store
+        self.search_executor: Executor = search_executor
+
+    def _chunk_document(self, doc_id: uuid.UUID, document: str,
+                        citation: Citation) -> list[tuple[str, DocumentEntity, int, int]]:
+        """Divide longer documents for document store
+        """
+        document_chunks = segment_document(document, MAX_SEGMENT_LENGTH)
+        chunk_offsets = locate_segments(document, document_chunks)
+
+        chunk_id_entity_pairs = []
+        for chunk_num, chunk in enumerate(document_chunks):
+            # Create the new IDs for the document chunk combo
+            chunk_id = make_chunk_id(doc_id, chunk_num)
+            start_index, end_index = chunk_offsets[chunk_num]
+            doc_chunk_entity = DocumentEntity(self.corpus_id, doc_id, citation.document_name, chunk)
+            chunk_id_entity_pairs.append((chunk_id, doc_chunk_entity, start_index, end_index))
+        return chunk_id_entity_pairs
 
     """
     The function stores a document in the elastic search DB, vecDB, and doc MetaData.
@@ -32,74 +53,73 @@ class BasicCorpus(Corpus):
         doc_id = uuid.uuid4()
         doc_entity = DocumentEntity(self.corpus_id, doc_id, citation.document_name, document)
 
-        document_chunks = segment_document(document, MAX_SEGMENT_LENGTH)
+        chunk_id_entity_pairs = self._chunk_document(doc_id, document, citation)
 
         # TODO : Need to investigate how to undo when failures on partial insert
         meta_save = self.metadata_store.insert_document_metadata(
-            self.corpus_id, doc_id, len(document_chunks), citation)
-
-        vec_save = self.vec_store.save_documents([doc_entity])
+            self.corpus_id, doc_id, len(chunk_id_entity_pairs), citation)
 
-        # Divide longer documents for document store
-        chunk_num = 0
-        chunk_id_entity_pairs = []
-        for chunk in document_chunks:
-            # Create the new IDs for the document chunk combo
-            chunk_id = doc_id.hex + '{:032b}'.format(chunk_num)
-            chunk_num = chunk_num + 1
-            doc_chunk_entity = DocumentEntity(self.corpus_id, doc_id, citation.document_name, chunk)
-            chunk_id_entity_pairs.append((chunk_id, doc_chunk_entity))
+        vec_save = self.vec_store.save_documents([doc_entity], [[(x[2], x[3]) for x in chunk_id_entity_pairs]])
 
         # Insert all chunks of document at once
         doc_save = self.doc_store.save_documents(id_doc_pairs=chunk_id_entity_pairs)
 
         return meta_save and vec_save and doc_save
 
+    def store_and_index_many(self, documents: list[tuple[str, Citation]]) -> list[bool]:
+        _log.debug(f"Corpus storing and indexing [corpus_id={self.corpus_id}] [num_documents={len(documents)}]")
+
+        statuses = [False] * len(documents)
+        indices, doc_entities, metadata, chunk_id_entity_pairs, chunk_offsets = [], [], [], [], []
+        for i, (document, citation) in enumerate(documents):
+            if not document:
+                _log.info(f"Skipping empty document [corpus_id={self.corpus_id}] [index={i}]")
+                continue
+            doc_id = uuid.uuid4()
+            chunks = self._chunk_document(doc_id, document, citation)
+
+            indices.append(i)
+            doc_entities.append(DocumentEntity(self.corpus_id, doc_id, citation.document_name, document))
+            metadata.append((doc_id, len(chunks), citation))
+            chunk_id_entity_pairs.extend(chunks)
+            chunk_offsets.append([(x[2], x[3]) for x in chunks])
+
+        if not indices:
+            return statuses
+
+        # One round trip per data store for the whole batch, instead of one per document.
+        # Nothing is undone on failure: the metadata batch is committed even when the vectors or chunks of some
+        # documents fail to insert, and those documents are only reported as failed
+        meta_save = self.metadata_store.insert_document_metadata_batch(self.corpus_id, metadata)
+        vec_saves = self.vec_store.save_documents_batch(doc_entities, chunk_offsets)
+        chunk_saves = self.doc_store.save_documents_batch(id_doc_pairs=chunk_id_entity_pairs)
+
+        # A document is saved in the document store once all its chunks are
+        doc_saves = {doc_entity.document_id: True for doc_entity in doc_entities}
+        for (_, chunk_entity, *_), chunk_save in zip(chunk_id_entity_pairs, chunk_saves):
+            doc_saves[chunk_entity.document_id] &= chunk_save
+
+        for i, doc_entity, vec_save in zip(indices, doc_entities, vec_saves):
+            statuses[i] = meta_save and vec_save and doc_saves[doc_entity.document_id]
+        return statuses
+
     """
     The most basic search of a document store via Elastic Search and a Vector DB
     via ANN. Combines the result via a simple concatenation.
     """
 
-    def search(self, clue: str) -> list[tuple[float, str, Citation]]:
+    def search(self, clue: str, settings: SearchSettings = None) -> list[tuple[float, str, Citation]]:
         _log.debug(f"Corpus searching [corpus_id={self.corpus_id}]")
+        if settings is None:
+            settings = SearchSettings()
 
-        # TODO : Replace the fields that constrain and describe the search with a SearchSettings Object
-        # that can be passed in
-        vector_search_count: int = 10
-
-        doc_store_results: list[tuple[float, str, Citation]] = []
-        temp_res = self.doc_store.search_corpora([self.corpus_id], clue)
-        # Search the document store
-        for score, doc_entity in temp_res:
-            document_text = doc_entity.document
-            citation = self.metadata_store.get_document_citation(self.corpus_id, doc_entity.document_id)
-            doc_store_results.append([score, document_text, citation])
-
-        # Search for the vectors
-        vec_store_results: list[tuple[float, str, Citation]] = []
-        temp_res2 = self.vec_store.search_corpora([self.corpus_id], clue)
-        for score, doc_entity, start_index, end_index in temp_res2:
-
-            # Verify that the text recovered from the vectors fits the maximum sentence criteria
-            if end_index - start_index != len(doc_entity.document):
-                _log.error("Index not aligned with actual document", exc_info=True)
-                raise SentenceLengthOverflowException(end_index - start_index)
-
-            citation = self.metadata_store.get_document_citation(self.corpus_id, doc_entity.document_id)
-            vec_store_results.append([score, doc_entity.document, citation])
-
-        # If any of the searches returned no results combine and return
-        if len(vec_store_results) == 0:
-            doc_store_results.sort(key=lambda x: x[0], reverse=True)
-            results = [(y, z) for [x, y, z] in doc_store_results]
-        elif len(doc_store_results) == 0:
-            vec_store_results.sort(key=lambda x: x[0], reverse=False)
-            results = [(y, z) for [x, y, z] in vec_store_results]
-        else:
-            # Combine the results and remove duplicates
-            results = normalize_and_combine(doc_store_results, vec_store_results)
-
-        return results
+        fusion_strategy = get_fusion_strategy(settings.fusion if settings.fusion else DEFAULT_FUSION)
+        candidates = basic_candidates_search(self.doc_store, self.vec_store, [self.corpus_id], clue, settings=settings,
+                                             executor=self.search_executor, fusion_strategy=fusion_strategy)
+        ranked = top_k(candidates, settings.result_limit * MISSING_CHUNK_OVERFETCH)
+        results = list(itertools.islice(resolved_stream(ranked, self.doc_store, settings.result_limit),
+                                        settings.result_limit))
+        return resolve_citations(results, self.metadata_store)
 
     def delete_all_content(self):
         # TODO: parallelize
@@ -109,11 +129,14 @@ class BasicCorpus(Corpus):
 
 
 class BasicCorpusFactory(CorpusFactory):
-    def __init__(self, metadata_store: CorpusDocumentMetadataStore, doc_store: CorpusDocumentStore, vec_store: CorpusVectorStore) -> None:
+    def __init__(self, metadata_store: CorpusDocumentMetadataStore, doc_store: CorpusDocumentStore,
+                 vec_store: CorpusVectorStore, *, search_executor: Executor = None) -> None:
         super().__init__()
         self.metadata_store: CorpusDocumentMetadataStore = metadata_store
         self.doc_store: CorpusDocumentStore = doc_store
         self.vec_store: CorpusVectorStore = vec_store
+        self.search_executor: Executor = search_executor
 
     def produce(self, corpus_info: CorpusInfo):
-        return BasicCorpus(corpus_info, self.metadata_store, self.doc_store, self.vec_store)
+        return BasicCorpus(corpus_info, self.metadata_store, self.doc_store, self.vec_store,
+                           search_executor=self.search_executor)
@@ -1,4 +1,8 @@
+from concurrent.futures import Executor
 import logging
+from typing import Final
+from memas.cache.invalidation import CacheInvalidator
+from memas.cache.lru_cache import LRUCache
 from memas.corpus.basic_corpus import BasicCorpusFactory
 from memas.interface.corpus import Corpus, CorpusFactory, CorpusInfo, CorpusType
 from memas.interface.storage_driver import CorpusDocumentMetadataStore, CorpusDocumentStore, CorpusVectorStore, MemasMetadataStore
@@ -7,21 +11,55 @@ from memas.interface.storage_driver import CorpusDocumentMetadataStore, CorpusDo
 _log = logging.getLogger(__name__)
 
 
+CORPUS_CACHE: Final[str] = "corpus"
+
+
 class CorpusProvider:
     def __init__(self,
                  memas_metadata_store: MemasMetadataStore,
                  doc_metadata_store: CorpusDocumentMetadataStore,
                  doc_store: CorpusDocumentStore,
-                 vec_store: CorpusVectorStore
+                 vec_store: CorpusVectorStore,
+                 *,
+                 search_executor: Executor = None
                  ) -> None:
         self.memas_metadata_store: MemasMetadataStore = memas_metadata_store
 
         self.factory_dict: dict[CorpusType, CorpusFactory] = dict()
 
-        basic_corpus_factory = BasicCorpusFactory(doc_metadata_store, doc_store, vec_store)
+        basic_corpus_factory = BasicCorpusFactory(doc_metadata_store, doc_store, vec_store,
+                                                  search_executor=search_executor)
         self.factory_dict[CorpusType.CONVERSATION] = basic_corpus_factory
         self.factory_dict[CorpusType.KNOWLEDGE] = basic_corpus_factory
 
+        # corpus pathname -> Corpus, None when caching is disabled
+        self.corpus_cache: LRUCache = None
+        self.invalidator: CacheInvalidator = CacheInvalidator()
+
+    def enable_corpus_cache(self, max_size: int, ttl_seconds: float = None, invalidator: CacheInvalidator = None):
+        """Enables caching of the resolved Corpus objects by pathname. Entries must be invalidated through
+        invalidate_corpus when the corpus is deleted.
+
+        Args:
+            max_size (int): max number of cached corpora
+            ttl_seconds (float, optional): seconds before an entry expires, as a safety net against missed invalidations
+            invalidator (CacheInvalidator, optional): invalidator used to propagate invalidations, like to other
+                processes
+        """
+        self.corpus_cache = LRUCache(max_size, ttl_seconds, name=CORPUS_CACHE)
+        if invalidator is not None:
+            self.invalidator = invalidator
+        self.invalidator.register(CORPUS_CACHE, self.corpus_cache)
+
+    def invalidate_corpus(self, corpus_pathname: str):
+        """Drops the cached Corpus of this pathname, in every process sharing the invalidator
+
+        Args:
+            corpus_pathname (str): corpus pathname
+        """
+        # Invalidate even without a local cache, so the invalidation still reaches other processes
+        self.invalidator.invalidate(CORPUS_CACHE, corpus_pathname)
+
     def get_corpus_by_name(self, corpus_pathname: str) -> Corpus:
         """Gets the Corpus class based on the corpus_pathname
 
@@ -31,8 +69,16 @@ class CorpusProvider:
         Returns:
             Corpus: Corpus object for searching
         """
-        corpus_info = self.memas_metadata_store.get_corpus_info(corpus_pathname)
-        return self.get_corpus_by_info(corpus_info)
+        if self.corpus_cache is None:
+            corpus_info = self.memas_metadata_store.get_corpus_info(corpus_pathname)
+            return self.get_corpus_by_info(corpus_info)
+
+        corpus = self.corpus_cache.get(corpus_pathname)
+        if corpus is None:
+            corpus_info = self.memas_metadata_store.get_corpus_info(corpus_pathname)
+            corpus = self.factory_dict[corpus_info.corpus_type].produce(corpus_info)
+            self.corpus_cache.put(corpus_pathname, corpus)
+        return corpus
 
     def get_corpus_by_info(self, corpus_info: CorpusInfo) -> Corpus:
         """Gets the Corpus class based on the CorpusInfo
@@ -43,4 +89,10 @@ class CorpusProvider:
         Returns:
             Corpus: Corpus object for searching
         """
+        if self.corpus_cache is not None:
+            # Reuse the cached object, but don't populate the cache here. The delete flow resolves corpora by info,
+            # and must not bring a deleted corpus back into the cache.
+            corpus = self.corpus_cache.get(corpus_info.corpus_pathname)
+            if corpus is not None and corpus.corpus_info == corpus_info:
+                return corpus
         return self.factory_dict[corpus_info.corpus_type].produce(corpus_info)
@@ -1,42 +1,70 @@
-# from search_redirect import SearchSettings
+from concurrent.futures import Executor
+from dataclasses import replace
+import itertools
+from typing import Callable, Final, Iterable, Iterator
+import logging
+import time
 from uuid import UUID
 from functools import reduce
-from memas.interface.corpus import Corpus, CorpusFactory, CorpusType
+from memas.interface.corpus import Corpus, CorpusFactory, CorpusType, SearchSettings
 from memas.interface.corpus import Citation
 from collections import defaultdict
-from memas.interface.storage_driver import DocumentEntity
+from memas.interface.storage_driver import (CorpusDocumentMetadataStore, CorpusDocumentStore, CorpusVectorStore,
+                                            DocumentEntity)
 from memas.interface.exceptions import SentenceLengthOverflowException
+from memas.corpus.score_fusion import (DEFAULT_FUSION, FusionStrategy, SearchCandidate, get_fusion_strategy, interleave,
+                                       top_k)
 
 
-def multi_corpus_search(corpus_sets: dict[CorpusType, list[Corpus]], clue: str, ctx, result_limit: int) -> list[tuple[float, str, Citation]]:
-    results = defaultdict(list)
+_log = logging.getLogger(__name__)
 
-    # Direct each multicorpus search to the right algorithm
+
+# Candidates are over fetched by this factor, so the ones dropped for missing chunks are replaced by the next best
+MISSING_CHUNK_OVERFETCH: Final[int] = 2
+
+
+def plan_corpus_search(corpus_sets: dict[CorpusType, list[Corpus]]) -> dict[str, list[Corpus]]:
+    """Groups the corpora by the backend searching them rather than by type, so corpus types sharing a backend
+    are searched with a single query
+
+    Args:
+        corpus_sets (dict[CorpusType, list[Corpus]]): corpora grouped by their CorpusType
+
+    Returns:
+        dict[str, list[Corpus]]: corpora grouped by their backend, see CORPUS_BACKENDS
+    """
+    plan = defaultdict(list)
     for corpus_type, corpora_list in corpus_sets.items():
-        # Default basic corpus handling
-        if corpus_type == CorpusType.KNOWLEDGE or corpus_type == CorpusType.CONVERSATION:
-            corpus_type_results = basic_corpora_search(corpora_list, clue, ctx)
-            results["BASIC_SCORING"].extend(corpus_type_results)
-
-    sorted_results_matrix = []
-    # Sort results with compareable scoring schemes
-    for scored_results in results.values():
-        # Sort by descending scoring so best results come first
-        sorted_scored_results = sorted(scored_results, key=lambda x: x[0], reverse=True)
-        sorted_results_matrix.append(sorted_scored_results)
-
-    # To combine results for corpora that don't have compareable scoring take equal sized subsets of each Corpus type
+        if corpus_type not in CORPUS_BACKENDS:
+            _log.warning(f"Skipping corpora without a search backend [corpus_type={corpus_type}]")
+            continue
+        plan[CORPUS_BACKENDS[corpus_type]].extend(corpora_list)
+    return plan
+
+
+def multi_corpus_search(corpus_sets: dict[CorpusType, list[Corpus]], clue: str, ctx,
+                        settings: SearchSettings = None) -> list[tuple[float, str, Citation]]:
+    if settings is None:
+        settings = SearchSettings()
+    result_limit = settings.result_limit
+    fusion_strategy = get_fusion_strategy(settings.fusion if settings.fusion else DEFAULT_FUSION)
+    results = dict()
+
+    # Direct each backend's corpora to the right algorithm. Scores are only comparable within a backend
+    for backend, corpora_list in plan_corpus_search(corpus_sets).items():
+        results[backend] = BACKEND_SEARCHES[backend](corpora_list, clue, ctx, settings, fusion_strategy)
+
+    # Rank results with compareable scoring schemes. At most result_limit are needed from each backend, so each
+    # backend only keeps a bounded heap of its best candidates instead of sorting all of them
+    ranked_streams = [resolved_stream(top_k(scored_results, result_limit * MISSING_CHUNK_OVERFETCH),
+                                      ctx.corpus_doc, result_limit) for scored_results in results.values()]
+
+    # To combine results for backends that don't have compareable scoring take equal sized subsets of each backend
     # TODO : Consider changing this at some point in the future to have better searching of corpus sets with non-comparable scoring
-    combined_results = []
-    for j in range(max([len(x) for x in sorted_results_matrix])):
-        for i in range(len(sorted_results_matrix)):
-            if j >= len(sorted_results_matrix[i]) or len(combined_results) >= result_limit:
-                break
-            combined_results.append(sorted_results_matrix[i][j])
-        if len(combined_results) >= result_limit:
-            break
+    combined_results = interleave(ranked_streams, result_limit)
 
-    return combined_results
+    # Only fetch the citations of the results that survived the cut
+    return resolve_citations(combined_results, ctx.corpus_metadata)
 
 
 """
@@ -44,107 +72,169 @@ All corpora here should be of the same CorpusType implementation (basic_corpus)
 """
 
 
-def basic_corpora_search(corpora: list[Corpus], clue: str, ctx) -> list[tuple[float, str, Citation]]:
+def basic_corpora_search(corpora: list[Corpus], clue: str, ctx, settings: SearchSettings = None,
+                         fusion_strategy: FusionStrategy = None) -> list[SearchCandidate]:
     # Extract information needed for a search
     corpus_ids = [x.corpus_id for x in corpora]
-
-    doc_store_results: list[tuple[float, str, Citation]] = []
-    temp_res = ctx.corpus_doc.search_corpora(corpus_ids, clue)
-    # Search the document store
-    for score, doc_entity in temp_res:
-        document_text = doc_entity.document
-        citation = ctx.corpus_metadata.get_document_citation(doc_entity.corpus_id, doc_entity.document_id)
-
-        doc_store_results.append([score, document_text, citation])
-
-    # Search for the vectors
-    vec_store_results: list[tuple[float, str, Citation]] = []
-    temp_res2 = ctx.corpus_vec.search_corpora(corpus_ids, clue)
-    for score, doc_entity, start_index, end_index in temp_res2:
-
-        # Verify that the text recovered from the vectors fits the maximum sentence criteria
-        if end_index - start_index != len(doc_entity.document):
-            print("Sanity check, this case should never get triggered")
-            raise SentenceLengthOverflowException(end_index - start_index)
-
-        citation = ctx.corpus_metadata.get_document_citation(doc_entity.corpus_id, doc_entity.document_id)
-
-        vec_store_results.append([score, doc_entity.document, citation])
-
-    # If any of the searches returned no results combine and return
-    if len(vec_store_results) == 0:
-        doc_store_results.sort(key=lambda x: x[0], reverse=True)
-        results = [(y, z) for [x, y, z] in doc_store_results]
-    elif len(doc_store_results) == 0:
-        vec_store_results.sort(key=lambda x: x[0], reverse=False)
-        results = [(y, z) for [x, y, z] in vec_store_results]
+    return basic_candidates_search(ctx.corpus_doc, ctx.corpus_vec, corpus_ids, clue, settings=settings,
+                                   executor=ctx.search_executor, fusion_strategy=fusion_strategy)
+
+
+BASIC_BACKEND: Final[str] = "basic"
+# Corpus types mapped to the same backend share their queries, and their results are ranked together
+CORPUS_BACKENDS: Final[dict[CorpusType, str]] = {
+    CorpusType.KNOWLEDGE: BASIC_BACKEND,
+    CorpusType.CONVERSATION: BASIC_BACKEND,
+}
+BACKEND_SEARCHES: Final[dict[str, Callable[..., list[SearchCandidate]]]] = {
+    BASIC_BACKEND: basic_corpora_search,
+}
+
+
+def _timed_call(fn, *args) -> tuple[object, float, float]:
+    start = time.perf_counter()
+    result = fn(*args)
+    return (result, start, time.perf_counter())
+
+
+def basic_candidates_search(doc_store: CorpusDocumentStore, vec_store: CorpusVectorStore,
+                            corpus_ids: list[UUID], clue: str, *, settings: SearchSettings = None,
+                            executor: Executor = None, fusion_strategy: FusionStrategy = None) -> list[SearchCandidate]:
+    """Searches the document store and vector store, then fuses the hits into search candidates.
+    Citations are not resolved here, see resolve_citations.
+
+    Args:
+        doc_store (CorpusDocumentStore): document store to search
+        vec_store (CorpusVectorStore): vector store to search
+        corpus_ids (list[UUID]): corpus ids to search within
+        clue (str): clue to search with
+        settings (SearchSettings, optional): constrains how many hits each store retrieves.
+            Defaults to SearchSettings().
+        executor (Executor, optional): when supplied, both stores are queried concurrently on this executor.
+            Otherwise the stores are queried one after the other.
+        fusion_strategy (FusionStrategy, optional): strategy combining the hits of both stores.
+            Defaults to the DEFAULT_FUSION strategy.
+
+    Returns:
+        list[SearchCandidate]: list of fused search candidates, not sorted
+    """
+    if settings is None:
+        settings = SearchSettings()
+    search_start = time.perf_counter()
+    if executor is None:
+        doc_hits, doc_start, doc_end = _timed_call(doc_store.search_corpora, corpus_ids, clue, settings)
+        vec_hits, vec_start, vec_end = _timed_call(vec_store.search_corpora, corpus_ids, clue, settings)
     else:
-        # Combine the results and remove duplicates
-        results = normalize_and_combine(doc_store_results, vec_store_results)
-
-    return results
-
-
-def normalize_and_combine(doc_results: list, vec_results: list):
-    # normalization with assumption that top score matches are approximately equal
-
-    # Vec scores are based on distance, so smaller is better. Need to inverse the
-    # order to be comparable to something like elastic search where bigger is better.
-    doc_scores = ([x[0] for x in doc_results])
-    vec_scores = ([x[0] for x in vec_results])
-
-    doc_max_score = max(doc_scores)
-    doc_min_score = min(doc_scores)
-
-    vec_max_score = max(vec_scores)
-    vec_min_score = min(vec_scores)
-
-    doc_results_normalized = []
-    vec_results_normalized = []
-
-    # Normalize and shift doc results to be between 0 and 1, with 1 being best responses and 0 being worst
-    if (doc_max_score != doc_min_score):
-        doc_results_normalized = [[(x - doc_min_score) / (doc_max_score - doc_min_score), y, z]
-                                  for [x, y, z] in doc_results]
-    else:
-        doc_results_normalized = [[1.0, y, z]
-                                  for [x, y, z] in doc_results]
-
-    # Vector results assume L2 distance of unit vectors so the range is between 0 and 2.
-    # if(vec_max_score != vec_min_score) :
-        # vec_results_normalized = [[(vec_max_score - x) / (vec_max_score - vec_min_score), y, z]
-        #                       for [x, y, z] in vec_results]
-    vec_results_normalized = [[2 - x, y, z] for [x, y, z] in vec_results]
-
-    # Reward documents that contain high scoring vectors and remove the searched vector.
-
-    # TODO : Check that this isn't super slow for larger documents and more search results
-
-    # Was considering adjusting the score reward by the document length when a document
-    # has a vector within it. Idea was longer docs share more sentences, so they're over rewarded.
-    # That might just mean its a good document, so it should recieve that score increase.
-
-    avg_doc_len = 1
-    if len(doc_results_normalized) != 0:
-        avg_doc_len = sum([len(x[1]) for x in doc_results_normalized]) / len(doc_results_normalized)
-
-    duplicate_vec_indicies = []
-    doc_index = 0
-    for doc_score, doc_text, doc_citation in doc_results_normalized:
-        vec_index = 0
-
-        for vec_score, vec_text, vec_citation in vec_results_normalized:
-            if (vec_text in doc_text):
-                duplicate_vec_indicies.append(vec_index)
-                # Reward documents containing text proportional to document length
-                doc_score = doc_score + ((len(doc_text) / avg_doc_len) * vec_score)
-            vec_index = vec_index + 1
-
-        doc_results_normalized[doc_index][0] = doc_score
-        doc_index = doc_index + 1
-
-    unique_vectors = [i for j, i in enumerate(vec_results_normalized) if j not in duplicate_vec_indicies]
-
-    doc_results_normalized.extend(unique_vectors)
+        doc_future = executor.submit(_timed_call, doc_store.search_corpora, corpus_ids, clue, settings)
+        vec_future = executor.submit(_timed_call, vec_store.search_corpora, corpus_ids, clue, settings)
+        doc_hits, doc_start, doc_end = doc_future.result()
+        vec_hits, vec_start, vec_end = vec_future.result()
+    search_end = time.perf_counter()
+
+    # Each backend is logged as "duration @ start offset", so overlapping calls can be verified
+    _log.debug(f"Search backend timings [parallel={executor is not None}] "
+               f"[doc_store={(doc_end - doc_start) * 1000:.1f}ms @+{(doc_start - search_start) * 1000:.1f}ms] "
+               f"[vec_store={(vec_end - vec_start) * 1000:.1f}ms @+{(vec_start - search_start) * 1000:.1f}ms] "
+               f"[total={(search_end - search_start) * 1000:.1f}ms]")
+
+    # Collect the document store results
+    doc_store_results: list[SearchCandidate] = []
+    for score, doc_entity, start_index, end_index in doc_hits:
+        doc_store_results.append(SearchCandidate(score, doc_entity.corpus_id, doc_entity.document_id,
+                                                 doc_entity.document, start_index, end_index))
+
+    # Collect the vector store results
+    vec_store_results: list[SearchCandidate] = []
+    for score, doc_entity, start_index, end_index in vec_hits:
+
+        # Verify that the text recovered from the vectors fits the maximum sentence criteria.
+        # Text that is only referenced through chunk ids is resolved later, see resolve_texts
+        if doc_entity.document is not None and end_index - start_index != len(doc_entity.document):
+            _log.error("Index not aligned with actual document")
+            raise SentenceLengthOverflowException(end_index - start_index)
 
-    return doc_results_normalized
+        vec_store_results.append(SearchCandidate(score, doc_entity.corpus_id, doc_entity.document_id,
+                                                 doc_entity.document, start_index, end_index, doc_entity.chunk_ids))
+
+    if fusion_strategy is None:
+        fusion_strategy = get_fusion_strategy(DEFAULT_FUSION)
+    # Combine the results and remove duplicates
+    return fusion_strategy.fuse(doc_store_results, vec_store_results)
+
+
+def resolve_citations(candidates: list[SearchCandidate],
+                      metadata_store: CorpusDocumentMetadataStore) -> list[tuple[float, str, Citation]]:
+    """Materializes the citations of the final search candidates in one bulk read
+
+    Args:
+        candidates (list[SearchCandidate]): the final search candidates
+        metadata_store (CorpusDocumentMetadataStore): metadata store holding the citations
+
+    Returns:
+        list[tuple[float, str, Citation]]: list of (score, text, citation) results, in the same order
+    """
+    citations = metadata_store.get_document_citations([(x.corpus_id, x.document_id) for x in candidates])
+    return [(x.score, x.text, citations[(x.corpus_id, x.document_id)]) for x in candidates]
+
+
+def _stitch_text(candidate: SearchCandidate, chunks: dict[str, tuple[DocumentEntity, int, int]]) -> str:
+    text = ""
+    cursor = candidate.start_index
+    for chunk_id in candidate.chunk_ids:
+        if chunk_id not in chunks:
+            return None
+        chunk, chunk_start, chunk_end = chunks[chunk_id]
+        if chunk_start is None:
+            # Chunks stored before offsets were tracked can't be sliced
+            return None
+        start, end = max(candidate.start_index, chunk_start), min(candidate.end_index, chunk_end)
+        # Whitespace between chunks isn't stored, so it's filled with spaces to keep the offsets aligned
+        text += " " * (start - cursor) + chunk.document[start - chunk_start:end - chunk_start]
+        cursor = end
+    return text + " " * (candidate.end_index - cursor)
+
+
+def resolve_texts(candidates: list[SearchCandidate], doc_store: CorpusDocumentStore) -> list[SearchCandidate]:
+    """Resolves the texts of candidates that only reference document store chunks, in one bulk read
+
+    Args:
+        candidates (list[SearchCandidate]): the final search candidates
+        doc_store (CorpusDocumentStore): document store holding the chunks
+
+    Returns:
+        list[SearchCandidate]: the candidates with their texts, in the same order. Candidates whose chunks
+            no longer exist, like those of a corpus being deleted, are dropped.
+    """
+    chunk_ids = list(dict.fromkeys(chunk_id for x in candidates if x.text is None for chunk_id in x.chunk_ids))
+    if not chunk_ids:
+        return candidates
+    chunks = doc_store.get_chunks(chunk_ids)
+
+    resolved = []
+    for candidate in candidates:
+        if candidate.text is None:
+            text = _stitch_text(candidate, chunks)
+            if text is None:
+                _log.warning(f"Dropping search result with missing chunks [chunk_ids={candidate.chunk_ids}]")
+                continue
+            candidate = replace(candidate, text=text)
+        resolved.append(candidate)
+    return resolved
+
+
+def resolved_stream(candidates: Iterable[SearchCandidate], doc_store: CorpusDocumentStore,
+                    batch_size: int) -> Iterator[SearchCandidate]:
+    """Lazily resolves the texts of ranked candidates a batch at a time, see resolve_texts. Candidates dropped for
+    missing chunks are made up for by the following ones, so taking n results still gives n while enough remain.
+
+    Args:
+        candidates (Iterable[SearchCandidate]): candidates ordered best first
+        doc_store (CorpusDocumentStore): document store holding the chunks
+        batch_size (int): number of candidates resolved per document store read, usually the number needed
+
+    Yields:
+        SearchCandidate: the candidates with their texts, in the same order
+    """
+    iterator = iter(candidates)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        yield from resolve_texts(batch, doc_store)
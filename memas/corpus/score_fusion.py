@@ -0,0 +1,224 @@
+from abc import ABC, abstractmethod
+from collections import defaultdict
+import heapq
+from dataclasses import dataclass, replace
+from typing import Final, Iterable
+from uuid import UUID
+import numpy as np
+from memas.interface.exceptions import IllegalArgumentException
+
+
+@dataclass
+class SearchCandidate:
+    """
+    Lightweight search hit carried through fusion and ranking. Citations are only materialized
+    for the final results, see resolve_citations
+    """
+    score: float
+    corpus_id: UUID
+    document_id: UUID
+    # None until resolved from chunk_ids, see resolve_texts
+    text: str
+    # Character offsets of the text within the original document, None if unknown
+    start_index: int = None
+    end_index: int = None
+    # Document store chunks holding the text, when the text is only resolved for the final results
+    chunk_ids: list[str] = None
+
+    def contains(self, other: "SearchCandidate") -> bool:
+        """Checks whether the other candidate's text lies within this candidate's text.
+        Both candidates are expected to come from the same document.
+        """
+        if None in (self.start_index, self.end_index, other.start_index, other.end_index):
+            # Fall back to text matching for data stored before offsets were tracked. Slim vector hits have no
+            # text until resolved, so they can't be matched this way
+            if self.text is None or other.text is None:
+                return False
+            return other.text in self.text
+        return self.start_index <= other.start_index and other.end_index <= self.end_index
+
+
+def get_scores(candidates: list[SearchCandidate]) -> np.ndarray:
+    return np.fromiter((x.score for x in candidates), dtype=np.float64, count=len(candidates))
+
+
+def with_scores(candidates: list[SearchCandidate], scores: np.ndarray) -> list[SearchCandidate]:
+    return [replace(candidate, score=score) for candidate, score in zip(candidates, scores.tolist())]
+
+
+def join_contained_vectors(doc_results: list[SearchCandidate],
+                           vec_results: list[SearchCandidate]) -> tuple[np.ndarray, np.ndarray]:
+    """Finds the vector hits that lie within a document chunk. Vectors and chunks are derived from the
+    same document, so they are joined by document id, then the sentence's offsets are checked against the chunk's.
+
+    Args:
+        doc_results (list[SearchCandidate]): document chunk candidates
+        vec_results (list[SearchCandidate]): vector sentence candidates
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (doc_indices, vec_indices) arrays, one entry per matching pair
+    """
+    chunks_by_document: dict[tuple[UUID, UUID], list[int]] = defaultdict(list)
+    for doc_index, doc_result in enumerate(doc_results):
+        chunks_by_document[(doc_result.corpus_id, doc_result.document_id)].append(doc_index)
+
+    doc_indices, vec_indices = [], []
+    for vec_index, vec_result in enumerate(vec_results):
+        for doc_index in chunks_by_document.get((vec_result.corpus_id, vec_result.document_id), ()):
+            if doc_results[doc_index].contains(vec_result):
+                doc_indices.append(doc_index)
+                vec_indices.append(vec_index)
+    return np.array(doc_indices, dtype=np.intp), np.array(vec_indices, dtype=np.intp)
+
+
+class FusionStrategy(ABC):
+    """
+    Combines the document store and vector store hits of a search into a single list of candidates
+    """
+
+    @abstractmethod
+    def fuse(self, doc_results: list[SearchCandidate], vec_results: list[SearchCandidate]) -> list[SearchCandidate]:
+        """Fuse the document store and vector store results
+
+        Args:
+            doc_results (list[SearchCandidate]): document store candidates, scored by relevance (bigger is better)
+            vec_results (list[SearchCandidate]): vector store candidates, scored by L2 distance (smaller is better)
+
+        Returns:
+            list[SearchCandidate]: fused candidates, where bigger scores are better. These are not sorted.
+        """
+
+
+class ScoreFusion(FusionStrategy):
+    """
+    Normalizes the scores of both stores onto a comparable scale, then rewards document chunks
+    containing high scoring sentences.
+    """
+
+    def fuse(self, doc_results: list[SearchCandidate], vec_results: list[SearchCandidate]) -> list[SearchCandidate]:
+        # normalization with assumption that top score matches are approximately equal
+        doc_scores = get_scores(doc_results)
+        if doc_scores.size != 0:
+            # Normalize and shift doc results to be between 0 and 1, with 1 being best responses and 0 being worst
+            score_range = np.ptp(doc_scores)
+            if score_range != 0:
+                doc_scores = (doc_scores - doc_scores.min()) / score_range
+            else:
+                doc_scores = np.ones_like(doc_scores)
+
+        # Vec scores are based on distance, so smaller is better. Need to inverse the
+        # order to be comparable to something like elastic search where bigger is better.
+        # Vector results assume L2 distance of unit vectors so the range is between 0 and 2.
+        vec_scores = 2 - get_scores(vec_results)
+
+        # Reward documents that contain high scoring vectors and remove the searched vector.
+
+        # Was considering adjusting the score reward by the document length when a document
+        # has a vector within it. Idea was longer docs share more sentences, so they're over rewarded.
+        # That might just mean its a good document, so it should recieve that score increase.
+        doc_indices, vec_indices = join_contained_vectors(doc_results, vec_results)
+        if doc_indices.size != 0:
+            doc_lengths = np.fromiter((len(x.text) for x in doc_results), dtype=np.float64, count=len(doc_results))
+            length_weights = doc_lengths / doc_lengths.mean()
+            np.add.at(doc_scores, doc_indices, length_weights[doc_indices] * vec_scores[vec_indices])
+
+        unique_vectors = np.ones(len(vec_results), dtype=bool)
+        unique_vectors[vec_indices] = False
+
+        fused = with_scores(doc_results, doc_scores)
+        fused.extend(with_scores([x for x, unique in zip(vec_results, unique_vectors) if unique],
+                                 vec_scores[unique_vectors]))
+        return fused
+
+
+class ReciprocalRankFusion(FusionStrategy):
+    """
+    Scores each candidate by 1 / (k + rank) within its own result list, ignoring the raw score scales.
+    Sentences contained in a returned chunk add their reciprocal rank to the chunk instead.
+    """
+
+    def __init__(self, k: int = 60) -> None:
+        super().__init__()
+        self.k: int = k
+
+    def reciprocal_ranks(self, scores: np.ndarray, descending: bool) -> np.ndarray:
+        order = np.argsort(-scores if descending else scores, kind="stable")
+        ranks = np.empty(scores.size, dtype=np.float64)
+        ranks[order] = np.arange(1, scores.size + 1)
+        return 1 / (self.k + ranks)
+
+    def fuse(self, doc_results: list[SearchCandidate], vec_results: list[SearchCandidate]) -> list[SearchCandidate]:
+        doc_scores = self.reciprocal_ranks(get_scores(doc_results), descending=True)
+        vec_scores = self.reciprocal_ranks(get_scores(vec_results), descending=False)
+
+        doc_indices, vec_indices = join_contained_vectors(doc_results, vec_results)
+        np.add.at(doc_scores, doc_indices, vec_scores[vec_indices])
+
+        unique_vectors = np.ones(len(vec_results), dtype=bool)
+        unique_vectors[vec_indices] = False
+
+        fused = with_scores(doc_results, doc_scores)
+        fused.extend(with_scores([x for x, unique in zip(vec_results, unique_vectors) if unique],
+                                 vec_scores[unique_vectors]))
+        return fused
+
+
+FUSION_STRATEGIES: Final[dict[str, FusionStrategy]] = {
+    "score": ScoreFusion(),
+    "rrf": ReciprocalRankFusion(),
+}
+DEFAULT_FUSION: Final[str] = "score"
+
+
+def get_fusion_strategy(name: str) -> FusionStrategy:
+    if name not in FUSION_STRATEGIES:
+        raise IllegalArgumentException("fusion", f"must be one of {list(FUSION_STRATEGIES.keys())}")
+    return FUSION_STRATEGIES[name]
+
+
+def top_k(candidates: Iterable[SearchCandidate], k: int = None) -> list[SearchCandidate]:
+    """Selects the k best candidates, sorted by descending score. Ties keep their original order.
+
+    Args:
+        candidates (Iterable[SearchCandidate]): candidates to select from, consumed in a single pass
+        k (int, optional): number of candidates to select. All candidates are sorted if not supplied.
+
+    Returns:
+        list[SearchCandidate]: the best candidates, best first
+    """
+    if k is None:
+        return sorted(candidates, key=_score, reverse=True)
+    if k <= 0:
+        return []
+    # Bounded min heap of the k best seen so far, so only O(n log k) comparisons are made
+    return heapq.nlargest(k, candidates, key=_score)
+
+
+def _score(candidate: SearchCandidate) -> float:
+    return candidate.score
+
+
+def interleave(streams: list[Iterable[SearchCandidate]], limit: int) -> list[SearchCandidate]:
+    """Takes candidates from each stream in turn, until limit candidates are taken or every stream is exhausted.
+    Streams are consumed lazily, so nothing past the limit is pulled from them.
+
+    Args:
+        streams (list[Iterable[SearchCandidate]]): candidate streams, each ordered best first
+        limit (int): max number of candidates to take
+
+    Returns:
+        list[SearchCandidate]: the interleaved candidates
+    """
+    iterators = [iter(stream) for stream in streams]
+    combined = []
+    while iterators and len(combined) < limit:
+        remaining = []
+        for iterator in iterators:
+            if len(combined) >= limit:
+                break
+            candidate = next(iterator, None)
+            if candidate is not None:
+                combined.append(candidate)
+                remaining.append(iterator)
+        iterators = remaining
+    return combined
@@ -1,19 +1,46 @@
 from dataclasses import asdict
+from uuid import UUID
 from flask import Blueprint, current_app, request
+import memas.celery_worker as worker
 from memas.context_manager import ctx
 from memas.corpus.corpus_searching import multi_corpus_search
-from memas.interface.corpus import Citation, Corpus, CorpusType
+from memas.corpus.score_fusion import DEFAULT_FUSION
+from memas.interface.corpus import (DEFAULT_CLUE_AGGREGATION, DEFAULT_MAX_CLUE_VECTORS, DEFAULT_RESULT_LIMIT, Citation,
+                                   Corpus, CorpusType, SearchSettings)
 from collections import defaultdict
+from memas.interface.exceptions import IllegalArgumentException, IngestionJobDoesNotExistException
+from memas.interface.storage_driver import IngestionStatus
 from memas.interface.namespace import CORPUS_SEPARATOR
 
 
 dataplane = Blueprint("dp", __name__, url_prefix="/dp")
 
 
+MAX_MEMORIZE_BATCH_SIZE = 1000
+
+
+def parse_citation(raw_citation: dict) -> Citation:
+    return Citation(source_uri=raw_citation.get("source_uri", ""),
+                    source_name=raw_citation.get("source_name", ""),
+                    description=raw_citation.get("description", ""),
+                    document_name=raw_citation.get("document_name", ""))
+
+
+def parse_search_settings(request_json: dict) -> SearchSettings:
+    # The candidate counts are derived from the result limit, unless the caller asks for a specific depth
+    return SearchSettings(result_limit=request_json.get("result_limit", DEFAULT_RESULT_LIMIT),
+                          doc_search_count=request_json.get("doc_search_count"),
+                          vec_search_count=request_json.get("vec_search_count"),
+                          fusion=request_json.get("fusion", DEFAULT_FUSION),
+                          clue_aggregation=request_json.get("clue_aggregation", DEFAULT_CLUE_AGGREGATION),
+                          max_clue_vectors=request_json.get("max_clue_vectors", DEFAULT_MAX_CLUE_VECTORS))
+
+
 @dataplane.route('/recall', methods=["GET"])
 def recall():
     namespace_pathname: str = request.json["namespace_pathname"]
     clue: str = request.json["clue"]
+    settings = parse_search_settings(request.json)
 
     current_app.logger.info(f"Recalling [namespace_pathname=\"{namespace_pathname}\"]")
 
@@ -34,13 +61,11 @@ def recall():
 
     # Execute a multicorpus search
     # TODO : Should look into refactor to remove ctx later and have a cleaner solution
-    search_results = multi_corpus_search(corpora_grouped_by_type, clue, ctx, 4)
+    search_results = multi_corpus_search(corpora_grouped_by_type, clue, ctx, settings)
     current_app.logger.debug(f"Search Results are: {search_results}")
 
-    # TODO : It will improve Query speed significantly to fetch citations after determining which documents to send to user
-
-    # Take only top few scores and remove scoring element before sending
-    return [{"document": doc, "citation": asdict(citation)} for score, doc, citation in search_results[0:5]]
+    # Remove scoring element before sending, the results are already limited to settings.result_limit
+    return [{"document": doc, "citation": asdict(citation)} for score, doc, citation in search_results]
 
 
 @dataplane.route('/memorize', methods=["POST"])
@@ -53,13 +78,71 @@ def memorize():
 
     current_app.logger.info(f"Memorizing [corpus_pathname=\"{corpus_pathname}\"] [document_name=\"{document_name}\"]")
 
-    citation = Citation(source_uri=raw_citation.get("source_uri", ""),
-                        source_name=raw_citation.get("source_name", ""),
-                        description=raw_citation.get("description", ""),
-                        document_name=document_name)
+    citation = parse_citation(raw_citation)
 
     corpus: Corpus = ctx.corpus_provider.get_corpus_by_name(corpus_pathname)
+
+    if request.json.get("async", ctx.consts.async_memorize):
+        # Persist the request, then let the ingestion workers store and index it off the request path
+        ingestion_id = ctx.ingestion_jobs.create_job(corpus_pathname, document, citation)
+        try:
+            worker.ingest.delay(ingestion_id)
+        except Exception:
+            ctx.ingestion_jobs.update_status(ingestion_id, IngestionStatus.FAILED, "Failed to enqueue the job")
+            raise
+        current_app.logger.info(f"Memorize enqueued [ingestion_id={ingestion_id.hex}]")
+        return {"success": True, "ingestion_id": ingestion_id.hex}
+
     success = corpus.store_and_index(document, citation)
 
     current_app.logger.info(f"Memorize finished [success={success}]")
     return {"success": success}
+
+
+@dataplane.route('/ingestion/<ingestion_id>', methods=["GET"])
+def ingestion_status(ingestion_id: str):
+    try:
+        ingestion_uuid = UUID(ingestion_id)
+    except ValueError as e:
+        raise IngestionJobDoesNotExistException(ingestion_id) from e
+
+    job = ctx.ingestion_jobs.get_job(ingestion_uuid)
+    resp = {"ingestion_id": job.ingestion_id.hex, "status": job.status.value}
+    if job.error:
+        resp["error"] = job.error
+    return resp
+
+
+@dataplane.route('/memorize_batch', methods=["POST"])
+def memorize_batch():
+    corpus_pathname: str = request.json["corpus_pathname"]
+    raw_documents: list[dict] = request.json["documents"]
+
+    if not isinstance(raw_documents, list) or len(raw_documents) > MAX_MEMORIZE_BATCH_SIZE:
+        raise IllegalArgumentException("documents", f"must be a list of at most {MAX_MEMORIZE_BATCH_SIZE} documents")
+
+    current_app.logger.info(
+        f"Memorizing batch [corpus_pathname=\"{corpus_pathname}\"] [num_documents={len(raw_documents)}]")
+
+    # Malformed documents are reported individually, instead of failing the whole batch
+    results: list[dict] = [{"success": False} for _ in raw_documents]
+    indices, documents = [], []
+    for i, raw_document in enumerate(raw_documents):
+        if not isinstance(raw_document, dict) or not isinstance(raw_document.get("document"), str) \
+                or not isinstance(raw_document.get("citation", {}), dict):
+            results[i]["error"] = "Expected a \"document\" string and an optional \"citation\" object"
+            continue
+        if not raw_document["document"]:
+            results[i]["error"] = "Empty documents are not memorized"
+            continue
+        indices.append(i)
+        documents.append((raw_document["document"], parse_citation(raw_document.get("citation", {}))))
+
+    corpus: Corpus = ctx.corpus_provider.get_corpus_by_name(corpus_pathname)
+    if documents:
+        for i, success in zip(indices, corpus.store_and_index_many(documents)):
+            results[i]["success"] = success
+
+    success = all(result["success"] for result in results)
+    current_app.logger.info(f"Memorize batch finished [success={success}]")
+    return {"success": success, "results": results}
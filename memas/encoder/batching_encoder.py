@@ -0,0 +1,154 @@
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+import logging
+import os
+import queue
+import threading
+import time
+import numpy as np
+from memas.interface.encoder import TextEncoder
+from memas.metrics import REGISTRY, Histogram
+
+
+_log = logging.getLogger(__name__)
+
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+@dataclass
+class EmbeddingRequest:
+    text_list: list[str]
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class MicroBatchingTextEncoder(TextEncoder):
+    """
+    Collects the embedding requests of concurrent callers arriving within a short window, and embeds them
+    with the wrapped encoder as a single batch. Encoders like USE have a much higher throughput on larger batches,
+    while most requests only embed one or two sentences.
+    """
+
+    def __init__(self, encoder: TextEncoder, max_batch_size: int = 64, window_ms: float = 5, *,
+                 name: str = "encoder_batching") -> None:
+        """
+        Args:
+            encoder (TextEncoder): encoder running the batches
+            max_batch_size (int, optional): max number of sentences per batch. Larger requests run in their own batch.
+            window_ms (float, optional): max milliseconds to wait for more requests after the first one arrives
+            name (str, optional): name the batch size and latency histograms are published under
+        """
+        super().__init__(ENCODER_NAME=encoder.ENCODER_NAME, VECTOR_DIMENSION=encoder.VECTOR_DIMENSION)
+        self.encoder: TextEncoder = encoder
+        self.max_batch_size: int = max_batch_size
+        self.window_seconds: float = window_ms / 1000
+
+        self.batch_size: Histogram = REGISTRY.histogram(f"{name}.batch_size", BATCH_SIZE_BUCKETS)
+        self.queue_latency_ms: Histogram = REGISTRY.histogram(f"{name}.queue_latency_ms")
+        self.latency_ms: Histogram = REGISTRY.histogram(f"{name}.latency_ms")
+
+        self._lock = threading.Lock()
+        self._started: bool = False
+        self._queue: queue.Queue[EmbeddingRequest] = None
+        self._dispatcher: threading.Thread = None
+        # Threads don't survive a fork, like celery's prefork workers, so the dispatcher is started per process
+        self._dispatcher_pid: int = None
+
+    def init(self):
+        self.encoder.init()
+        self._started = True
+
+    def shutdown(self):
+        with self._lock:
+            self._started = False
+            if self._dispatcher is not None and self._dispatcher_pid == os.getpid():
+                self._queue.put(None)
+                self._dispatcher.join()
+            self._dispatcher = None
+        self.encoder.shutdown()
+
+    def _get_queue(self) -> queue.Queue:
+        with self._lock:
+            if self._dispatcher is None or self._dispatcher_pid != os.getpid():
+                self._queue = queue.Queue()
+                self._dispatcher = threading.Thread(target=self._dispatch_loop, args=(self._queue,),
+                                                    name="encoder-batching", daemon=True)
+                self._dispatcher.start()
+                self._dispatcher_pid = os.getpid()
+            return self._queue
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_multiple([text])[0]
+
+    def embed_multiple(self, text_list: list[str]) -> list[np.ndarray]:
+        if not text_list:
+            return []
+        if not self._started:
+            # Not initialized or already shut down, so there's nothing to batch with
+            return self.encoder.embed_multiple(text_list)
+        request = EmbeddingRequest(text_list)
+        self._get_queue().put(request)
+        result = request.future.result()
+        self.latency_ms.observe((time.monotonic() - request.enqueued_at) * 1000)
+        return result
+
+    def _collect_batch(self, requests: queue.Queue,
+                       first: EmbeddingRequest) -> tuple[list[EmbeddingRequest], EmbeddingRequest, bool]:
+        """Collects requests arriving within the window after the first one, up to the max batch size
+
+        Returns:
+            tuple[list[EmbeddingRequest], EmbeddingRequest, bool]: (batch, request carried over to the next batch,
+                whether shutdown was requested)
+        """
+        batch = [first]
+        size = len(first.text_list)
+        deadline = time.monotonic() + self.window_seconds
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                return batch, None, True
+            if size + len(request.text_list) > self.max_batch_size:
+                return batch, request, False
+            batch.append(request)
+            size += len(request.text_list)
+        return batch, None, False
+
+    def _run_batch(self, batch: list[EmbeddingRequest]):
+        now = time.monotonic()
+        text_list = []
+        for request in batch:
+            self.queue_latency_ms.observe((now - request.enqueued_at) * 1000)
+            text_list.extend(request.text_list)
+        self.batch_size.observe(len(text_list))
+
+        try:
+            embeddings = self.encoder.embed_multiple(text_list)
+        except Exception as e:
+            _log.exception(f"Failed to embed batch [batch_size={len(text_list)}] [num_requests={len(batch)}]")
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        # Scatter the embeddings back to each caller
+        offset = 0
+        for request in batch:
+            request.future.set_result(embeddings[offset:offset + len(request.text_list)])
+            offset += len(request.text_list)
+
+    def _dispatch_loop(self, requests: queue.Queue):
+        carry: EmbeddingRequest = None
+        while True:
+            request = carry if carry is not None else requests.get()
+            if request is None:
+                return
+            batch, carry, stopping = self._collect_batch(requests, request)
+            self._run_batch(batch)
+            if stopping:
+                return
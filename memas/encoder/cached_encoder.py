@@ -0,0 +1,122 @@
+import hashlib
+import logging
+import unicodedata
+import numpy as np
+from memas.cache.embedding_cache import DEFAULT_MAX_SHARDS, MmapEmbeddingCache
+from memas.cache.lru_cache import LRUCache
+from memas.interface.encoder import TextEncoder
+
+
+_log = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Normalizes text so near identical sentences share the same cache entry.
+    Case is kept, since it can change the embedding.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class CachingTextEncoder(TextEncoder):
+    """
+    Wraps a TextEncoder with a bounded, in memory LRU cache of embeddings, keyed by the normalized text and
+    the encoder name. Only the cache misses are passed on to the wrapped encoder.
+    """
+
+    def __init__(self, encoder: TextEncoder, max_size: int, ttl_seconds: float = None, *, name: str = None) -> None:
+        super().__init__(ENCODER_NAME=encoder.ENCODER_NAME, VECTOR_DIMENSION=encoder.VECTOR_DIMENSION)
+        self.encoder: TextEncoder = encoder
+        self.cache: LRUCache = LRUCache(max_size, ttl_seconds,
+                                        name=name if name else f"encoder_cache.{encoder.ENCODER_NAME}")
+
+    def init(self):
+        self.encoder.init()
+
+    def shutdown(self):
+        self.encoder.shutdown()
+
+    def _cache_key(self, text: str) -> tuple[str, str]:
+        return (self.ENCODER_NAME, normalize_text(text))
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_multiple([text])[0]
+
+    def embed_multiple(self, text_list: list[str]) -> list[np.ndarray]:
+        keys = [self._cache_key(text) for text in text_list]
+        embeddings = [self.cache.get(key) for key in keys]
+
+        # Dedupe the misses, so repeated sentences within a call are only embedded once
+        missing_keys: dict[tuple[str, str], str] = dict()
+        for key, text, embedding in zip(keys, text_list, embeddings):
+            if embedding is None:
+                missing_keys.setdefault(key, text)
+
+        if missing_keys:
+            new_embeddings = self.encoder.embed_multiple(list(missing_keys.values()))
+            for key, embedding in zip(missing_keys.keys(), new_embeddings):
+                # Cached arrays are shared across callers, so don't let anyone modify them
+                embedding.flags.writeable = False
+                self.cache.put(key, embedding)
+                missing_keys[key] = embedding
+
+            embeddings = [embedding if embedding is not None else missing_keys[key]
+                          for key, embedding in zip(keys, embeddings)]
+        return embeddings
+
+
+class PersistentCachingTextEncoder(TextEncoder):
+    """
+    Wraps a TextEncoder with an on disk, memory mapped LRU cache of embeddings, keyed by a sha256 of the encoder name
+    and the normalized text. Chat corpora repeat a lot of sentences, like "ok" or boilerplate, so memorizing them
+    again skips the encoder. Unlike CachingTextEncoder, the cache survives restarts and its size is fixed.
+    """
+
+    def __init__(self, encoder: TextEncoder, path: str, max_entries: int, *, max_shards: int = DEFAULT_MAX_SHARDS,
+                 name: str = "embedding_cache") -> None:
+        """
+        Args:
+            encoder (TextEncoder): encoder embedding the misses
+            path (str): path prefix of the cache files, see MmapEmbeddingCache
+            max_entries (int): max number of cached embeddings per process
+            max_shards (int, optional): max number of processes with a cache, see MmapEmbeddingCache
+            name (str, optional): name the hit/miss/eviction/unavailable counters are published under
+        """
+        super().__init__(ENCODER_NAME=encoder.ENCODER_NAME, VECTOR_DIMENSION=encoder.VECTOR_DIMENSION)
+        self.encoder: TextEncoder = encoder
+        self.cache: MmapEmbeddingCache = MmapEmbeddingCache(path, encoder.VECTOR_DIMENSION, max_entries,
+                                                            max_shards=max_shards, name=name)
+        _log.info(f"Embedding cache enabled [path={path}] [max_entries={max_entries}] [max_shards={max_shards}] "
+                  f"[max_total_mb={self.cache.total_bytes / 2 ** 20:.0f}]")
+
+    def init(self):
+        self.encoder.init()
+
+    def shutdown(self):
+        self.cache.close()
+        self.encoder.shutdown()
+
+    def _cache_key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.ENCODER_NAME}\0{normalize_text(text)}".encode("utf-8")).digest()
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_multiple([text])[0]
+
+    def embed_multiple(self, text_list: list[str]) -> list[np.ndarray]:
+        if not text_list:
+            return []
+        keys = [self._cache_key(text) for text in text_list]
+        embeddings = self.cache.get_many(keys)
+
+        # Dedupe the misses, so repeated sentences within a call are only embedded once
+        missing_keys: dict[bytes, str] = dict()
+        for key, text, embedding in zip(keys, text_list, embeddings):
+            if embedding is None:
+                missing_keys.setdefault(key, text)
+
+        if missing_keys:
+            new_embeddings = [np.ravel(x) for x in self.encoder.embed_multiple(list(missing_keys.values()))]
+            self.cache.put_many(list(missing_keys.keys()), new_embeddings)
+            missing_keys = dict(zip(missing_keys.keys(), new_embeddings))
+            embeddings = [embedding if embedding is not None else missing_keys[key]
+                          for key, embedding in zip(keys, embeddings)]
+        return embeddings
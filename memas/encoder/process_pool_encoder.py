@@ -0,0 +1,233 @@
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import time
+import numpy as np
+from memas.interface.encoder import TextEncoder
+
+
+_log = logging.getLogger(__name__)
+
+
+# Each worker listens on its own socket, numbered by its index
+SOCKET_NAME = "encoder.{}.sock"
+# Frames are prefixed by their length, as an unsigned 4 byte big endian int
+FRAME_HEADER = struct.Struct(">I")
+STATUS_OK = b"\x00"
+STATUS_ERROR = b"\x01"
+
+
+def recv_exact(conn: socket.socket, size: int) -> bytearray:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = conn.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("Encoder worker connection closed unexpectedly")
+        received += count
+    return buffer
+
+
+def send_frame(conn: socket.socket, *payloads: bytes):
+    conn.sendall(FRAME_HEADER.pack(sum(len(x) for x in payloads)))
+    for payload in payloads:
+        conn.sendall(payload)
+
+
+def recv_frame(conn: socket.socket) -> bytearray:
+    (size,) = FRAME_HEADER.unpack(recv_exact(conn, FRAME_HEADER.size))
+    return recv_exact(conn, size)
+
+
+def handle_connection(encoder: TextEncoder, conn: socket.socket):
+    """Serves a single embedding request. The request is a json list of sentences, and the response is
+    a status byte followed by either the float32 embeddings, or an utf-8 error message.
+    """
+    text_list = json.loads(recv_frame(conn))
+    try:
+        embeddings = np.asarray(encoder.embed_multiple(text_list), dtype=np.float32)
+    except Exception as e:
+        _log.exception(f"Encoder worker failed to embed [batch_size={len(text_list)}]")
+        send_frame(conn, STATUS_ERROR, f"{e.__class__.__name__}: {e}".encode())
+        return
+    send_frame(conn, STATUS_OK, embeddings.tobytes())
+
+
+def encoder_worker_main(encoder: TextEncoder, socket_path: str):
+    """Entry point of the encoder worker processes. The worker binds its own socket, since socket objects can't be
+    sent to it from an eventlet patched parent. Connections wait in the backlog while the model is loaded once,
+    then requests are served one at a time.
+    """
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Only listening sockets show up at the path, so the parent can wait for it to exist
+    listener.bind(f"{socket_path}.{os.getpid()}")
+    listener.listen(128)
+    os.rename(f"{socket_path}.{os.getpid()}", socket_path)
+    encoder.init()
+    _log.info(f"Encoder worker ready [pid={os.getpid()}] [encoder={encoder.ENCODER_NAME}]")
+    while True:
+        conn, _ = listener.accept()
+        with conn:
+            try:
+                handle_connection(encoder, conn)
+            except Exception:
+                _log.exception("Encoder worker failed to handle connection")
+
+
+class ProcessPoolTextEncoder(TextEncoder):
+    """
+    Delegates embedding to a pool of local encoder processes over Unix sockets, each loading the model once.
+    The calling process only does socket I/O, so CPU bound inference doesn't block its threads or eventlet hub.
+    Requests are spread over the workers round robin, skipping the ones that refuse connections.
+
+    Only the process that started the workers can check on and restart them. Processes forked from it, like
+    celery's prefork workers, still send requests to the workers, but rely on connection errors to skip dead ones.
+    """
+
+    def __init__(self, encoder: TextEncoder, num_workers: int = 2, timeout_seconds: float = 60) -> None:
+        """
+        Args:
+            encoder (TextEncoder): uninitialized encoder, which is sent to and initialized within each worker process
+            num_workers (int, optional): number of encoder worker processes
+            timeout_seconds (float, optional): max seconds to wait on a worker for a single request, or for the
+                workers to start listening
+        """
+        super().__init__(ENCODER_NAME=encoder.ENCODER_NAME, VECTOR_DIMENSION=encoder.VECTOR_DIMENSION)
+        self.encoder: TextEncoder = encoder
+        self.num_workers: int = num_workers
+        self.timeout_seconds: float = timeout_seconds
+
+        self._lock = threading.Lock()
+        # The process that started the workers, the only one allowed to check on and restart them
+        self._owner_pid: int = None
+        self.socket_dir: str = None
+        self.socket_paths: list[str] = []
+        self.workers: list[multiprocessing.Process] = []
+        self._next_worker: int = 0
+
+    def init(self):
+        with self._lock:
+            if self.workers:
+                return
+            self._owner_pid = os.getpid()
+            self.socket_dir = tempfile.mkdtemp(prefix="memas-encoder-")
+            self.socket_paths = [os.path.join(self.socket_dir, SOCKET_NAME.format(i)) for i in range(self.num_workers)]
+            self.workers = [self._start_worker(i) for i in range(self.num_workers)]
+        self._wait_until_listening()
+        _log.info(f"Started encoder workers [num_workers={self.num_workers}] [socket_dir={self.socket_dir}]")
+
+    def _start_worker(self, index: int) -> multiprocessing.Process:
+        # Spawn instead of fork, since the parent may have threads or be monkey patched by eventlet. Only picklable
+        # arguments are sent, so the worker binds its socket itself
+        worker = multiprocessing.get_context("spawn").Process(
+            target=encoder_worker_main, args=(self.encoder, self.socket_paths[index]),
+            name="memas-encoder-worker", daemon=True)
+        worker.start()
+        return worker
+
+    def _wait_until_listening(self):
+        """Waits for every worker to bind its socket, so the first requests aren't refused
+        """
+        deadline = time.monotonic() + self.timeout_seconds
+        while not all(os.path.exists(path) for path in self.socket_paths):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Encoder workers didn't start listening within {self.timeout_seconds} seconds")
+            time.sleep(0.01)
+
+    def _is_owner(self) -> bool:
+        return os.getpid() == self._owner_pid
+
+    def _restart_dead_workers(self) -> int:
+        """Restarts the workers that died, like when they were OOM killed. Only the process that started the
+        workers can tell whether they are alive, so other processes never restart them.
+
+        Returns:
+            int: number of restarted workers
+        """
+        if not self._is_owner():
+            return 0
+        restarted = 0
+        with self._lock:
+            for i, worker in enumerate(self.workers):
+                if not worker.is_alive():
+                    _log.warning(f"Restarting encoder worker [pid={worker.pid}] [exitcode={worker.exitcode}]")
+                    # Otherwise waiting for the replacement to listen would find the dead worker's socket
+                    if os.path.exists(self.socket_paths[i]):
+                        os.unlink(self.socket_paths[i])
+                    self.workers[i] = self._start_worker(i)
+                    restarted += 1
+        if restarted:
+            self._wait_until_listening()
+        return restarted
+
+    def shutdown(self):
+        with self._lock:
+            if not self._is_owner():
+                # The workers and their sockets belong to the process that started them
+                self.workers = []
+                return
+            for worker in self.workers:
+                worker.terminate()
+            for worker in self.workers:
+                worker.join()
+            self.workers = []
+            if self.socket_dir is not None:
+                shutil.rmtree(self.socket_dir, ignore_errors=True)
+                self.socket_dir = None
+
+    def _connect(self) -> socket.socket:
+        """Connects to the next worker accepting connections, round robin
+
+        Raises:
+            ConnectionError: every worker refused the connection
+        """
+        for _ in range(len(self.socket_paths)):
+            with self._lock:
+                path = self.socket_paths[self._next_worker % len(self.socket_paths)]
+                self._next_worker += 1
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout_seconds)
+            try:
+                conn.connect(path)
+                return conn
+            except (ConnectionRefusedError, FileNotFoundError):
+                # The worker is dead, or a replacement hasn't bound its socket yet
+                conn.close()
+        raise ConnectionError("No encoder worker accepted the connection")
+
+    def _request(self, text_list: list[str]) -> bytearray:
+        with self._connect() as conn:
+            send_frame(conn, json.dumps(text_list).encode())
+            return recv_frame(conn)
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_multiple([text])[0]
+
+    def embed_multiple(self, text_list: list[str]) -> list[np.ndarray]:
+        if not text_list:
+            return []
+        # Dead workers only refuse connections, so replace them before they cut the pool's capacity
+        self._restart_dead_workers()
+        try:
+            response = self._request(text_list)
+        except ConnectionError:
+            # A worker may have died mid request, so restart it and try once more
+            self._restart_dead_workers()
+            response = self._request(text_list)
+        except socket.timeout:
+            # Retry only if the timeout was caused by a dead worker, not a slow request
+            if self._restart_dead_workers() == 0:
+                raise
+            response = self._request(text_list)
+
+        if response[:1] != STATUS_OK:
+            raise RuntimeError(f"Encoder worker failed: {response[1:].decode()}")
+        embeddings = np.frombuffer(response, dtype=np.float32, offset=1).reshape(len(text_list), -1)
+        return list(embeddings)
@@ -0,0 +1,175 @@
+from dataclasses import dataclass
+import logging
+import os
+import re
+import numpy as np
+from memas.interface.encoder import TextEncoder
+from memas.interface.exceptions import IllegalArgumentException
+
+
+_log = logging.getLogger(__name__)
+
+
+PROJECTION_METHODS = ["pca", "random"]
+# Projections are saved next to the encoder models
+DEFAULT_PROJECTION_DIR = "encoder/projections"
+
+
+@dataclass
+class Projection:
+    """
+    Linear map of embeddings into fewer dimensions, fitted offline. The version is part of the encoder name, and
+    thereby of the vector collection name, so vectors of different projections never end up in the same collection.
+    """
+    method: str
+    version: str
+    # Subtracted from the embeddings before projecting, zeros for random projections
+    mean: np.ndarray
+    # (output dimension, input dimension) matrix
+    components: np.ndarray
+
+    def __post_init__(self):
+        if self.method not in PROJECTION_METHODS:
+            raise IllegalArgumentException("method", f"must be one of {PROJECTION_METHODS}")
+        # Milvus collection names only allow letters, digits and underscores
+        if not re.fullmatch(r"[A-Za-z0-9_]+", self.version):
+            raise IllegalArgumentException("version", "must only contain letters, digits and underscores")
+
+    @property
+    def input_dimension(self) -> int:
+        return self.components.shape[1]
+
+    @property
+    def output_dimension(self) -> int:
+        return self.components.shape[0]
+
+    @property
+    def name(self) -> str:
+        return f"{self.method}{self.output_dimension}_{self.version}"
+
+    def apply(self, embeddings: np.ndarray) -> np.ndarray:
+        """Projects a (num embeddings, input dimension) matrix of embeddings, then scales the rows back to unit
+        length, since score fusion assumes L2 distances of unit vectors
+
+        Args:
+            embeddings (np.ndarray): embeddings, one per row
+
+        Returns:
+            np.ndarray: (num embeddings, output dimension) matrix of the projected unit embeddings
+        """
+        projected = (embeddings - self.mean) @ self.components.T
+        norms = np.linalg.norm(projected, axis=1, keepdims=True)
+        # Embeddings projected onto the origin have no direction, so they're left as zeros
+        projected = np.divide(projected, norms, out=np.zeros_like(projected), where=norms > 0)
+        return projected.astype(np.float32, copy=False)
+
+    def save(self, path: str):
+        """Saves the projection as a .npz file
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(f, method=self.method, version=self.version, mean=self.mean, components=self.components)
+
+    @staticmethod
+    def load(path: str) -> "Projection":
+        """Loads a projection saved with save
+        """
+        with np.load(path) as data:
+            return Projection(str(data["method"]), str(data["version"]), data["mean"], data["components"])
+
+
+def fit_pca(samples: np.ndarray, dimension: int, version: str) -> Projection:
+    """Fits a PCA projection keeping the directions of most variance
+
+    Args:
+        samples (np.ndarray): (num samples, input dimension) matrix of embeddings, ideally a sample of the corpora
+        dimension (int): output dimension, at most the number of samples and the input dimension
+        version (str): version of the projection
+
+    Returns:
+        Projection: the fitted projection
+    """
+    if dimension > min(samples.shape):
+        raise IllegalArgumentException("dimension", f"must be at most {min(samples.shape)} for this sample")
+    mean = samples.mean(axis=0)
+    _, singular_values, vt = np.linalg.svd(samples - mean, full_matrices=False)
+    explained = (singular_values[:dimension] ** 2).sum() / (singular_values ** 2).sum()
+    _log.info(f"Fitted PCA projection [dimension={dimension}] [num_samples={len(samples)}] "
+              f"[explained_variance={explained:.4f}]")
+    return Projection("pca", version, mean.astype(np.float32), vt[:dimension].astype(np.float32))
+
+
+def fit_random(input_dimension: int, dimension: int, version: str, seed: int = 0) -> Projection:
+    """Creates a gaussian random projection, which preserves distances in expectation without needing samples
+
+    Args:
+        input_dimension (int): dimension of the encoder's embeddings
+        dimension (int): output dimension
+        version (str): version of the projection
+        seed (int, optional): random seed
+
+    Returns:
+        Projection: the random projection
+    """
+    rng = np.random.default_rng(seed)
+    components = rng.normal(scale=1 / np.sqrt(dimension), size=(dimension, input_dimension))
+    return Projection("random", version, np.zeros(input_dimension, dtype=np.float32), components.astype(np.float32))
+
+
+def fit_projection(encoder: TextEncoder, sentences: list[str], method: str, dimension: int, version: str,
+                   batch_size: int = 256) -> Projection:
+    """Fits a projection of the encoder's embeddings, from a sample of the sentences stored in the corpora
+
+    Args:
+        encoder (TextEncoder): initialized encoder, without a projection
+        sentences (list[str]): sample sentences, only embedded by PCA
+        method (str): "pca" or "random"
+        dimension (int): output dimension
+        version (str): version of the projection
+        batch_size (int, optional): number of sentences embedded at once
+
+    Returns:
+        Projection: the fitted projection
+    """
+    if method == "random":
+        return fit_random(encoder.VECTOR_DIMENSION, dimension, version)
+    if method != "pca":
+        raise IllegalArgumentException("method", f"must be one of {PROJECTION_METHODS}")
+    embeddings = []
+    for i in range(0, len(sentences), batch_size):
+        embeddings.extend(np.ravel(x) for x in encoder.embed_multiple(sentences[i:i + batch_size]))
+    return fit_pca(np.stack(embeddings), dimension, version)
+
+
+class ProjectionTextEncoder(TextEncoder):
+    """
+    Wraps a TextEncoder, projecting its embeddings into fewer dimensions. This cuts the memory of the vector index
+    and the cost of distance computations proportionally. The projected embeddings are unit vectors, like the ones
+    of the wrapped encoder. The projection's name is appended to the encoder name, so stored and clue embeddings
+    always go through the same projection.
+    """
+
+    def __init__(self, encoder: TextEncoder, projection: Projection) -> None:
+        if projection.input_dimension != encoder.VECTOR_DIMENSION:
+            raise IllegalArgumentException(
+                "projection", f"expects {projection.input_dimension} dimensions, but {encoder.ENCODER_NAME} "
+                f"embeds in {encoder.VECTOR_DIMENSION}")
+        super().__init__(ENCODER_NAME=f"{encoder.ENCODER_NAME}_{projection.name}",
+                         VECTOR_DIMENSION=projection.output_dimension)
+        self.encoder: TextEncoder = encoder
+        self.projection: Projection = projection
+
+    def init(self):
+        self.encoder.init()
+
+    def shutdown(self):
+        self.encoder.shutdown()
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_multiple([text])[0]
+
+    def embed_multiple(self, text_list: list[str]) -> list[np.ndarray]:
+        if not text_list:
+            return []
+        embeddings = np.stack([np.ravel(x) for x in self.encoder.embed_multiple(text_list)])
+        return list(self.projection.apply(embeddings))
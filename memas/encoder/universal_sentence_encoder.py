@@ -1,8 +1,5 @@
-import tensorflow_hub as hub
-import tensorflow as tf
 import numpy as np
 from memas.interface.encoder import TextEncoder
-import random
 
 
 # @param ["https://tfhub.dev/google/universal-sentence-encoder/4",
@@ -19,6 +16,8 @@ class USETextEncoder(TextEncoder):
         self.model_url: str = model_url
 
     def init(self):
+        # Imported here since tensorflow takes seconds to import, and processes that never embed shouldn't pay for it
+        import tensorflow_hub as hub
         self.encoder = hub.load(self.model_url)
 
     def embed(self, text: str) -> np.ndarray:
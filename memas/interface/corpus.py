@@ -1,7 +1,29 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from enum import Enum
+from typing import Final
 from uuid import UUID
+from memas.interface.exceptions import IllegalArgumentException
+
+
+DEFAULT_RESULT_LIMIT: Final[int] = 4
+MAX_RESULT_LIMIT: Final[int] = 100
+# The candidate counts scale with the result limit, so shallow searches stay cheap. By default that's 20 chunks
+# and 100 sentences, the depth searches always had.
+DOC_CANDIDATES_PER_RESULT: Final[int] = 5
+VEC_CANDIDATES_PER_RESULT: Final[int] = 25
+MAX_SEARCH_COUNT: Final[int] = 2000
+
+# How the hits of a multi sentence clue are combined:
+#   "none" returns every sentence's hits as is, so a composite id can appear once per sentence
+#   "max" keeps each composite id once, with its best distance across the clue sentences
+#   "sum" keeps each composite id once, summing its similarity (2 - L2 distance) across the clue sentences
+#   "pooled" searches with a single, mean pooled clue vector
+CLUE_AGGREGATIONS: Final[list[str]] = ["none", "max", "sum", "pooled"]
+DEFAULT_CLUE_AGGREGATION: Final[str] = "max"
+# Longer clues are pooled down to this many query vectors, bounding the vector search fan-out
+DEFAULT_MAX_CLUE_VECTORS: Final[int] = 4
+MAX_CLUE_VECTORS: Final[int] = 16
 
 
 class CorpusType(Enum):
@@ -28,6 +50,43 @@ class CorpusInfo:
         return hash((self.namespace_id, self.corpus_id, self.corpus_pathname))
 
 
+@dataclass
+class SearchSettings:
+    """
+    Constrains the depth of a search. The per store candidate counts default to a multiple of the result limit.
+    """
+    # Number of results returned to the caller
+    result_limit: int = DEFAULT_RESULT_LIMIT
+    # Number of chunks retrieved from the document store
+    doc_search_count: int = None
+    # Number of sentences retrieved from the vector store, per clue sentence
+    vec_search_count: int = None
+    # Name of the fusion strategy, the default strategy is used if not supplied
+    fusion: str = None
+    # How the vector hits of a multi sentence clue are combined, one of CLUE_AGGREGATIONS
+    clue_aggregation: str = DEFAULT_CLUE_AGGREGATION
+    # Max number of query vectors sent to the vector store, consecutive clue sentences are pooled beyond this
+    max_clue_vectors: int = DEFAULT_MAX_CLUE_VECTORS
+
+    def __post_init__(self):
+        _check_count("result_limit", self.result_limit, MAX_RESULT_LIMIT)
+        if self.doc_search_count is None:
+            self.doc_search_count = DOC_CANDIDATES_PER_RESULT * self.result_limit
+        if self.vec_search_count is None:
+            self.vec_search_count = VEC_CANDIDATES_PER_RESULT * self.result_limit
+        _check_count("doc_search_count", self.doc_search_count, MAX_SEARCH_COUNT)
+        _check_count("vec_search_count", self.vec_search_count, MAX_SEARCH_COUNT)
+        _check_count("max_clue_vectors", self.max_clue_vectors, MAX_CLUE_VECTORS)
+        if self.clue_aggregation not in CLUE_AGGREGATIONS:
+            raise IllegalArgumentException("clue_aggregation", f"must be one of {CLUE_AGGREGATIONS}")
+
+
+def _check_count(argument: str, value: int, maximum: int):
+    # bool is a subclass of int, but never a meaningful count
+    if not isinstance(value, int) or isinstance(value, bool) or not 1 <= value <= maximum:
+        raise IllegalArgumentException(argument, f"must be an integer between 1 and {maximum}")
+
+
 class Corpus(ABC):
     """
     Corpus interface used to access data within the corpus, and hide the different implementations
@@ -50,14 +109,26 @@ class Corpus(ABC):
         """
 
     @abstractmethod
-    def search(self, clue: str) -> list[tuple[float, str, Citation]]:
+    def store_and_index_many(self, documents: list[tuple[str, Citation]]) -> list[bool]:
+        """Store and index multiple "documents" at once, sharing the round trips to the data stores
+
+        Args:
+            documents (list[tuple[str, Citation]]): list of (document, citation) pairs
+
+        Returns:
+            list[bool]: success or not of each document, in the same order
+        """
+
+    @abstractmethod
+    def search(self, clue: str, settings: SearchSettings = None) -> list[tuple[float, str, Citation]]:
         """Search for (document,citation) pairs related to the clue
 
         Args:
             clue (str): chat query to search for
+            settings (SearchSettings, optional): constrains the depth of the search. Defaults to SearchSettings().
 
         Returns:
-            list[tuple[str, Citation]]: a list of (document, citation) pairs
+            list[tuple[float, str, Citation]]: a list of (score, document, citation) tuples, best first
         """
 
     @abstractmethod
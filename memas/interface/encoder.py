@@ -12,6 +12,10 @@ class TextEncoder(ABC):
         """Initialize the encoder
         """
 
+    def shutdown(self):
+        """Release any resources held by the encoder, like threads or worker processes
+        """
+
     @abstractmethod
     def embed(self, text: str) -> numpy.ndarray:
         """Embed the supplied text
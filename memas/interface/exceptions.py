@@ -31,6 +31,8 @@ class ErrorCode(Enum):
     NamespaceDoesNotExist = "namespace_does_not_exist"
     NamespaceIllegalName = "namespace_illegal_name"
     NamespaceDeleting = "namespace_deleting"
+    IllegalArgument = "illegal_argument"
+    IngestionJobDoesNotExist = "ingestion_job_does_not_exist"
 
 
 class MemasException(Exception):
@@ -53,6 +55,11 @@ class IllegalNameException(MemasException):
         super().__init__(ErrorCode.NamespaceIllegalName, f"\"{pathname}\" is not a valid pathname")
 
 
+class IllegalArgumentException(MemasException):
+    def __init__(self, argument: str, additional_details: str = None) -> None:
+        super().__init__(ErrorCode.IllegalArgument, f"\"{argument}\" is not a valid argument", additional_details)
+
+
 class NamespaceExistsException(MemasException):
     def __init__(self, pathname: str, additional_details: str = None) -> None:
         super().__init__(ErrorCode.NamespaceExists, f"\"{pathname}\" already exists", additional_details)
@@ -64,6 +71,12 @@ class NamespaceDoesNotExistException(MemasException):
                          f"\"{pathname}\" does not exists, you need to create the resource first", additional_details)
 
 
+class IngestionJobDoesNotExistException(MemasException):
+    def __init__(self, ingestion_id: str) -> None:
+        super().__init__(ErrorCode.IngestionJobDoesNotExist, f"Ingestion job \"{ingestion_id}\" does not exist")
+        self.status_code = StatusCode.NOT_FOUND
+
+
 # TODO: properly specify this exception type
 class SentenceLengthOverflowException(Exception):
     def __init__(self, sentence_len: int) -> None:
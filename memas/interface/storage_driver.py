@@ -1,7 +1,8 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
+from enum import Enum
 from uuid import UUID
-from memas.interface.corpus import Citation, CorpusInfo
+from memas.interface.corpus import Citation, CorpusInfo, SearchSettings
 from memas.interface.encoder import TextEncoder
 
 
@@ -20,6 +21,11 @@ class StorageDriver(ABC):
         want to run once, like create table
         """
 
+    def warm_up(self):
+        """Optionally issue cheap requests, so connections, caches and prepared statements are hot before
+        serving traffic. This is ran after init, when warm up is enabled.
+        """
+
 
 class MemasMetadataStore(StorageDriver):
     """
@@ -161,6 +167,18 @@ class CorpusDocumentMetadataStore(StorageDriver):
             bool: success or not
         """
 
+    @abstractmethod
+    def insert_document_metadata_batch(self, corpus_id: UUID, documents: list[tuple[UUID, int, Citation]]) -> bool:
+        """Inserts the metadata of multiple documents within the same corpus
+
+        Args:
+            corpus_id (UUID): corpus id
+            documents (list[tuple[UUID, int, Citation]]): list of (document_id, num_segments, citation) tuples
+
+        Returns:
+            bool: success or not
+        """
+
     @abstractmethod
     def get_document_citation(self, corpus_id: UUID, document_id: UUID) -> Citation:
         """Retrieves the document citation
@@ -173,6 +191,17 @@ class CorpusDocumentMetadataStore(StorageDriver):
             Citation: Citation object of the document
         """
 
+    @abstractmethod
+    def get_document_citations(self, keys: list[tuple[UUID, UUID]]) -> dict[tuple[UUID, UUID], Citation]:
+        """Retrieves the citations of multiple documents at once. Duplicate keys are only fetched once.
+
+        Args:
+            keys (list[tuple[UUID, UUID]]): list of (corpus_id, document_id) pairs
+
+        Returns:
+            dict[tuple[UUID, UUID], Citation]: mapping of (corpus_id, document_id) to the document's Citation
+        """
+
     @abstractmethod
     def delete_corpus(self, corpus_id: UUID):
         """Deletes all citations under a corpus
@@ -188,7 +217,23 @@ class DocumentEntity:
     document_id: UUID
     # while strictly speaking this is metadata, this increases data readability
     document_name: str
+    # None when a store only references the text, see chunk_ids
     document: str
+    # Ids of the document store chunks holding the text, set by stores that don't keep the text themselves
+    chunk_ids: list[str] = None
+
+
+def make_chunk_id(document_id: UUID, chunk_num: int) -> str:
+    """Id of a document's chunk within the document store, which other stores may reference
+
+    Args:
+        document_id (UUID): document id
+        chunk_num (int): index of the chunk within the document
+
+    Returns:
+        str: the chunk id
+    """
+    return document_id.hex + '{:032b}'.format(chunk_num)
 
 
 class CorpusDocumentStore(StorageDriver):
@@ -196,16 +241,41 @@ class CorpusDocumentStore(StorageDriver):
         Corpus Document Store for storing and searching documents
     """
     @abstractmethod
-    def save_documents(self, id_doc_pairs: list[str, DocumentEntity]) -> bool:
+    def save_documents(self, id_doc_pairs: list[tuple[str, DocumentEntity, int, int]]) -> bool:
         """Save a set of documents into the document store
 
         Args:
-            id_doc_pairs (list[str, DocumentEntity]) : Pairs of documentIDs and Document Entities to insert
+            id_doc_pairs (list[tuple[str, DocumentEntity, int, int]]) : Tuples of (chunkID, Document Entity,
+                startIndex, endIndex) to insert. The start and end index are the chunk's character offsets within
+                the original document, and are optional.
 
         Returns:
             bool: success or not
         """
 
+    @abstractmethod
+    def save_documents_batch(self, id_doc_pairs: list[tuple[str, DocumentEntity, int, int]]) -> list[bool]:
+        """Save a set of documents like save_documents, but report whether each one was saved
+
+        Args:
+            id_doc_pairs (list[tuple[str, DocumentEntity, int, int]]) : Tuples of (chunkID, Document Entity,
+                startIndex, endIndex) to insert
+
+        Returns:
+            list[bool]: whether each chunk was saved, in order
+        """
+
+    @abstractmethod
+    def get_chunks(self, chunk_ids: list[str]) -> dict[str, tuple[DocumentEntity, int, int]]:
+        """Retrieves multiple chunks at once by id
+
+        Args:
+            chunk_ids (list[str]): chunk ids, see make_chunk_id
+
+        Returns:
+            dict[str, tuple[DocumentEntity, int, int]]: mapping of the found chunk ids to (chunk, startIndex, endIndex)
+        """
+
     @abstractmethod
     def delete_corpus(self, corpus_id: UUID):
         """delete all documents under a corpus
@@ -215,15 +285,74 @@ class CorpusDocumentStore(StorageDriver):
         """
 
     @abstractmethod
-    def search_corpora(self, corpus_ids: list[UUID], clue: str) -> list[tuple[float, DocumentEntity]]:
+    def search_corpora(self, corpus_ids: list[UUID], clue: str,
+                       settings: SearchSettings = None) -> list[tuple[float, DocumentEntity, int, int]]:
         """Search set of corpora using a clue
 
         Args:
             corpus_ids list[UUID]: corpus ids
             clue (str): clue to search with
+            settings (SearchSettings, optional): constrains the depth of the search. Defaults to SearchSettings().
+
+        Returns:
+            list[tuple[float, DocumentEntity, int, int]]: list of (score, document, startIndex, endIndex), where the
+                indices are the chunk's offsets within the original document, or None if unknown
+        """
+
+
+class IngestionStatus(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+@dataclass
+class IngestionJob:
+    ingestion_id: UUID
+    corpus_pathname: str
+    document: str
+    citation: Citation
+    status: IngestionStatus
+    error: str = None
+
+
+class IngestionJobStore(StorageDriver):
+    """
+        Store persisting asynchronous ingestion requests, until they are processed by the ingestion workers
+    """
+    @abstractmethod
+    def create_job(self, corpus_pathname: str, document: str, citation: Citation) -> UUID:
+        """Persists a new pending ingestion job
+
+        Args:
+            corpus_pathname (str): pathname of the corpus to memorize into
+            document (str): document to memorize
+            citation (Citation): citation of the document
+
+        Returns:
+            UUID: the ingestion id of the job
+        """
+
+    @abstractmethod
+    def get_job(self, ingestion_id: UUID) -> IngestionJob:
+        """Retrieves an ingestion job
+
+        Args:
+            ingestion_id (UUID): ingestion id
 
         Returns:
-            list[tuple[float, DocumentEntity]]: list of (score,document) pairs
+            IngestionJob: the ingestion job
+        """
+
+    @abstractmethod
+    def update_status(self, ingestion_id: UUID, status: IngestionStatus, error: str = None):
+        """Updates the status of an ingestion job
+
+        Args:
+            ingestion_id (UUID): ingestion id
+            status (IngestionStatus): new status of the job
+            error (str, optional): error message, when the job failed
         """
 
 
@@ -237,11 +366,27 @@ class CorpusVectorStore(StorageDriver):
         self.encoder: TextEncoder = encoder
 
     @abstractmethod
-    def save_documents(self, doc_entities: list[DocumentEntity]) -> bool:
-        """Saves a document into the vector store
+    def save_documents(self, doc_entities: list[DocumentEntity],
+                       chunk_offsets: list[list[tuple[int, int]]] = None) -> bool:
+        """Saves documents into the vector store
 
         Args:
-            doc_entity (DocumentEntity): Document Entity object
+            doc_entities (list[DocumentEntity]): Document Entity objects
+            chunk_offsets (list[list[tuple[int, int]]], optional): (startIndex, endIndex) of each document store
+                chunk of each document, in order. Needed by stores referencing the chunks instead of keeping the text.
+        """
+
+    @abstractmethod
+    def save_documents_batch(self, doc_entities: list[DocumentEntity],
+                             chunk_offsets: list[list[tuple[int, int]]] = None) -> list[bool]:
+        """Saves documents like save_documents, but reports whether each one was saved
+
+        Args:
+            doc_entities (list[DocumentEntity]): Document Entity objects
+            chunk_offsets (list[list[tuple[int, int]]], optional): see save_documents
+
+        Returns:
+            list[bool]: whether all vectors of each document were saved, in order
         """
 
     @abstractmethod
@@ -253,13 +398,16 @@ class CorpusVectorStore(StorageDriver):
         """
 
     @abstractmethod
-    def search_corpora(self, corpus_ids: list[UUID], clue: str) -> list[tuple[float, DocumentEntity, int, int]]:
+    def search_corpora(self, corpus_ids: list[UUID], clue: str,
+                       settings: SearchSettings = None) -> list[tuple[float, DocumentEntity, int, int]]:
         """Search set of corpora using a clue
 
         Args:
             corpus_ids list[UUID]: corpus ids
             clue (str): clue to search with
+            settings (SearchSettings, optional): constrains the depth of the search. Defaults to SearchSettings().
 
         Returns:
-            list[tuple[float, DocumentEntity]]: list of (score, document. startIndex, endIndex) pairs that deonte sentence boundaries
+            list[tuple[float, DocumentEntity, int, int]]: list of (score, document, startIndex, endIndex), where the
+                indices denote the sentence boundaries within the original document
         """
@@ -1,5 +1,7 @@
 from app import create_app
+from memas.context_manager import read_env, Role
 
-# This is the necessary entry point for initiating the celery worker
-flask_app = create_app()
+# This is the necessary entry point for initiating the celery worker. Workers default to the ingestion role,
+# since it can run every task, while MEMAS_ROLE=maintenance skips loading the encoder.
+flask_app = create_app(role=read_env("MEMAS_ROLE", Role.INGESTION.value))
 celery_app = flask_app.extensions["celery"]
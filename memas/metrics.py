@@ -0,0 +1,110 @@
+import bisect
+import threading
+import time
+from typing import Callable, Final
+
+
+class Counter:
+    """
+    Monotonically increasing counter
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.value: int = 0
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self) -> int:
+        return self.value
+
+
+# Default histogram bucket upper bounds, suited to latencies in milliseconds
+DEFAULT_BUCKETS: Final[tuple[float, ...]] = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class Histogram:
+    """
+    Cumulative histogram of observed values, with fixed bucket upper bounds
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self._lock = threading.Lock()
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets))
+        # The last count is for values beyond the largest bucket
+        self.counts: list[int] = [0] * (len(self.buckets) + 1)
+        self.count: int = 0
+        self.sum: float = 0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self.counts)
+            count, total = self.count, self.sum
+
+        cumulative, buckets = 0, dict()
+        for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        return {"count": count, "sum": total, "buckets": buckets}
+
+
+class MetricsRegistry:
+    """
+    Process local registry of named metrics
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.metrics: dict[str, object] = dict()
+
+    def _get_or_create(self, name: str, metric_cls, *args):
+        with self._lock:
+            if name not in self.metrics:
+                self.metrics[name] = metric_cls(*args)
+            return self.metrics[name]
+
+    def counter(self, name: str) -> Counter:
+        return self._get_or_create(name, Counter)
+
+    def histogram(self, name: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(name, Histogram, buckets)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            metrics = dict(self.metrics)
+        return {name: metric.snapshot() for name, metric in sorted(metrics.items())}
+
+
+class Stopwatch:
+    """
+    Times consecutive named phases, like the steps of a cold start
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.clock: Callable[[], float] = clock
+        self.start: float = clock()
+        self.last: float = self.start
+        self.phases: dict[str, float] = dict()
+
+    def lap(self, phase: str):
+        """Records the time since the previous lap as the duration of this phase
+        """
+        now = self.clock()
+        self.phases[phase] = self.phases.get(phase, 0) + now - self.last
+        self.last = now
+
+    def summary(self) -> str:
+        phases = " ".join(f"[{phase}={duration:.3f}s]" for phase, duration in self.phases.items())
+        return f"[total={self.last - self.start:.3f}s] {phases}"
+
+
+REGISTRY: Final[MetricsRegistry] = MetricsRegistry()
@@ -1,9 +1,13 @@
+from collections import defaultdict
 from datetime import datetime
 import logging
+from typing import Final
+import uuid
 from uuid import UUID
-from cassandra.cqlengine import columns, management
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.cqlengine import columns, connection, management
 from cassandra.cqlengine.models import Model
-from cassandra.cqlengine.query import DoesNotExist
+from cassandra.cqlengine.query import BatchQuery, BatchType, DoesNotExist
 from memas.interface.corpus import Citation
 from memas.interface.exceptions import DocumentMetadataNotFound
 from memas.interface.storage_driver import CorpusDocumentMetadataStore
@@ -12,6 +16,14 @@ from memas.interface.storage_driver import CorpusDocumentMetadataStore
 _log = logging.getLogger(__name__)
 
 
+# Max number of partitions (corpora) read in parallel when retrieving citations in bulk
+MAX_CONCURRENT_PARTITION_READS: Final[int] = 16
+# Max number of document ids within a single "IN" clause, larger sets are split into multiple reads
+MAX_DOCUMENTS_PER_READ: Final[int] = 100
+# Max number of documents within a single insert batch, to stay under cassandra's batch size limits
+MAX_DOCUMENTS_PER_BATCH: Final[int] = 50
+
+
 class DocumentMetadata(Model):
     corpus_id = columns.UUID(partition_key=True)
     document_id = columns.UUID(primary_key=True)
@@ -25,7 +37,28 @@ class DocumentMetadata(Model):
     tags = columns.List(value_type=columns.Text)
 
 
+def group_document_keys(keys: list[tuple[UUID, UUID]]) -> dict[UUID, list[UUID]]:
+    """Dedupes (corpus_id, document_id) pairs and groups the document ids by their corpus id partition
+
+    Args:
+        keys (list[tuple[UUID, UUID]]): list of (corpus_id, document_id) pairs
+
+    Returns:
+        dict[UUID, list[UUID]]: mapping of corpus_id to its unique document ids, in order of first appearance
+    """
+    partitions: dict[UUID, dict[UUID, None]] = defaultdict(dict)
+    for corpus_id, document_id in keys:
+        partitions[corpus_id][document_id] = None
+    return {corpus_id: list(document_ids) for corpus_id, document_ids in partitions.items()}
+
+
 class CorpusDocumentMetadataStoreImpl(CorpusDocumentMetadataStore):
+    def __init__(self) -> None:
+        super().__init__()
+        # Prepared statements are bound to a session, so we keep track of which session this was prepared on
+        self._citations_statement = None
+        self._citations_session = None
+
     def init(self):
         management.sync_table(DocumentMetadata)
 
@@ -55,6 +88,33 @@ class CorpusDocumentMetadataStoreImpl(CorpusDocumentMetadataStore):
                                 added_at=datetime.now())
         return True
 
+    def insert_document_metadata_batch(self, corpus_id: UUID, documents: list[tuple[UUID, int, Citation]]) -> bool:
+        """Inserts the metadata of multiple documents within the same corpus. Since all rows share the
+        corpus id partition, each batch is unlogged and applied as a single mutation.
+
+        Args:
+            corpus_id (UUID): corpus id
+            documents (list[tuple[UUID, int, Citation]]): list of (document_id, num_segments, citation) tuples
+
+        Returns:
+            bool: success or not
+        """
+        _log.debug(f"Inserting document metadata for [corpus_id={corpus_id.hex}] [num_documents={len(documents)}]")
+
+        now = datetime.now()
+        for i in range(0, len(documents), MAX_DOCUMENTS_PER_BATCH):
+            with BatchQuery(batch_type=BatchType.Unlogged) as batch_query:
+                for document_id, num_segments, citation in documents[i:i + MAX_DOCUMENTS_PER_BATCH]:
+                    DocumentMetadata.batch(batch_query).create(corpus_id=corpus_id,
+                                                               document_id=document_id,
+                                                               document_name=citation.document_name,
+                                                               source_name=citation.source_name,
+                                                               source_uri=citation.source_uri,
+                                                               description=citation.description,
+                                                               segment_count=num_segments,
+                                                               added_at=now)
+        return True
+
     def get_document_citation(self, corpus_id: UUID, document_id: UUID) -> [Citation | None]:
         """Retrieves the document citation
 
@@ -76,6 +136,61 @@ class CorpusDocumentMetadataStoreImpl(CorpusDocumentMetadataStore):
                         description=result.description,
                         document_name=result.document_name)
 
+    def warm_up(self):
+        session = connection.get_session()
+        statement = self._prepare_citations_statement(session)
+        session.execute(statement, (uuid.uuid4(), [uuid.uuid4()]))
+
+    def _prepare_citations_statement(self, session):
+        if self._citations_session is not session:
+            self._citations_statement = session.prepare(
+                f"SELECT corpus_id, document_id, document_name, source_name, source_uri, description "
+                f"FROM {DocumentMetadata.column_family_name()} WHERE corpus_id = ? AND document_id IN ?")
+            self._citations_session = session
+        return self._citations_statement
+
+    def get_document_citations(self, keys: list[tuple[UUID, UUID]]) -> dict[tuple[UUID, UUID], Citation]:
+        """Retrieves the citations of multiple documents at once. Keys are deduped and grouped by
+        corpus id, then each partition is read concurrently.
+
+        Args:
+            keys (list[tuple[UUID, UUID]]): list of (corpus_id, document_id) pairs
+
+        Returns:
+            dict[tuple[UUID, UUID], Citation]: mapping of (corpus_id, document_id) to the document's Citation
+        """
+        partitions = group_document_keys(keys)
+        if not partitions:
+            return {}
+
+        parameters = []
+        for corpus_id, document_ids in partitions.items():
+            for i in range(0, len(document_ids), MAX_DOCUMENTS_PER_READ):
+                parameters.append((corpus_id, document_ids[i:i + MAX_DOCUMENTS_PER_READ]))
+
+        _log.debug(f"Retrieving document citations for [num_corpora={len(partitions)}] [num_reads={len(parameters)}]")
+
+        session = connection.get_session()
+        statement = self._prepare_citations_statement(session)
+        results = execute_concurrent_with_args(session, statement, parameters,
+                                               concurrency=MAX_CONCURRENT_PARTITION_READS, raise_on_first_error=True)
+
+        citations: dict[tuple[UUID, UUID], Citation] = dict()
+        for _, rows in results:
+            for row in rows:
+                citations[(row["corpus_id"], row["document_id"])] = Citation(source_uri=row["source_uri"],
+                                                                             source_name=row["source_name"],
+                                                                             description=row["description"],
+                                                                             document_name=row["document_name"])
+
+        for corpus_id, document_ids in partitions.items():
+            for document_id in document_ids:
+                if (corpus_id, document_id) not in citations:
+                    _log.error(
+                        f"Document citation not found for [corpus_id={corpus_id.hex}] [document_id={document_id.hex}]")
+                    raise DocumentMetadataNotFound(corpus_id, document_id)
+        return citations
+
     def get_document_segment_count(self, corpus_id: UUID, document_id: UUID) -> int:
         """Retrieves the number of segments a stored document was split into 
 
@@ -1,7 +1,9 @@
 import logging
 from typing import Final
+import uuid
 from uuid import UUID
 from elasticsearch import Elasticsearch, helpers
+from memas.interface.corpus import SearchSettings
 from memas.interface.storage_driver import CorpusDocumentStore, DocumentEntity
 
 
@@ -14,6 +16,8 @@ CORPUS_INDEX: Final[str] = "memas-documents"
 CORPUS_FIELD: Final[str] = "corpus_id"
 NAME_FIELD: Final[str] = "name"
 DOC_FIELD: Final[str] = "content"
+START_FIELD: Final[str] = "start_index"
+END_FIELD: Final[str] = "end_index"
 
 
 class ESDocumentStore(CorpusDocumentStore):
@@ -26,6 +30,10 @@ class ESDocumentStore(CorpusDocumentStore):
         # nothing needed for ES
         return
 
+    def warm_up(self):
+        # Search a corpus that doesn't exist, which goes through the same query path as real searches
+        self.es.search(index=self.es_index, query={"term": {CORPUS_FIELD: uuid.uuid4().hex}}, size=1)
+
     def first_init(self):
         mapping = {
             "properties": {
@@ -41,35 +49,57 @@ class ESDocumentStore(CorpusDocumentStore):
                     "type":  "text",
                     "index": True
                 },
+                START_FIELD: {
+                    "type": "integer",
+                    "index": False
+                },
+                END_FIELD: {
+                    "type": "integer",
+                    "index": False
+                },
             }
         }
         response = self.es.indices.create(
             index=self.es_index, mappings=mapping)
         return response["acknowledged"]
 
-    def save_documents(self, id_doc_pairs: list[str, DocumentEntity]) -> bool:
+    def save_documents(self, id_doc_pairs: list[tuple[str, DocumentEntity, int, int]]) -> bool:
         # TODO : Error handling in case of failures to insert
         # TODO : Redo this to have real return (this just checks that at least one insert succeeds)
         return helpers.bulk(self.es, self.gen_insertion_data(id_doc_pairs))[0] != 0
 
-    def gen_insertion_data(self, id_doc_pairs: list[str, DocumentEntity]):
+    def save_documents_batch(self, id_doc_pairs: list[tuple[str, DocumentEntity, int, int]]) -> list[bool]:
+        _, errors = helpers.bulk(self.es, self.gen_insertion_data(id_doc_pairs), raise_on_error=False,
+                                 raise_on_exception=False)
+        # Each error is keyed by its op type, like {"index": {"_id": ..., "error": ...}}
+        failed_ids = {info.get("_id") for error in errors for info in error.values()}
+        if failed_ids:
+            _log.warning(f"Failed to save chunks [chunk_ids={sorted(failed_ids)}] "
+                         f"[error={next(iter(errors[0].values())).get('error')}]")
+        return [chunk_id not in failed_ids for chunk_id, *_ in id_doc_pairs]
+
+    def gen_insertion_data(self, id_doc_pairs: list[tuple[str, DocumentEntity, int, int]]):
         _log.debug(
             f"Saving documents for [corpus_ids={[x[1].corpus_id for x in id_doc_pairs]}] [chunk_ids={[x[0] for x in id_doc_pairs]}]")
-        for i in range(len(id_doc_pairs)):
-            yield {
+        for chunk_id, doc_entity, *offsets in id_doc_pairs:
+            data = {
                 "_index": self.es_index,
-                "_id": id_doc_pairs[i][0],
-                CORPUS_FIELD: id_doc_pairs[i][1].corpus_id.hex,
-                NAME_FIELD: id_doc_pairs[i][1].document_name,
-                DOC_FIELD: id_doc_pairs[i][1].document
+                "_id": chunk_id,
+                CORPUS_FIELD: doc_entity.corpus_id.hex,
+                NAME_FIELD: doc_entity.document_name,
+                DOC_FIELD: doc_entity.document
             }
+            # The chunk offsets within the original document are optional
+            if offsets:
+                data[START_FIELD], data[END_FIELD] = offsets
+            yield data
 
-    def search_corpora(self, corpus_ids: list[UUID], clue: str) -> list[tuple[float, DocumentEntity]]:
+    def search_corpora(self, corpus_ids: list[UUID], clue: str,
+                       settings: SearchSettings = None) -> list[tuple[float, DocumentEntity, int, int]]:
+        if settings is None:
+            settings = SearchSettings()
+        _log.debug(f"Searching documents for [corpus_ids={corpus_ids}] [count={settings.doc_search_count}]")
 
-        _log.debug(f"Searching documents for [corpus_ids={corpus_ids}]")
-
-        # TODO: Need to look into how many documents to return
-        max_retrieved = 20
         search_query = {
             "bool": {
                 "must": [
@@ -80,7 +110,7 @@ class ESDocumentStore(CorpusDocumentStore):
                 ]
             }
         }
-        response = self.es.search(index=self.es_index, query=search_query, size=max_retrieved)
+        response = self.es.search(index=self.es_index, query=search_query, size=settings.doc_search_count)
 
         # Record the time it took
         time = response["took"]
@@ -89,11 +119,27 @@ class ESDocumentStore(CorpusDocumentStore):
         result = []
         for hit in response["hits"]["hits"]:
             data = hit["_source"]
+            # Chunks stored before offsets were tracked won't have them, in which case they are None
             result.append((hit["_score"], DocumentEntity(corpus_id=UUID(data[CORPUS_FIELD]), document_id=UUID(
-                hit["_id"][:32]), document_name=data[NAME_FIELD], document=data[DOC_FIELD])))
+                hit["_id"][:32]), document_name=data[NAME_FIELD], document=data[DOC_FIELD]),
+                data.get(START_FIELD), data.get(END_FIELD)))
 
         return result
 
+    def get_chunks(self, chunk_ids: list[str]) -> dict[str, tuple[DocumentEntity, int, int]]:
+        _log.debug(f"Getting chunks [count={len(chunk_ids)}]")
+        response = self.es.mget(index=self.es_index, ids=chunk_ids)
+
+        chunks = dict()
+        for doc in response["docs"]:
+            if not doc.get("found"):
+                continue
+            data = doc["_source"]
+            chunks[doc["_id"]] = (DocumentEntity(corpus_id=UUID(data[CORPUS_FIELD]), document_id=UUID(doc["_id"][:32]),
+                                                 document_name=data[NAME_FIELD], document=data[DOC_FIELD]),
+                                  data.get(START_FIELD), data.get(END_FIELD))
+        return chunks
+
     def delete_corpus(self, corpus_id: UUID):
         _log.debug(f"Deleting documents for [corpus_id={corpus_id}]")
         delete_query = {
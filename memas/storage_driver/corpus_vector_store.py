@@ -1,5 +1,10 @@
+import bisect
+from collections import defaultdict
 from dataclasses import dataclass
+import json
 import logging
+import time
+from typing import Callable
 import uuid
 import numpy as np
 from pymilvus import (
@@ -7,10 +12,15 @@ from pymilvus import (
     CollectionSchema,
     DataType,
     Collection,
+    MilvusException,
+    utility,
 )
+from memas.interface.corpus import SearchSettings
 from memas.interface.encoder import TextEncoder
-from memas.interface.storage_driver import CorpusVectorStore, DocumentEntity
-from memas.text_parsing.text_parsers import split_doc
+from memas.interface.exceptions import IllegalStateException
+from memas.interface.storage_driver import CorpusVectorStore, DocumentEntity, make_chunk_id
+from memas.storage_driver.milvus_partitions import PartitionLoader, PartitionPlacement
+from memas.text_parsing.text_parsers import locate_segments, split_doc
 
 
 _log = logging.getLogger(__name__)
@@ -26,8 +36,30 @@ EMBEDDING_FIELD = "embedding"
 START_FIELD = "start_index"
 END_FIELD = "end_index"
 TEXT_PREVIEW = "text_preview"
+# First and last document store chunk holding the sentence, which slim records reference instead of keeping the text
+FIRST_CHUNK = "first_chunk"
+LAST_CHUNK = "last_chunk"
 
 MAX_TEXT_LENGTH = 1024
+# Number of sentences embedded per encoder call, sentences of different documents are batched together
+ENCODER_BATCH_SIZE = 256
+# Max number of rows per milvus insert, to keep each request well under the grpc message size limit
+MAX_INSERT_ROWS = 4096
+
+# Scores are L2 distances between unit vectors, which score fusion relies on
+METRIC_TYPE = "L2"
+# Brute force search, which is exact but scans every vector of the searched partitions
+DEFAULT_INDEX_TYPE = "FLAT"
+# Max number of hits milvus returns per query vector
+MAX_TOP_K = 16384
+# Rows copied per batch when rebuilding the collection
+REBUILD_BATCH_SIZE = 1000
+# Partition milvus inserts into when none is named
+DEFAULT_PARTITION = "_default"
+# Rough memory of a loaded row besides its embedding, covering the ids, document name, text preview and offsets
+ROW_OVERHEAD_BYTES = 512
+# Rough memory of a loaded slim row besides its embedding, covering the ids, offsets and chunk numbers
+SLIM_ROW_OVERHEAD_BYTES = 128
 
 
 @dataclass
@@ -39,41 +71,149 @@ class MilvusSentenceObject:
     embedding: np.ndarray
     start_index: int
     end_index: int
+    first_chunk: int = None
+    last_chunk: int = None
 
-    def to_data(self):
-        return [
-            [self.composite_id],
-            [self.corpus_id],
-            [self.document_name],
-            [self.text_preview],
-            self.embedding,
-            [self.start_index],
-            [self.end_index]
-        ]
+
+def corpus_filter(corpus_ids: list[uuid.UUID]) -> str:
+    # A single "in" term, rather than one comparison per corpus chained with ORs
+    return f"{CORPUS_FIELD} in {json.dumps([x.hex for x in corpus_ids])}"
 
 
 def hash_sentence_id(document_id: uuid.UUID, sentence: str) -> uuid.UUID:
     return uuid.uuid5(document_id, sentence)
 
 
-def convert_batch(objects: list[MilvusSentenceObject]):
-    composite_ids, corpus_ids, document_names = [], [], []
-    text_previews, embeddings, start_indices, end_indices = [], [], [], []
-    for obj in objects:
-        composite_ids.append(obj.composite_id)
-        corpus_ids.append(obj.corpus_id)
-        document_names.append(obj.document_name)
-        text_previews.append(obj.text_preview)
-        embeddings.append(obj.embedding)
-        start_indices.append(obj.start_index)
-        end_indices.append(obj.end_index)
+def convert_batch(objects: list[MilvusSentenceObject], field_names: list[str]) -> list:
+    """Converts the objects into column based data, with one column per schema field. The field names match the
+    MilvusSentenceObject attribute names.
+    """
+    columns = []
+    for field_name in field_names:
+        if field_name == EMBEDDING_FIELD:
+            # Encoders like ada produce float64 embeddings, which milvus stores as float32 anyways
+            columns.append(np.row_stack([obj.embedding for obj in objects]).astype(np.float32, copy=False))
+        else:
+            columns.append([getattr(obj, field_name) for obj in objects])
+    return columns
+
+
+def locate_chunks(chunk_offsets: list[tuple[int, int]], start: int, end: int) -> tuple[int, int]:
+    """Finds the first and last chunk overlapping the [start, end) offsets, chunks being ordered by offset
+    """
+    chunk_starts = [chunk_start for chunk_start, _ in chunk_offsets]
+    first = max(bisect.bisect_right(chunk_starts, start) - 1, 0)
+    last = max(bisect.bisect_left(chunk_starts, end) - 1, first)
+    return first, last
+
+
+@dataclass
+class RankedHit:
+    """
+    Milvus hit with a recomputed distance, like one aggregated across the clue vectors or an exact one
+    """
+    id: str
+    distance: float
+    entity: object
+
+
+def pool_embeddings(embeddings: list[np.ndarray], max_vectors: int) -> list[np.ndarray]:
+    """Pools consecutive embeddings together until at most max_vectors remain. Each pooled vector is the
+    normalized mean of its group, so it stays a unit vector like the stored sentence embeddings.
+
+    Args:
+        embeddings (list[np.ndarray]): embeddings of the clue sentences, in order
+        max_vectors (int): max number of vectors to return
+
+    Returns:
+        list[np.ndarray]: the embeddings as is if there are few enough, otherwise the pooled embeddings
+    """
+    if len(embeddings) <= max_vectors:
+        return list(embeddings)
+    pooled = []
+    for group in np.array_split(np.stack(embeddings), max_vectors):
+        mean = group.mean(axis=0)
+        norm = np.linalg.norm(mean)
+        pooled.append(mean / norm if norm > 0 else mean)
+    return pooled
+
+
+def aggregate_hits(hit_lists: list[list], aggregation: str, limit: int) -> list[RankedHit]:
+    """Merges the hit lists of multiple query vectors, so each composite id is returned once
 
-    return [composite_ids, corpus_ids, document_names, text_previews, np.row_stack(embeddings), start_indices, end_indices]
+    Args:
+        hit_lists (list[list]): milvus hits of each query vector, each hit having an id and an L2 distance
+        aggregation (str): "max" keeps the best distance of each id, "sum" sums each id's similarity,
+            measured as 2 - distance. Summed similarities are mapped back onto a distance, which can drop below 0
+            for ids matching several clue sentences.
+        limit (int): max number of hits to return
+
+    Returns:
+        list[RankedHit]: the best hits with their aggregated distance, best first
+    """
+    best_hits = dict()
+    similarities: dict[str, float] = defaultdict(float)
+    for hits in hit_lists:
+        for hit in hits:
+            similarities[hit.id] += 2 - hit.distance
+            if hit.id not in best_hits or hit.distance < best_hits[hit.id].distance:
+                best_hits[hit.id] = hit
+
+    if aggregation == "sum":
+        distances = {hit_id: 2 - similarity for hit_id, similarity in similarities.items()}
+    else:
+        distances = {hit_id: hit.distance for hit_id, hit in best_hits.items()}
+
+    merged = []
+    for hit_id in sorted(distances, key=distances.get)[:limit]:
+        hit = best_hits[hit_id]
+        merged.append(RankedHit(hit_id, distances[hit_id], hit.entity))
+    return merged
 
 
 class MilvusSentenceVectorStore(CorpusVectorStore):
-    def __init__(self, sentence_encoder: TextEncoder) -> None:
+    def __init__(self, sentence_encoder: TextEncoder, *, clue_encoder: TextEncoder = None,
+                 init_encoder: bool = True, index_type: str = DEFAULT_INDEX_TYPE, index_params: dict = None,
+                 search_params: dict = None, placement: PartitionPlacement = None,
+                 memory_budget_bytes: int = 0, slim_schema: bool = False, rerank_oversample: int = 1) -> None:
+        """
+        Args:
+            sentence_encoder (TextEncoder): encoder used for embedding sentences
+            clue_encoder (TextEncoder, optional): encoder used for embedding search clues, like a caching wrapper
+                around the sentence encoder. It must share the sentence encoder's model, since only the sentence
+                encoder is initialized by this store. Defaults to the sentence encoder.
+            init_encoder (bool, optional): whether init loads the encoder. Processes that only delete vectors
+                can skip loading the model.
+            index_type (str, optional): milvus index type of the embeddings, like FLAT, IVF_FLAT, IVF_SQ8 or HNSW
+            index_params (dict, optional): index build params, like {"nlist": 1024} or {"M": 16, "efConstruction": 200}
+            search_params (dict, optional): index search params, like {"nprobe": 16} or {"ef": 128}
+            placement (PartitionPlacement, optional): places each corpus within a named partition, which is loaded
+                on demand within the memory budget. By default milvus hashes the corpus id into partitions itself,
+                which requires loading the whole collection.
+            memory_budget_bytes (int, optional): estimated memory the loaded partitions may take, when placing
+                corpora within partitions. Unlimited if 0.
+            slim_schema (bool, optional): only store ids, offsets and the chunk numbers of the sentences, instead of
+                their text and document name. Searches then return hits referencing the document store chunks, see
+                resolve_texts. This only applies to new collections, since rebuilds can't derive the chunk numbers.
+            rerank_oversample (int, optional): when above 1, searches retrieve this many times the requested hits,
+                then rerank them by their exact distance. Meant for quantized indexes like IVF_SQ8.
+        """
         super().__init__(sentence_encoder)
+        self.clue_encoder: TextEncoder = clue_encoder if clue_encoder else sentence_encoder
+        self.init_encoder: bool = init_encoder
+        self.index_type: str = index_type
+        self.index_params: dict = index_params if index_params else {}
+        self.search_params: dict = search_params if search_params else {}
+        self.placement: PartitionPlacement = placement
+        self.slim_schema: bool = slim_schema
+        self.rerank_oversample: int = rerank_oversample
+        # Placement of the collection being served, which differs from the configured one until it's rebuilt
+        self.active_placement: PartitionPlacement = placement
+        self.known_partitions: set[str] = set()
+        self.partition_loader: PartitionLoader = PartitionLoader(
+            lambda partition: self.collection.load(partition_names=[partition]),
+            lambda partition: self.collection.release(partition_names=[partition]),
+            self._estimate_partition_bytes, memory_budget_bytes)
         # Don't instantiate the Collection object yet, since the constructor creates the collection in milvus
         self.collection: Collection
         fields = [
@@ -82,85 +222,486 @@ class MilvusSentenceVectorStore(CorpusVectorStore):
             FieldSchema(name=COMPOSITE_ID, dtype=DataType.VARCHAR,
                         max_length=64, is_primary=True, auto_id=False),
             FieldSchema(name=CORPUS_FIELD, dtype=DataType.VARCHAR,
-                        max_length=32, is_partition_key=True),
-            FieldSchema(name=DOCUMENT_NAME, dtype=DataType.VARCHAR,
-                        max_length=256),
-            FieldSchema(name=TEXT_PREVIEW, dtype=DataType.VARCHAR, max_length=MAX_TEXT_LENGTH),
+                        max_length=32, is_partition_key=placement is None),
+        ]
+        if not slim_schema:
+            fields.extend([
+                FieldSchema(name=DOCUMENT_NAME, dtype=DataType.VARCHAR,
+                            max_length=256),
+                FieldSchema(name=TEXT_PREVIEW, dtype=DataType.VARCHAR, max_length=MAX_TEXT_LENGTH),
+            ])
+        fields.extend([
             FieldSchema(name=EMBEDDING_FIELD, dtype=DataType.FLOAT_VECTOR, dim=self.encoder.VECTOR_DIMENSION),
             FieldSchema(name=START_FIELD, dtype=DataType.INT64),
             FieldSchema(name=END_FIELD, dtype=DataType.INT64),
-        ]
+        ])
+        if slim_schema:
+            fields.extend([
+                FieldSchema(name=FIRST_CHUNK, dtype=DataType.INT64),
+                FieldSchema(name=LAST_CHUNK, dtype=DataType.INT64),
+            ])
         self.sentance_schema: CollectionSchema = CollectionSchema(
             fields, "Corpus Vector Table for storing sentence embeddings")
         self.collection_name: str = ENCODER_COLLECTION_NAME.format(encoder=self.encoder.ENCODER_NAME)
 
-    def first_init(self):
-        self.collection: Collection = Collection(self.collection_name, self.sentance_schema)
-        index = {
-            "index_type": "FLAT",
-            "metric_type": "L2",
-            "params": {},
+    def _field_names(self) -> list[str]:
+        return [field.name for field in self.sentance_schema.fields]
+
+    def index_config(self) -> dict:
+        return {
+            "index_type": self.index_type,
+            "metric_type": METRIC_TYPE,
+            "params": self.index_params,
         }
-        self.collection.create_index(EMBEDDING_FIELD, index)
-        self.collection.load()
-        self.encoder.init()
+
+    def _create_collection(self) -> Collection:
+        """Creates an indexed collection under a versioned name, which the store's collection name is an alias of.
+        This way rebuild_index can later switch the alias to a rebuilt collection without downtime.
+        """
+        name = f"{self.collection_name}_{int(time.time())}"
+        collection = Collection(name, self.sentance_schema)
+        collection.create_index(EMBEDDING_FIELD, self.index_config())
+        utility.create_alias(name, self.collection_name)
+        _log.info(f"Created vector collection [collection={name}] [alias={self.collection_name}]")
+        return Collection(self.collection_name)
+
+    def first_init(self):
+        self.collection: Collection = self._create_collection()
+        if self.placement is None:
+            self.collection.load()
 
     def init(self):
-        self.collection: Collection = Collection(self.collection_name, self.sentance_schema)
-        self.collection.load()
-        self.encoder.init()
-
-    def search_corpora(self, corpus_ids: list[uuid.UUID], clue: str) -> list[tuple[float, DocumentEntity, int, int]]:
-        _log.debug(f"Searching vectors for [corpus_ids={corpus_ids}]")
-        _log.handlers
-
-        vec_search_count = 100
-        # Create boolean expression to match all data in the corpus set
-        filter_str = ""
-        for corpus_id in corpus_ids:
-            filter_str += f"{CORPUS_FIELD} == \"{corpus_id.hex}\" ||"
-
-        # Remove last OR
-        filter_str = filter_str[:-2]
-
-        clue_split = split_doc(clue, MAX_TEXT_LENGTH)
-        result = self.collection.search([x.tolist() for x in self.encoder.embed_multiple(clue_split)], EMBEDDING_FIELD, param={},
-                                        limit=vec_search_count, expr=filter_str,
-                                        output_fields=[CORPUS_FIELD, START_FIELD, END_FIELD, DOCUMENT_NAME, TEXT_PREVIEW])
+        if utility.has_collection(self.collection_name):
+            # Opened without the schema, since a collection of a different placement is still served until rebuilt
+            self.collection: Collection = Collection(self.collection_name)
+        else:
+            self.collection: Collection = self._create_collection()
+
+        is_slim = all(field.name != TEXT_PREVIEW for field in self.collection.schema.fields)
+        if is_slim != self.slim_schema:
+            raise IllegalStateException(f"Vector collection \"{self.collection_name}\" doesn't match the configured "
+                                        f"slim schema setting, which only applies to new collections")
+        if not self._matches_placement(self.collection):
+            _log.error(f"Vector collection doesn't match the configured partition placement, loading all of it "
+                       f"until rebuilt with rebuild-vector-index [collection={self.collection_name}]")
+            self.active_placement = None
+        else:
+            self.active_placement = self.placement
+
+        # Partitions are otherwise loaded on demand
+        if self.active_placement is None:
+            self.collection.load()
+        if self.init_encoder:
+            self.encoder.init()
+
+    def _matches_placement(self, collection: Collection) -> bool:
+        uses_partition_key = any(field.name == CORPUS_FIELD and field.is_partition_key
+                                 for field in collection.schema.fields)
+        return uses_partition_key == (self.placement is None)
+
+    def _refresh_placement(self) -> bool:
+        """Checks whether a rebuild switched the collection name over to the configured partition placement, while
+        this store kept serving the previous collection without it. Only then is the placement switched, since the
+        rebuilt collection is released and its rows must not be inserted into the default partition.
+
+        Returns:
+            bool: whether the placement was switched
+        """
+        if self.placement is None or self.active_placement is not None:
+            return False
+        # The schema is cached by the Collection object, so describe the collection the name points at now
+        collection = Collection(self.collection_name)
+        if not self._matches_placement(collection):
+            return False
+        self.collection = collection
+        self.known_partitions.clear()
+        self.partition_loader.invalidate(list(self.partition_loader.loaded.keys()))
+        self.active_placement = self.placement
+        _log.info(f"Vector collection was rebuilt onto the configured partition placement, switching to it "
+                  f"[collection={self.collection_name}]")
+        return True
+
+    def _estimate_partition_bytes(self, partition: str) -> int:
+        row_bytes = self.encoder.VECTOR_DIMENSION * 4 + (SLIM_ROW_OVERHEAD_BYTES if self.slim_schema
+                                                         else ROW_OVERHEAD_BYTES)
+        return self.collection.partition(partition).num_entities * row_bytes
+
+    def _has_partition(self, partition: str) -> bool:
+        # Only existence is cached, since partitions are never dropped outside of rebuilds
+        if partition not in self.known_partitions and self.collection.has_partition(partition):
+            self.known_partitions.add(partition)
+        return partition in self.known_partitions
+
+    def _partitions_of(self, corpus_ids: list[uuid.UUID]) -> list[str]:
+        partitions = {self.active_placement.partition_of(corpus_id) for corpus_id in corpus_ids}
+        return sorted(partition for partition in partitions if self._has_partition(partition))
+
+    def warm_up(self):
+        if self.active_placement is not None:
+            # Nothing is loaded until searched, hot corpora are warmed up by searching them instead
+            return
+        # Search with a zero vector, so the collection is queried once without needing the encoder
+        self.collection.search([[0.0] * self.encoder.VECTOR_DIMENSION], EMBEDDING_FIELD,
+                               param={"metric_type": METRIC_TYPE, "params": self.search_params}, limit=1,
+                               expr=f"{CORPUS_FIELD} == \"{uuid.uuid4().hex}\"")
+
+    def _search_params_for(self, limit: int) -> dict:
+        # HNSW rejects searches where ef is smaller than the number of requested hits
+        params = dict(self.search_params)
+        if "ef" in params:
+            params["ef"] = max(params["ef"], limit)
+        return params
+
+    def search_corpora(self, corpus_ids: list[uuid.UUID], clue: str,
+                       settings: SearchSettings = None) -> list[tuple[float, DocumentEntity, int, int]]:
+        if settings is None:
+            settings = SearchSettings()
+        _log.debug(f"Searching vectors for [corpus_ids={corpus_ids}] [count={settings.vec_search_count}]")
+
+        clue_vectors = self.clue_encoder.embed_multiple(split_doc(clue, MAX_TEXT_LENGTH))
+        num_vectors = 1 if settings.clue_aggregation == "pooled" else settings.max_clue_vectors
+        clue_vectors = pool_embeddings(clue_vectors, num_vectors)
+        if not clue_vectors:
+            return []
+
+        def search(partition_names: list[str]) -> list:
+            return self._search_vectors(clue_vectors, corpus_ids, settings.vec_search_count, partition_names)
+
+        if self.active_placement is None:
+            try:
+                result = search(None)
+            except MilvusException:
+                # The collection may have been rebuilt onto partitions, which aren't loaded
+                if not self._refresh_placement():
+                    raise
+                result = self._on_partitions(corpus_ids, search)
+        else:
+            result = self._on_partitions(corpus_ids, search)
+        if settings.clue_aggregation == "none":
+            hits = [hit for clue_hits in result for hit in clue_hits]
+        else:
+            hits = aggregate_hits(result, settings.clue_aggregation, settings.vec_search_count)
+
         output = []
-        for hits in result:
-            for hit in hits:
-                doc_entity = DocumentEntity(uuid.UUID(hit.entity.corpus_id), uuid.UUID(
-                    hit.id[:32]), hit.entity.document_name, hit.entity.text_preview)
-                output.append((hit.distance, doc_entity, hit.entity.start_index, hit.entity.end_index))
+        for hit in hits:
+            document_id = uuid.UUID(hit.id[:32])
+            if self.slim_schema:
+                chunk_ids = [make_chunk_id(document_id, chunk_num)
+                             for chunk_num in range(hit.entity.first_chunk, hit.entity.last_chunk + 1)]
+                doc_entity = DocumentEntity(uuid.UUID(hit.entity.corpus_id), document_id, None, None, chunk_ids)
+            else:
+                doc_entity = DocumentEntity(uuid.UUID(hit.entity.corpus_id), document_id,
+                                            hit.entity.document_name, hit.entity.text_preview)
+            output.append((hit.distance, doc_entity, hit.entity.start_index, hit.entity.end_index))
         return output
 
-    def save_documents(self, doc_entities: list[DocumentEntity]) -> bool:
-        _log.debug(f"Saving vectors for [corpus_ids={[x.corpus_id for x in doc_entities]}]")
+    def _output_fields(self) -> list[str]:
+        if self.slim_schema:
+            return [CORPUS_FIELD, START_FIELD, END_FIELD, FIRST_CHUNK, LAST_CHUNK]
+        return [CORPUS_FIELD, START_FIELD, END_FIELD, DOCUMENT_NAME, TEXT_PREVIEW]
+
+    def _search_vectors(self, clue_vectors: list[np.ndarray], corpus_ids: list[uuid.UUID], limit: int,
+                        partition_names: list[str]) -> list:
+        fetch_limit = min(limit * self.rerank_oversample, MAX_TOP_K)
+        result = self.collection.search(data=[x.tolist() for x in clue_vectors], anns_field=EMBEDDING_FIELD,
+                                        param={"metric_type": METRIC_TYPE,
+                                               "params": self._search_params_for(fetch_limit)},
+                                        limit=fetch_limit, expr=corpus_filter(corpus_ids),
+                                        output_fields=self._output_fields(), partition_names=partition_names)
+        if self.rerank_oversample > 1:
+            result = self._rerank(clue_vectors, result, limit, partition_names)
+        return result
+
+    def _rerank(self, clue_vectors: list[np.ndarray], result: list, limit: int,
+                partition_names: list[str]) -> list[list[RankedHit]]:
+        """Reranks the approximate hits of each clue vector by their exact distance, using the full precision
+        embeddings rather than the quantized ones of the index
+
+        Args:
+            clue_vectors (list[np.ndarray]): the searched clue vectors
+            result (list): milvus hits of each clue vector
+            limit (int): number of hits kept per clue vector
+            partition_names (list[str]): partitions searched, None if the whole collection was searched
+
+        Returns:
+            list[list[RankedHit]]: the best hits of each clue vector, best first
+        """
+        ids = list(dict.fromkeys(hit.id for hits in result for hit in hits))
+        if not ids:
+            return [[] for _ in clue_vectors]
+        rows = self.collection.query(expr=f"{COMPOSITE_ID} in {json.dumps(ids)}", output_fields=[EMBEDDING_FIELD],
+                                     partition_names=partition_names)
+        embeddings = {row[COMPOSITE_ID]: np.asarray(row[EMBEDDING_FIELD], dtype=np.float32) for row in rows}
+
+        reranked = []
+        for clue_vector, hits in zip(clue_vectors, result):
+            # Vectors deleted since the search are skipped
+            hits = [hit for hit in hits if hit.id in embeddings]
+            if not hits:
+                reranked.append([])
+                continue
+            # Milvus' L2 metric is the squared euclidean distance
+            distances = np.sum((np.stack([embeddings[hit.id] for hit in hits]) - clue_vector) ** 2, axis=1)
+            order = np.argsort(distances, kind="stable")[:limit]
+            reranked.append([RankedHit(hits[i].id, float(distances[i]), hits[i].entity) for i in order])
+        return reranked
+
+    def _on_partitions(self, corpus_ids: list[uuid.UUID], operation: Callable[[list[str]], list]) -> list:
+        """Runs a search or delete on the loaded partitions of the corpora, since milvus needs the partitions loaded
+        to evaluate expressions
+
+        Args:
+            corpus_ids (list[uuid.UUID]): corpus ids
+            operation (Callable[[list[str]], list]): runs on the names of the existing partitions of the corpora
+
+        Returns:
+            list: the operation's result, or an empty list if none of the corpora have vectors yet
+        """
+        partitions = self._partitions_of(corpus_ids)
+        for attempt in range(2):
+            if not partitions:
+                return []
+            try:
+                with self.partition_loader.acquire(partitions):
+                    return operation(partitions)
+            except MilvusException:
+                if attempt > 0:
+                    raise
+                # Another process may have released or rebuilt the partitions, so check and load them again
+                _log.warning(f"Partition operation failed, retrying [partitions={partitions}]", exc_info=True)
+                self.partition_loader.invalidate(partitions)
+                self.known_partitions.difference_update(partitions)
+                partitions = self._partitions_of(corpus_ids)
+
+    def _create_partition(self, collection: Collection, partition: str):
+        if not collection.has_partition(partition):
+            try:
+                collection.create_partition(partition)
+            except MilvusException:
+                # Another process may have created it meanwhile
+                if not collection.has_partition(partition):
+                    raise
+
+    def _insert(self, collection: Collection, placement: PartitionPlacement, columns: list, corpus_ids: list[str],
+                known_partitions: set[str]) -> int:
+        """Inserts the rows into the partitions of their corpora
+
+        Args:
+            collection (Collection): collection to insert into
+            placement (PartitionPlacement): placement of the collection, None if milvus places the rows itself
+            columns (list): column based rows, ordered like the schema's fields
+            corpus_ids (list[str]): hex corpus id of each row
+            known_partitions (set[str]): partitions known to exist in the collection, updated with created ones
+
+        Returns:
+            int: number of inserted rows
+        """
+        if placement is None:
+            return collection.insert(columns).insert_count
+
+        rows_by_partition: dict[str, list[int]] = dict()
+        for row, corpus_id in enumerate(corpus_ids):
+            rows_by_partition.setdefault(placement.partition_of(uuid.UUID(corpus_id)), []).append(row)
 
         insert_count = 0
-        sentence_count = 0
-        for doc_entity in doc_entities:
-            sentences = split_doc(doc_entity.document, MAX_TEXT_LENGTH)
-            objects: list[MilvusSentenceObject] = []
-            sentence_count = sentence_count + len(sentences)
-
-            doc_embeddings = self.encoder.embed_multiple(sentences)
-            start = 0
-            index = 0
-            for sentence in sentences:
+        for partition, rows in rows_by_partition.items():
+            if partition not in known_partitions:
+                self._create_partition(collection, partition)
+                known_partitions.add(partition)
+            partition_columns = [[column[row] for row in rows] for column in columns]
+            insert_count += collection.insert(partition_columns, partition_name=partition).insert_count
+        return insert_count
+
+    def save_documents(self, doc_entities: list[DocumentEntity],
+                       chunk_offsets: list[list[tuple[int, int]]] = None) -> bool:
+        return all(self.save_documents_batch(doc_entities, chunk_offsets))
+
+    def save_documents_batch(self, doc_entities: list[DocumentEntity],
+                             chunk_offsets: list[list[tuple[int, int]]] = None) -> list[bool]:
+        _log.debug(f"Saving vectors for [corpus_ids={[x.corpus_id for x in doc_entities]}]")
+        if self.slim_schema and chunk_offsets is None:
+            raise IllegalStateException("Chunk offsets are needed to save documents with the slim schema")
+
+        # Flatten the sentences of all documents, so short documents like chat messages share encoder calls
+        objects: list[MilvusSentenceObject] = []
+        sentences: list[str] = []
+        # Index of the document each sentence belongs to
+        doc_indices: list[int] = []
+        for i, doc_entity in enumerate(doc_entities):
+            doc_sentences = split_doc(doc_entity.document, MAX_TEXT_LENGTH)
+            # Offsets are relative to the original document, so sentences can be matched against document chunks
+            sentence_offsets = locate_segments(doc_entity.document, doc_sentences)
+            for sentence, (start, end) in zip(doc_sentences, sentence_offsets):
                 # deterministically generate the sentence id, so we can later get/delete them
                 sentence_id = hash_sentence_id(doc_entity.document_id, sentence)
                 composite_id = doc_entity.document_id.hex + sentence_id.hex
-                end = start + len(sentence)
-                objects.append(MilvusSentenceObject(composite_id, doc_entity.corpus_id.hex, doc_entity.document_name,
-                                                    sentence[:MAX_TEXT_LENGTH], doc_embeddings[index], start, end))
-                index = index + 1
-                start = end
+                obj = MilvusSentenceObject(composite_id, doc_entity.corpus_id.hex, doc_entity.document_name,
+                                           sentence[:MAX_TEXT_LENGTH], None, start, end)
+                if self.slim_schema:
+                    obj.first_chunk, obj.last_chunk = locate_chunks(chunk_offsets[i], start, end)
+                objects.append(obj)
+                sentences.append(sentence)
+                doc_indices.append(i)
 
-            insert_count = insert_count + self.collection.insert(convert_batch(objects)).insert_count
+        statuses = [True] * len(doc_entities)
+        if not objects:
+            return statuses
 
-        return insert_count == sentence_count
+        for i in range(0, len(sentences), ENCODER_BATCH_SIZE):
+            embeddings = self.encoder.embed_multiple(sentences[i:i + ENCODER_BATCH_SIZE])
+            for obj, embedding in zip(objects[i:i + ENCODER_BATCH_SIZE], embeddings):
+                obj.embedding = embedding
+
+        # Rows inserted without a placement into a collection rebuilt onto partitions would never be searched
+        self._refresh_placement()
+        field_names = self._field_names()
+        for i in range(0, len(objects), MAX_INSERT_ROWS):
+            batch = objects[i:i + MAX_INSERT_ROWS]
+            try:
+                insert_count = self._insert(self.collection, self.active_placement, convert_batch(batch, field_names),
+                                            [obj.corpus_id for obj in batch], self.known_partitions)
+            except MilvusException:
+                _log.exception(f"Failed to insert vectors [num_rows={len(batch)}]")
+                insert_count = -1
+            # A batch can hold the sentences of several documents, which all fail with it
+            if insert_count != len(batch):
+                for doc_index in doc_indices[i:i + MAX_INSERT_ROWS]:
+                    statuses[doc_index] = False
+        return statuses
 
     def delete_corpus(self, corpus_id: uuid.UUID):
-        self.collection.delete(f"{CORPUS_FIELD} == \"{corpus_id.hex}\"")
+        if self.active_placement is None:
+            try:
+                self.collection.delete(corpus_filter([corpus_id]))
+                return
+            except MilvusException:
+                if not self._refresh_placement():
+                    raise
+        # Deleting by a field other than the primary key needs the partition loaded, which a maintenance worker
+        # otherwise never does under a partition placement
+        self._on_partitions([corpus_id], lambda partitions: self.collection.delete(corpus_filter([corpus_id]),
+                                                                                   partition_name=partitions[0]))
+
+    def _copy_rows(self, source: Collection, target: Collection, skip_ids: set[str] = None,
+                   partition_names: list[str] = None) -> int:
+        output_fields = self._field_names()
+        iterator = source.query_iterator(batch_size=REBUILD_BATCH_SIZE, expr=f"{COMPOSITE_ID} != \"\"",
+                                         output_fields=output_fields, partition_names=partition_names)
+        copied = 0
+        created_partitions = set()
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+                if skip_ids:
+                    rows = [row for row in rows if row[COMPOSITE_ID] not in skip_ids]
+                if rows:
+                    columns = [[row[field] for row in rows] for field in output_fields]
+                    copied += self._insert(target, self.placement, columns, [row[CORPUS_FIELD] for row in rows],
+                                           created_partitions)
+        finally:
+            iterator.close()
+        return copied
+
+    def _list_ids(self, collection: Collection, partition_names: list[str] = None) -> set[str]:
+        iterator = collection.query_iterator(batch_size=REBUILD_BATCH_SIZE * 10, expr=f"{COMPOSITE_ID} != \"\"",
+                                             output_fields=[COMPOSITE_ID], partition_names=partition_names)
+        ids = set()
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+                ids.update(row[COMPOSITE_ID] for row in rows)
+        finally:
+            iterator.close()
+        return ids
+
+    def _catch_up(self, old_collection: Collection, new_collection: Collection):
+        """Copies vectors inserted into the old collection since the initial copy
+        """
+        caught_up = self._copy_rows(old_collection, new_collection, skip_ids=self._list_ids(new_collection))
+        _log.info(f"Copied vectors inserted during the rebuild [count={caught_up}]")
+        if self.placement is None:
+            return
+        # Processes still serving the old collection insert without a placement until they notice the switch,
+        # see _refresh_placement, so move whatever reached the default partition to the partition of its corpus
+        moved_ids = self._list_ids(new_collection, partition_names=[DEFAULT_PARTITION])
+        if moved_ids:
+            self._copy_rows(new_collection, new_collection, partition_names=[DEFAULT_PARTITION])
+            new_collection.delete(f"{COMPOSITE_ID} in {json.dumps(sorted(moved_ids))}",
+                                  partition_name=DEFAULT_PARTITION)
+            _log.info(f"Moved vectors out of the default partition [count={len(moved_ids)}]")
+
+    def _resolve_collection(self) -> str:
+        """Finds the collection currently serving the store's collection name, which is either a
+        collection of that name, or the collection the name is an alias of.
+        """
+        for name in utility.list_collections():
+            if name == self.collection_name or self.collection_name in utility.list_aliases(name):
+                return name
+        raise IllegalStateException(f"Collection \"{self.collection_name}\" does not exist")
+
+    def rebuild_index(self, allow_downtime: bool = False) -> str:
+        """Rebuilds the vectors into a new collection indexed with the configured index, then atomically points
+        the store's collection name at it. Searches keep being served by the old collection until the switch.
+
+        The collection name is an alias of the serving collection. Collections created before aliases were used
+        hold the name themselves, and have to be dropped before the alias can take the name. During that one
+        switch, searches and inserts fail until the alias is created, and inserts racing the drop may be lost,
+        so migrating such a collection has to be explicitly allowed.
+
+        Vectors of corpora deleted during the rebuild may be copied over, so avoid deleting corpora meanwhile.
+
+        This also migrates the vectors onto the configured partition placement. Copying needs both collections fully
+        loaded, so with a partition placement the new collection is released once done, and serving processes
+        reload the partitions they search. Processes that were serving the old collection without a placement
+        switch over on their next insert, or on their next search or delete failing, see _refresh_placement.
+
+        Args:
+            allow_downtime (bool, optional): allow migrating a collection created before aliases were used
+
+        Returns:
+            str: name of the new collection
+        """
+        old_name = self._resolve_collection()
+        if old_name == self.collection_name and not allow_downtime:
+            raise IllegalStateException(f"Collection \"{old_name}\" predates aliases, so rebuilding it briefly fails "
+                                        f"searches and inserts. Rebuild while allowing downtime to migrate it.")
+        new_name = f"{self.collection_name}_{int(time.time())}"
+        _log.info(f"Rebuilding vector collection [old={old_name}] [new={new_name}] [index={self.index_config()}]")
+
+        new_collection = Collection(new_name, self.sentance_schema)
+        new_collection.create_index(EMBEDDING_FIELD, self.index_config())
+        new_collection.load()
+
+        old_collection = Collection(old_name)
+        # With a partition placement only the searched partitions may be loaded
+        old_collection.load()
+        copied = self._copy_rows(old_collection, new_collection)
+        _log.info(f"Copied vectors to the new collection [count={copied}]")
+        # Loads the partitions created while copying, which catching up queries
+        new_collection.load()
+
+        if old_name == self.collection_name:
+            # The name can't become an alias while the old collection holds it, so catch up before dropping it
+            self._catch_up(old_collection, new_collection)
+            old_collection.release()
+            utility.drop_collection(old_name)
+            utility.create_alias(new_name, self.collection_name)
+        else:
+            # Once switched, inserts go to the new collection, so the old one no longer changes while catching up
+            utility.alter_alias(new_name, self.collection_name)
+            self._catch_up(old_collection, new_collection)
+            old_collection.release()
+            utility.drop_collection(old_name)
+
+        if self.placement is not None:
+            new_collection.release()
+        self.collection = Collection(self.collection_name)
+        self.active_placement = self.placement
+        self.known_partitions.clear()
+        self.partition_loader.invalidate(list(self.partition_loader.loaded.keys()))
+        _log.info(f"Finished rebuilding vector collection [collection={new_name}]")
+        return new_name
@@ -0,0 +1,86 @@
+from datetime import datetime
+import logging
+from typing import Final
+import uuid
+from uuid import UUID
+from cassandra.cqlengine import columns, management
+from cassandra.cqlengine.models import Model
+from cassandra.cqlengine.query import DoesNotExist
+from memas.interface.corpus import Citation
+from memas.interface.exceptions import IngestionJobDoesNotExistException
+from memas.interface.storage_driver import IngestionJob, IngestionJobStore, IngestionStatus
+
+
+_log = logging.getLogger(__name__)
+
+
+# Jobs are only kept around long enough for clients to check their status
+DEFAULT_JOB_TTL_SECONDS: Final[int] = 7 * 24 * 60 * 60
+
+
+class IngestionJobEntry(Model):
+    ingestion_id = columns.UUID(partition_key=True)
+
+    corpus_pathname = columns.Ascii(required=True)
+    document = columns.Text(required=True)
+    document_name = columns.Text()
+    source_name = columns.Text()
+    source_uri = columns.Text()
+    description = columns.Text()
+
+    status = columns.Ascii(required=True)
+    error = columns.Text()
+    created_at = columns.DateTime(required=True)
+    updated_at = columns.DateTime(required=True)
+
+
+class IngestionJobStoreImpl(IngestionJobStore):
+    def __init__(self, job_ttl_seconds: int = DEFAULT_JOB_TTL_SECONDS) -> None:
+        super().__init__()
+        self.job_ttl_seconds: int = job_ttl_seconds
+
+    def init(self):
+        management.sync_table(IngestionJobEntry)
+
+    def first_init(self):
+        self.init()
+
+    def create_job(self, corpus_pathname: str, document: str, citation: Citation) -> UUID:
+        ingestion_id = uuid.uuid4()
+        _log.debug(f"Creating ingestion job [ingestion_id={ingestion_id.hex}] [corpus_pathname=\"{corpus_pathname}\"]")
+
+        now = datetime.now()
+        IngestionJobEntry.ttl(self.job_ttl_seconds).create(ingestion_id=ingestion_id,
+                                                           corpus_pathname=corpus_pathname,
+                                                           document=document,
+                                                           document_name=citation.document_name,
+                                                           source_name=citation.source_name,
+                                                           source_uri=citation.source_uri,
+                                                           description=citation.description,
+                                                           status=IngestionStatus.PENDING.value,
+                                                           created_at=now,
+                                                           updated_at=now)
+        return ingestion_id
+
+    def get_job(self, ingestion_id: UUID) -> IngestionJob:
+        try:
+            result = IngestionJobEntry.get(ingestion_id=ingestion_id)
+        except DoesNotExist as e:
+            raise IngestionJobDoesNotExistException(ingestion_id.hex) from e
+
+        citation = Citation(source_uri=result.source_uri,
+                            source_name=result.source_name,
+                            description=result.description,
+                            document_name=result.document_name)
+        return IngestionJob(ingestion_id=result.ingestion_id, corpus_pathname=result.corpus_pathname,
+                            document=result.document, citation=citation, status=IngestionStatus(result.status),
+                            error=result.error)
+
+    def update_status(self, ingestion_id: UUID, status: IngestionStatus, error: str = None):
+        _log.debug(f"Updating ingestion job [ingestion_id={ingestion_id.hex}] [status={status.value}]")
+        # The ttl only applies to the updated columns, so set it again or they would outlive the job
+        IngestionJobEntry.objects(ingestion_id=ingestion_id).ttl(self.job_ttl_seconds).update(
+            status=status.value, error=error, updated_at=datetime.now())
+
+
+SINGLETON: IngestionJobStore = IngestionJobStoreImpl()
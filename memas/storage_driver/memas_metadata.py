@@ -8,6 +8,8 @@ from cassandra import ConsistencyLevel
 from cassandra.cqlengine import columns, management
 from cassandra.cqlengine.models import Model
 from cassandra.cqlengine.query import BatchQuery, DoesNotExist, LWTException
+from memas.cache.invalidation import CacheInvalidator
+from memas.cache.lru_cache import LRUCache
 from memas.interface import corpus
 from memas.interface.corpus import CorpusInfo, CorpusType
 from memas.interface.exceptions import (
@@ -44,6 +46,9 @@ STD_WRITE_PERMISSION: Final[int] = 2
 READ_AND_WRITE: Final[int] = STD_READ_PERMISSION & STD_WRITE_PERMISSION
 
 
+QUERY_CORPORA_CACHE: Final[str] = "query_corpora"
+
+
 class NamespaceStatus(Enum):
     DELETING = "deleting"
 
@@ -131,6 +136,35 @@ def split_corpus_pathname(corpus_pathname: str) -> tuple[str, str]:
 
 
 class MemasMetadataStoreImpl(MemasMetadataStore):
+    def __init__(self) -> None:
+        super().__init__()
+        # Caches namespace pathname -> frozenset of CorpusInfo, or NamespaceDoesNotExistException for negative results
+        self.query_corpora_cache: LRUCache = None
+        self.negative_ttl_seconds: float = None
+        self.invalidator: CacheInvalidator = CacheInvalidator()
+
+    def enable_query_corpora_cache(self, max_size: int, ttl_seconds: float = None, negative_ttl_seconds: float = None,
+                                   invalidator: CacheInvalidator = None):
+        """Enables caching of get_query_corpora results. Namespace and corpus creation/deletion through
+        this store invalidates the affected entries.
+
+        Args:
+            max_size (int): max number of cached namespaces
+            ttl_seconds (float, optional): seconds before an entry expires, as a safety net against missed invalidations
+            negative_ttl_seconds (float, optional): seconds before a cached "namespace does not exist" result expires
+            invalidator (CacheInvalidator, optional): invalidator used to propagate invalidations, like to other
+                processes
+        """
+        self.query_corpora_cache = LRUCache(max_size, ttl_seconds, name=QUERY_CORPORA_CACHE)
+        self.negative_ttl_seconds = negative_ttl_seconds
+        if invalidator is not None:
+            self.invalidator = invalidator
+        self.invalidator.register(QUERY_CORPORA_CACHE, self.query_corpora_cache)
+
+    def _invalidate_query_corpora(self, namespace_pathname: str = None):
+        # Invalidate even without a local cache, so the invalidation still reaches other processes
+        self.invalidator.invalidate(QUERY_CORPORA_CACHE, namespace_pathname)
+
     def init(self):
         management.sync_table(NamespaceNameToId)
         management.sync_table(NamespaceParent)
@@ -140,6 +174,10 @@ class MemasMetadataStoreImpl(MemasMetadataStore):
     def first_init(self):
         self.init()
 
+    def warm_up(self):
+        # A lookup of a name that can't exist, since names are never empty apart from the root
+        NamespaceNameToId.objects(fullname=" ").first()
+
     def _get_id_by_name(self, fullname: str) -> uuid.UUID:
         # the root user currently only exists logically
         if fullname == ROOT_NAME:
@@ -192,6 +230,8 @@ class MemasMetadataStoreImpl(MemasMetadataStore):
                 parent_pathname=parent_pathname, namespace_name=child_name, created_at=now)
             NamespaceParent.batch(batch_query).create(child_id=namespace_id, parent_id=parent_id)
 
+        # Drop the cached "does not exist" result, if any
+        self._invalidate_query_corpora(namespace_pathname)
         return namespace_id
 
     def create_corpus(self, corpus_pathname: str, corpus_type: CorpusType, permissions: int, *, parent_id: uuid.UUID = None) -> uuid.UUID:
@@ -215,6 +255,9 @@ class MemasMetadataStoreImpl(MemasMetadataStore):
                 parent_id=parent_id, corpus_id=corpus_id, parent_pathname=parent_pathname, corpus_name=corpus_name,
                 corpus_type=corpus_type.value, permissions=permissions, created_at=now)
             NamespaceParent.batch(batch_query).create(child_id=corpus_id, parent_id=parent_id)
+
+        # The parent namespace now queries this corpus as well
+        self._invalidate_query_corpora(parent_pathname)
         return corpus_id
 
     def create_conversation_corpus(self, corpus_pathname: str, *, parent_id: uuid.UUID = None) -> uuid.UUID:
@@ -234,6 +277,9 @@ class MemasMetadataStoreImpl(MemasMetadataStore):
             _log.info(f"Corpus already deleted [corpus_pathname=\"{corpus_pathname}\"] [corpus_id={corpus_id.hex}]")
             raise NamespaceDoesNotExistException("corpus_pathname") from e
 
+        # The corpus may be shared with namespaces other than its parent, so clear everything. Deletes are rare.
+        self._invalidate_query_corpora()
+
         try:
             CorpusInfo.objects(parent_id=parent_id, corpus_id=corpus_id).if_exists().update(
                 status=NamespaceStatus.DELETING.value)
@@ -248,6 +294,24 @@ class MemasMetadataStoreImpl(MemasMetadataStore):
             NamespaceParent.batch(batch_query).filter(child_id=corpus_id).delete()
 
     def get_query_corpora(self, namespace_pathname: str) -> set[corpus.CorpusInfo]:
+        if self.query_corpora_cache is None:
+            return self._get_query_corpora(namespace_pathname)
+
+        cached = self.query_corpora_cache.get(namespace_pathname)
+        if isinstance(cached, NamespaceDoesNotExistException):
+            raise NamespaceDoesNotExistException(namespace_pathname)
+        if cached is not None:
+            return set(cached)
+
+        try:
+            query_corpuses = self._get_query_corpora(namespace_pathname)
+        except NamespaceDoesNotExistException as e:
+            self.query_corpora_cache.put(namespace_pathname, e, self.negative_ttl_seconds)
+            raise
+        self.query_corpora_cache.put(namespace_pathname, frozenset(query_corpuses))
+        return query_corpuses
+
+    def _get_query_corpora(self, namespace_pathname: str) -> set[corpus.CorpusInfo]:
         parent_id, namespace_id = self.get_namespace_ids_by_name(namespace_pathname)
         namespace_result = NamespaceInfo.get(parent_id=parent_id, namespace_id=namespace_id)
         query_corpuses = set()
@@ -0,0 +1,198 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+import logging
+import threading
+from typing import Callable, Final, Iterator
+from uuid import UUID
+from memas.interface.exceptions import IllegalArgumentException
+
+
+_log = logging.getLogger(__name__)
+
+
+# Milvus manages the partitions itself by hashing the partition key field, which requires loading the whole collection
+PARTITION_KEY_PLACEMENT: Final[str] = "partition_key"
+DEFAULT_NUM_BUCKETS: Final[int] = 64
+
+
+class PartitionPlacement(ABC):
+    """
+    Decides which milvus partition holds the vectors of a corpus
+    """
+
+    @abstractmethod
+    def partition_of(self, corpus_id: UUID) -> str:
+        """Gets the name of the partition holding the corpus' vectors
+
+        Args:
+            corpus_id (UUID): corpus id
+
+        Returns:
+            str: partition name
+        """
+
+
+class BucketPlacement(PartitionPlacement):
+    """
+    Hashes corpora into a fixed number of partitions, so the partition count stays bounded no matter the tenant count
+    """
+
+    def __init__(self, num_buckets: int = DEFAULT_NUM_BUCKETS) -> None:
+        super().__init__()
+        self.num_buckets: int = num_buckets
+
+    def partition_of(self, corpus_id: UUID) -> str:
+        return f"bucket_{corpus_id.int % self.num_buckets}"
+
+
+class CorpusPlacement(PartitionPlacement):
+    """
+    Gives every corpus its own partition, so each corpus can be loaded and released on its own. Milvus limits the
+    number of partitions per collection, so this only suits deployments with a bounded number of corpora.
+    """
+
+    def partition_of(self, corpus_id: UUID) -> str:
+        return f"corpus_{corpus_id.hex}"
+
+
+def get_partition_placement(name: str, num_buckets: int = DEFAULT_NUM_BUCKETS) -> PartitionPlacement:
+    """Creates the named placement strategy
+
+    Args:
+        name (str): one of "partition_key", "bucket" or "corpus"
+        num_buckets (int, optional): number of partitions of the "bucket" placement
+
+    Returns:
+        PartitionPlacement: the placement, or None for "partition_key" where milvus places the vectors itself
+    """
+    if name == PARTITION_KEY_PLACEMENT:
+        return None
+    if name == "bucket":
+        return BucketPlacement(num_buckets)
+    if name == "corpus":
+        return CorpusPlacement()
+    raise IllegalArgumentException("placement", f"must be one of {[PARTITION_KEY_PLACEMENT, 'bucket', 'corpus']}")
+
+
+class PartitionLoader:
+    """
+    Keeps the most recently searched partitions loaded within a memory budget. Partitions are loaded on demand,
+    while the least recently used ones are released once the budget is exceeded. Partitions used by an in flight
+    search are never released, so the budget can be exceeded temporarily when a single search spans more.
+
+    Note the load state lives in milvus, so processes sharing a collection can release each other's partitions.
+    Searches are expected to reload and retry when that happens, see invalidate.
+    """
+
+    def __init__(self, load: Callable[[str], None], release: Callable[[str], None],
+                 estimate_bytes: Callable[[str], int], memory_budget_bytes: int = 0) -> None:
+        """
+        Args:
+            load (Callable[[str], None]): loads the named partition
+            release (Callable[[str], None]): releases the named partition
+            estimate_bytes (Callable[[str], int]): estimates the memory the named partition takes once loaded
+            memory_budget_bytes (int, optional): memory budget of the loaded partitions, unlimited if 0
+        """
+        self.load: Callable[[str], None] = load
+        self.release: Callable[[str], None] = release
+        self.estimate_bytes: Callable[[str], int] = estimate_bytes
+        self.memory_budget_bytes: int = memory_budget_bytes
+
+        self._lock = threading.Lock()
+        # Loaded partitions and their estimated size, least recently used first
+        self.loaded: OrderedDict[str, int] = OrderedDict()
+        self.pins: dict[str, int] = dict()
+        # Partitions being loaded, which other searches of them wait on
+        self.loading: dict[str, Future] = dict()
+
+    def loaded_bytes(self) -> int:
+        return sum(self.loaded.values())
+
+    @contextmanager
+    def acquire(self, partitions: list[str]) -> Iterator[list[str]]:
+        """Loads the partitions, and keeps them loaded until the context exits
+
+        Args:
+            partitions (list[str]): names of the partitions to search
+
+        Yields:
+            list[str]: the partition names
+        """
+        # Loading blocks on milvus, so it happens outside the lock. Searches of loaded partitions never wait on it,
+        # while searches of a partition being loaded wait for that load instead of starting another.
+        to_load: list[tuple[str, Future]] = []
+        waits: list[Future] = []
+        with self._lock:
+            for partition in partitions:
+                self.pins[partition] = self.pins.get(partition, 0) + 1
+                if partition in self.loaded:
+                    self.loaded.move_to_end(partition)
+                elif partition in self.loading:
+                    waits.append(self.loading[partition])
+                else:
+                    self.loading[partition] = Future()
+                    to_load.append((partition, self.loading[partition]))
+        try:
+            self._load_all(to_load)
+            for future in waits:
+                future.result()
+            with self._lock:
+                self._evict()
+        except BaseException:
+            with self._lock:
+                self._unpin(partitions)
+            raise
+        try:
+            yield partitions
+        finally:
+            with self._lock:
+                self._unpin(partitions)
+
+    def _load_all(self, to_load: list[tuple[str, Future]]):
+        for i, (partition, future) in enumerate(to_load):
+            try:
+                self.load(partition)
+                size = self.estimate_bytes(partition)
+            except BaseException as e:
+                # Fail this and the remaining loads, so nobody waits on them forever
+                with self._lock:
+                    for remaining, _ in to_load[i:]:
+                        del self.loading[remaining]
+                for _, remaining_future in to_load[i:]:
+                    remaining_future.set_exception(e)
+                raise
+            with self._lock:
+                self.loaded[partition] = size
+                del self.loading[partition]
+            future.set_result(None)
+
+    def invalidate(self, partitions: list[str]):
+        """Forgets that the partitions are loaded, so the next acquire loads them again
+        """
+        with self._lock:
+            for partition in partitions:
+                self.loaded.pop(partition, None)
+
+    def _unpin(self, partitions: list[str]):
+        for partition in partitions:
+            self.pins[partition] -= 1
+            if self.pins[partition] == 0:
+                del self.pins[partition]
+
+    def _evict(self):
+        if self.memory_budget_bytes <= 0:
+            return
+        loaded_bytes = self.loaded_bytes()
+        for partition in list(self.loaded.keys()):
+            if loaded_bytes <= self.memory_budget_bytes:
+                return
+            if partition in self.pins:
+                continue
+            _log.debug(f"Releasing partition [partition={partition}] [bytes={self.loaded[partition]}]")
+            self.release(partition)
+            loaded_bytes -= self.loaded.pop(partition)
+        if loaded_bytes > self.memory_budget_bytes:
+            _log.warning(f"Loaded partitions exceed the memory budget [loaded_bytes={loaded_bytes}] "
+                         f"[budget_bytes={self.memory_budget_bytes}]")
@@ -51,6 +51,33 @@ def segment_document(document: str, max_characters_per_chunk: int, word_search_s
     return word_chunks
 
 
+"""
+Locates each segment of a document (as produced by segment_document or split_doc) within the original document.
+Returns a list of (start, end) character offsets, one per segment, such that document[start:end] == segment.
+"""
+
+
+def locate_segments(document: str, segments: list[str]) -> list[tuple[int, int]]:
+    offsets = []
+    cursor = 0
+    prev_start = 0
+    for segment in segments:
+        start = document.find(segment, cursor)
+        # split_doc may produce a last fragment that overlaps with the previous one, so retry from the previous start
+        if start < 0:
+            start = document.find(segment, prev_start)
+        # This should not happen since segments are substrings, but keep the offsets consistent with the segment length
+        if start < 0:
+            start = cursor
+
+        end = start + len(segment)
+        offsets.append((start, end))
+        prev_start = start
+        cursor = end
+
+    return offsets
+
+
 """
 Divides the provided string document into sentences no longer than max_text_len each. 
 Returns the split document as a list of strings.
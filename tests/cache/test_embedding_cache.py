@@ -0,0 +1,57 @@
+import hashlib
+import numpy as np
+from memas.cache.embedding_cache import MmapEmbeddingCache
+
+
+def key(text: str) -> bytes:
+    return hashlib.sha256(text.encode()).digest()
+
+
+def test_lru_eviction(tmp_path):
+    cache = MmapEmbeddingCache(str(tmp_path / "cache"), 2, 2)
+    cache.put_many([key("a"), key("b")], [np.array([1.0, 1.0]), np.array([2.0, 2.0])])
+    # Touch "a", so "b" is the least recently used
+    assert np.array_equal(cache.get_many([key("a")])[0], [1.0, 1.0])
+    cache.put_many([key("c")], [np.array([3.0, 3.0])])
+
+    assert cache.get_many([key("b")]) == [None]
+    assert np.array_equal(cache.get_many([key("c")])[0], [3.0, 3.0])
+    assert len(cache) == 2
+    assert (cache.hits.value, cache.misses.value, cache.evictions.value) == (2, 1, 1)
+
+
+def test_persists_across_reopen(tmp_path):
+    path = str(tmp_path / "cache")
+    cache = MmapEmbeddingCache(path, 2, 2)
+    # This digest ends with a null byte, which must survive the round trip
+    null_key = b"\x01" * 31 + b"\x00"
+    cache.put_many([null_key, key("b")], [np.array([1.0, 1.0]), np.array([2.0, 2.0])])
+    cache.get_many([null_key])
+    cache.close()
+
+    reopened = MmapEmbeddingCache(path, 2, 2)
+    assert np.array_equal(reopened.get_many([null_key])[0], [1.0, 1.0])
+    assert reopened.shard_path == cache.shard_path
+    # The recency order is restored too, "b" was the least recently used
+    reopened.put_many([key("c")], [np.array([3.0, 3.0])])
+    assert reopened.get_many([key("b")]) == [None]
+
+
+def test_processes_own_separate_shards(tmp_path):
+    path = str(tmp_path / "cache")
+    first = MmapEmbeddingCache(path, 2, 2, max_shards=2)
+    second = MmapEmbeddingCache(path, 2, 2, max_shards=2)
+    third = MmapEmbeddingCache(path, 2, 2, max_shards=2)
+
+    first.put_many([key("a")], [np.array([1.0, 1.0])])
+    assert second.get_many([key("a")]) == [None]
+    assert first.shard_path != second.shard_path
+
+    # Every shard is taken, so the cache just misses
+    third.put_many([key("a")], [np.array([1.0, 1.0])])
+    assert third.get_many([key("a")]) == [None]
+    assert third.records is None
+    assert third.unavailable.value == 1
+
+    # The footprint is bounded by the shard count, records being a 32 byte key, 8 byte tick and the embedding
+    assert first.total_bytes == 2 * 2 * (32 + 8 + 2 * 4)
@@ -0,0 +1,45 @@
+import json
+from unittest import mock
+from memas.cache.invalidation import CacheInvalidator, RedisCacheInvalidator
+from memas.cache.lru_cache import LRUCache
+
+
+def test_invalidate_local():
+    invalidator = CacheInvalidator()
+    cache1 = LRUCache(10)
+    cache2 = LRUCache(10)
+    other_cache = LRUCache(10)
+    invalidator.register("test", cache1)
+    invalidator.register("test", cache2)
+    invalidator.register("other", other_cache)
+
+    for cache in [cache1, cache2, other_cache]:
+        cache.put("a", 1)
+        cache.put("b", 2)
+
+    invalidator.invalidate("test", "a")
+    assert cache1.get("a") is None and cache2.get("a") is None
+    assert cache1.get("b") == 2
+    assert other_cache.get("a") == 1
+
+    invalidator.invalidate("test")
+    assert len(cache1) == 0 and len(cache2) == 0
+    assert len(other_cache) == 2
+
+
+@mock.patch("redis.Redis.from_url")
+def test_redis_invalidation(from_url):
+    invalidator = RedisCacheInvalidator("redis://localhost")
+    cache = LRUCache(10)
+    invalidator.register("test", cache)
+    cache.put("a", 1)
+    cache.put("b", 2)
+
+    invalidator.invalidate("test", "a")
+    assert cache.get("a") is None
+    from_url.return_value.publish.assert_called_once_with(
+        invalidator.channel, json.dumps({"cache": "test", "key": "a"}))
+
+    # Messages broadcast by other processes are applied locally
+    invalidator._handle_message({"data": json.dumps({"cache": "test", "key": None})})
+    assert len(cache) == 0
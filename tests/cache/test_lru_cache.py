@@ -0,0 +1,62 @@
+from memas.cache.lru_cache import LRUCache
+
+
+def test_lru_eviction():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    # Touch "a", so "b" is the least recently used
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_ttl_expiry():
+    now = [0.0]
+    cache = LRUCache(10, ttl_seconds=5, clock=lambda: now[0])
+    cache.put("a", 1)
+
+    now[0] = 4.9
+    assert cache.get("a") == 1
+    now[0] = 5.0
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_hit_miss_counters():
+    cache = LRUCache(10)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+
+    assert cache.hits.value == 2
+    assert cache.misses.value == 1
+
+
+def test_invalidate_and_clear():
+    cache = LRUCache(10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_ttl_override():
+    now = [0.0]
+    cache = LRUCache(10, ttl_seconds=60, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2, ttl_seconds=1)
+
+    now[0] = 2
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
@@ -0,0 +1,29 @@
+import uuid
+from unittest import mock
+from memas.corpus.basic_corpus import BasicCorpus
+from memas.interface.corpus import Citation, CorpusInfo, CorpusType
+from memas.interface.storage_driver import (CorpusDocumentMetadataStore, CorpusDocumentStore, CorpusVectorStore,
+                                            make_chunk_id)
+
+
+def test_store_and_index_many_statuses():
+    metadata_store = mock.Mock(spec=CorpusDocumentMetadataStore)
+    metadata_store.insert_document_metadata_batch.return_value = True
+    doc_store = mock.Mock(spec=CorpusDocumentStore)
+    vec_store = mock.Mock(spec=CorpusVectorStore)
+    corpus = BasicCorpus(CorpusInfo("user:corpus", uuid.uuid4(), uuid.uuid4(), CorpusType.CONVERSATION),
+                         metadata_store, doc_store, vec_store)
+
+    # The chunk of "second" fails in the document store, and the vectors of "third" fail
+    doc_store.save_documents_batch.side_effect = lambda id_doc_pairs: [i != 1 for i in range(len(id_doc_pairs))]
+    vec_store.save_documents_batch.return_value = [True, True, False]
+
+    citation = Citation("source", "name", "", "description")
+    statuses = corpus.store_and_index_many([("first", citation), ("", citation), ("second", citation),
+                                            ("third", citation)])
+
+    assert statuses == [True, False, False, False]
+    # The empty document is skipped, and each chunk id belongs to its document
+    [chunk_pairs] = [x.kwargs["id_doc_pairs"] for x in doc_store.save_documents_batch.call_args_list]
+    assert [x[0] for x in chunk_pairs] == [make_chunk_id(x[1].document_id, 0) for x in chunk_pairs]
+    assert [x[1].document for x in chunk_pairs] == ["first", "second", "third"]
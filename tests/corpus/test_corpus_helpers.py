@@ -1,5 +1,5 @@
 import re
-from memas.text_parsing.text_parsers import segment_document
+from memas.text_parsing.text_parsers import locate_segments, segment_document
 
 
 def test_document_segmentation():
@@ -63,3 +63,23 @@ def test_document_segmentation():
         assert (len(segment) <= max_seg_size)
     # Test that long malformed text splits included all characters
     assert segments[0] + segments[1] + segments[2] == doc4.split(" ")[0]
+
+
+def test_locate_segments():
+    doc = "The sun is high.\n\tCalifornia sunshine is great.   ok. ok."
+    segments = segment_document(doc, 150)
+    segments.extend(["ok.", "ok."])
+
+    offsets = locate_segments(doc, segments)
+    for segment, (start, end) in zip(segments, offsets):
+        assert doc[start:end] == segment
+
+    # Repeated segments are located in order
+    assert offsets[-2][0] < offsets[-1][0]
+
+
+def test_locate_segments_overlap():
+    doc = "aaaa bbbb cccc"
+    # The last fragment overlaps with the previous one, like the last fragment produced by split_doc
+    offsets = locate_segments(doc, ["aaaa bbbb ", "bbbb cccc"])
+    assert offsets == [(0, 10), (5, 14)]
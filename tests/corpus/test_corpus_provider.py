@@ -0,0 +1,44 @@
+import uuid
+from unittest import mock
+from memas.corpus.corpus_provider import CorpusProvider
+from memas.interface.corpus import CorpusInfo, CorpusType
+
+
+def make_provider() -> CorpusProvider:
+    corpus_provider = CorpusProvider(mock.Mock(), mock.Mock(), mock.Mock(), mock.Mock())
+    corpus_provider.enable_corpus_cache(10)
+    return corpus_provider
+
+
+def test_get_corpus_by_name_cached():
+    corpus_provider = make_provider()
+    corpus_info = CorpusInfo("ns:corpus", uuid.uuid4(), uuid.uuid4(), CorpusType.CONVERSATION)
+    corpus_provider.memas_metadata_store.get_corpus_info.return_value = corpus_info
+
+    corpus = corpus_provider.get_corpus_by_name("ns:corpus")
+    assert corpus.corpus_info == corpus_info
+    assert corpus_provider.get_corpus_by_name("ns:corpus") is corpus
+    corpus_provider.memas_metadata_store.get_corpus_info.assert_called_once_with("ns:corpus")
+
+    # Lookups by info reuse the cached object
+    assert corpus_provider.get_corpus_by_info(corpus_info) is corpus
+
+
+def test_invalidate_corpus():
+    corpus_provider = make_provider()
+    corpus_info = CorpusInfo("ns:corpus", uuid.uuid4(), uuid.uuid4(), CorpusType.CONVERSATION)
+    corpus_provider.memas_metadata_store.get_corpus_info.return_value = corpus_info
+    corpus = corpus_provider.get_corpus_by_name("ns:corpus")
+
+    corpus_provider.invalidate_corpus("ns:corpus")
+
+    # The pathname now points to a new corpus
+    new_corpus_info = CorpusInfo("ns:corpus", uuid.uuid4(), uuid.uuid4(), CorpusType.KNOWLEDGE)
+    corpus_provider.memas_metadata_store.get_corpus_info.return_value = new_corpus_info
+    new_corpus = corpus_provider.get_corpus_by_name("ns:corpus")
+    assert new_corpus is not corpus
+    assert new_corpus.corpus_info == new_corpus_info
+
+    # Lookups by a stale info don't return the newly cached corpus, nor populate the cache
+    assert corpus_provider.get_corpus_by_info(corpus_info).corpus_info == corpus_info
+    assert corpus_provider.get_corpus_by_name("ns:corpus") is new_corpus
@@ -0,0 +1,164 @@
+import threading
+import uuid
+from unittest import mock
+import futurist
+import pytest
+from memas.corpus.corpus_searching import (basic_candidates_search, multi_corpus_search, resolve_citations,
+                                          resolve_texts)
+from memas.corpus.score_fusion import SearchCandidate
+from memas.interface.corpus import Citation, CorpusType, SearchSettings
+from memas.interface.exceptions import IllegalArgumentException
+from memas.interface.storage_driver import DocumentEntity
+
+
+def test_resolve_citations():
+    corpus_id = uuid.uuid4()
+    document_id1 = uuid.uuid4()
+    document_id2 = uuid.uuid4()
+    citation1 = Citation("uri1", "name1", "", "doc1")
+    citation2 = Citation("uri2", "name2", "", "doc2")
+
+    metadata_store = mock.Mock()
+    metadata_store.get_document_citations.return_value = {
+        (corpus_id, document_id1): citation1, (corpus_id, document_id2): citation2}
+
+    candidates = [SearchCandidate(2.0, corpus_id, document_id2, "text2"),
+                  SearchCandidate(1.0, corpus_id, document_id1, "text1")]
+    results = resolve_citations(candidates, metadata_store)
+
+    assert results == [(2.0, "text2", citation2), (1.0, "text1", citation1)]
+    metadata_store.get_document_citations.assert_called_once_with(
+        [(corpus_id, document_id2), (corpus_id, document_id1)])
+
+
+def test_basic_candidates_search_parallel():
+    corpus_id = uuid.uuid4()
+    document_id = uuid.uuid4()
+    text = "California sunshine is great."
+
+    # Each store waits for the other to start, which only succeeds if both are queried concurrently
+    barrier = threading.Barrier(2, timeout=5)
+
+    def doc_search(corpus_ids, clue, settings):
+        barrier.wait()
+        return [(1.0, DocumentEntity(corpus_id, document_id, "doc", text), 0, len(text))]
+
+    def vec_search(corpus_ids, clue, settings):
+        barrier.wait()
+        return [(0.5, DocumentEntity(corpus_id, document_id, "doc", text), 0, len(text))]
+
+    doc_store = mock.Mock()
+    doc_store.search_corpora.side_effect = doc_search
+    vec_store = mock.Mock()
+    vec_store.search_corpora.side_effect = vec_search
+
+    with futurist.ThreadPoolExecutor(max_workers=2) as executor:
+        results = basic_candidates_search(doc_store, vec_store, [corpus_id], "sunny", executor=executor)
+
+    assert len(results) == 1
+    assert (results[0].corpus_id, results[0].document_id, results[0].text) == (corpus_id, document_id, text)
+
+
+def test_search_settings_defaults():
+    settings = SearchSettings()
+    assert (settings.result_limit, settings.doc_search_count, settings.vec_search_count) == (4, 20, 100)
+
+    # The candidate counts follow the result limit, unless supplied
+    settings = SearchSettings(result_limit=3, vec_search_count=10)
+    assert (settings.result_limit, settings.doc_search_count, settings.vec_search_count) == (3, 15, 10)
+
+
+@pytest.mark.parametrize("kwargs", [{"result_limit": 0}, {"result_limit": 101}, {"result_limit": "5"},
+                                    {"result_limit": True}, {"doc_search_count": -1},
+                                    {"vec_search_count": 100000}, {"clue_aggregation": "min"},
+                                    {"max_clue_vectors": 0}])
+def test_search_settings_invalid(kwargs):
+    with pytest.raises(IllegalArgumentException):
+        SearchSettings(**kwargs)
+
+
+def test_basic_candidates_search_settings():
+    settings = SearchSettings(result_limit=3)
+    doc_store = mock.Mock()
+    doc_store.search_corpora.return_value = []
+    vec_store = mock.Mock()
+    vec_store.search_corpora.return_value = []
+
+    corpus_ids = [uuid.uuid4()]
+    assert basic_candidates_search(doc_store, vec_store, corpus_ids, "sunny", settings=settings) == []
+    doc_store.search_corpora.assert_called_once_with(corpus_ids, "sunny", settings)
+    vec_store.search_corpora.assert_called_once_with(corpus_ids, "sunny", settings)
+
+
+def test_multi_corpus_search_single_query_per_backend():
+    knowledge_id = uuid.uuid4()
+    conversation_id = uuid.uuid4()
+    document_id = uuid.uuid4()
+    citation = Citation("uri", "name", "", "doc")
+
+    ctx = mock.Mock(search_executor=None)
+    ctx.corpus_doc.search_corpora.return_value = [
+        (1.0, DocumentEntity(knowledge_id, document_id, "doc", "Knowledge is power."), 0, 19)]
+    ctx.corpus_vec.search_corpora.return_value = []
+    ctx.corpus_metadata.get_document_citations.return_value = {(knowledge_id, document_id): citation}
+
+    corpus_sets = {CorpusType.KNOWLEDGE: [mock.Mock(corpus_id=knowledge_id)],
+                   CorpusType.CONVERSATION: [mock.Mock(corpus_id=conversation_id)]}
+    results = multi_corpus_search(corpus_sets, "power", ctx)
+
+    # Both corpus types share the basic backend, so each store is queried once with every corpus id
+    assert results == [(1.0, "Knowledge is power.", citation)]
+    ctx.corpus_doc.search_corpora.assert_called_once_with([knowledge_id, conversation_id], "power", mock.ANY)
+    ctx.corpus_vec.search_corpora.assert_called_once_with([knowledge_id, conversation_id], "power", mock.ANY)
+
+
+def test_multi_corpus_search_no_corpora():
+    ctx = mock.Mock(search_executor=None)
+    ctx.corpus_metadata.get_document_citations.return_value = {}
+    assert multi_corpus_search({}, "power", ctx) == []
+
+
+def test_resolve_texts():
+    corpus_id = uuid.uuid4()
+    document_id = uuid.uuid4()
+    document = "The sun is high.\nCalifornia sunshine is great."
+
+    doc_store = mock.Mock()
+    doc_store.get_chunks.return_value = {
+        "chunk0": (DocumentEntity(corpus_id, document_id, "doc", "The sun is high."), 0, 16),
+        "chunk1": (DocumentEntity(corpus_id, document_id, "doc", "California sunshine is great."), 17, 46),
+    }
+
+    resolved = SearchCandidate(1.0, corpus_id, document_id, "text")
+    within_chunk = SearchCandidate(0.9, corpus_id, document_id, None, 28, 36, ["chunk1"])
+    across_chunks = SearchCandidate(0.8, corpus_id, document_id, None, 4, 27, ["chunk0", "chunk1"])
+    missing = SearchCandidate(0.7, corpus_id, document_id, None, 0, 5, ["chunk2"])
+    results = resolve_texts([resolved, within_chunk, across_chunks, missing], doc_store)
+
+    # The whitespace between chunks isn't stored, so it's filled with spaces
+    assert [x.text for x in results] == ["text", "sunshine", "sun is high. California"]
+    assert document[4:27] == "sun is high.\nCalifornia"
+    doc_store.get_chunks.assert_called_once_with(["chunk1", "chunk0", "chunk2"])
+
+
+def test_multi_corpus_search_refills_missing_chunks():
+    corpus_id = uuid.uuid4()
+    document_ids = [uuid.uuid4() for _ in range(3)]
+    citation = Citation("uri", "name", "", "doc")
+
+    ctx = mock.Mock(search_executor=None)
+    ctx.corpus_doc.search_corpora.return_value = []
+    ctx.corpus_vec.search_corpora.return_value = [
+        (i / 10, DocumentEntity(corpus_id, document_id, "doc", None, [f"chunk{i}"]), 0, 5)
+        for i, document_id in enumerate(document_ids)]
+    # The closest candidate's chunk was deleted since it was indexed
+    ctx.corpus_doc.get_chunks.side_effect = lambda chunk_ids: {
+        chunk_id: (DocumentEntity(corpus_id, document_ids[int(chunk_id[-1])], "doc", f"text{chunk_id[-1]}"), 0, 5)
+        for chunk_id in chunk_ids if chunk_id != "chunk0"}
+    ctx.corpus_metadata.get_document_citations.side_effect = lambda keys: {key: citation for key in keys}
+
+    corpus_sets = {CorpusType.KNOWLEDGE: [mock.Mock(corpus_id=corpus_id)]}
+    results = multi_corpus_search(corpus_sets, "power", ctx, SearchSettings(result_limit=2))
+
+    # The next best candidate takes the missing one's place
+    assert [text for _, text, _ in results] == ["text1", "text2"]
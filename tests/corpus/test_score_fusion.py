@@ -0,0 +1,137 @@
+import uuid
+import pytest
+from memas.corpus.score_fusion import (ReciprocalRankFusion, ScoreFusion, SearchCandidate, get_fusion_strategy,
+                                       interleave, top_k)
+from memas.interface.exceptions import IllegalArgumentException
+
+
+def test_score_fusion_removes_contained_vectors():
+    corpus_id = uuid.uuid4()
+    document_id1 = uuid.uuid4()
+    document_id2 = uuid.uuid4()
+
+    doc_results = [SearchCandidate(3.0, corpus_id, document_id1, "The sun is high. California sunshine is great.",
+                                   0, 46),
+                   SearchCandidate(1.0, corpus_id, document_id2, "My umbrella is in the repair shop.", 0, 34)]
+    vec_results = [SearchCandidate(0.5, corpus_id, document_id1, "California sunshine is great.", 17, 46),
+                   SearchCandidate(0.9, corpus_id, uuid.uuid4(), "It is sunny today.", 0, 18)]
+
+    results = ScoreFusion().fuse(doc_results, vec_results)
+
+    assert len(results) == 3
+    # the contained sentence is merged into the first document and rewards it
+    assert results[0].document_id == document_id1
+    assert results[0].score > 1.0
+    assert results[1].score == 0.0
+    assert results[2].text == "It is sunny today."
+
+
+def test_score_fusion_matches_by_document():
+    corpus_id = uuid.uuid4()
+    document_id1 = uuid.uuid4()
+    document_id2 = uuid.uuid4()
+
+    doc_results = [SearchCandidate(1.0, corpus_id, document_id1, "ok. thanks.", 0, 11)]
+    # Same text, but from a different document, and outside of the chunk's offsets
+    vec_results = [SearchCandidate(0.5, corpus_id, document_id2, "ok.", 0, 3),
+                   SearchCandidate(0.5, corpus_id, document_id1, "ok.", 20, 23)]
+
+    results = ScoreFusion().fuse(doc_results, vec_results)
+
+    assert len(results) == 3
+    assert results[0].score == 1.0
+
+
+def test_score_fusion_without_offsets():
+    corpus_id = uuid.uuid4()
+    document_id = uuid.uuid4()
+
+    # Chunks stored before offsets were tracked fall back to text matching
+    doc_results = [SearchCandidate(1.0, corpus_id, document_id, "The sun is high. California sunshine is great.")]
+    vec_results = [SearchCandidate(0.5, corpus_id, document_id, "California sunshine is great.", 17, 46)]
+
+    results = ScoreFusion().fuse(doc_results, vec_results)
+
+    assert len(results) == 1
+    assert results[0].score > 1.0
+
+
+def test_contains_unresolved_text():
+    corpus_id = uuid.uuid4()
+    document_id = uuid.uuid4()
+
+    # Slim vector hits carry offsets but no text, while legacy chunks carry text but no offsets
+    chunk = SearchCandidate(1.0, corpus_id, document_id, "The sun is high.")
+    sentence = SearchCandidate(0.5, corpus_id, document_id, None, 0, 16, ["chunk0"])
+
+    assert not chunk.contains(sentence)
+    assert not sentence.contains(chunk)
+
+
+def test_score_fusion_single_store():
+    corpus_id = uuid.uuid4()
+
+    doc_results = [SearchCandidate(4.0, corpus_id, uuid.uuid4(), "doc1"),
+                   SearchCandidate(2.0, corpus_id, uuid.uuid4(), "doc2")]
+    assert [x.score for x in ScoreFusion().fuse(doc_results, [])] == [1.0, 0.0]
+
+    # Distances are inverted, so closer vectors get higher scores
+    vec_results = [SearchCandidate(0.5, corpus_id, uuid.uuid4(), "vec1"),
+                   SearchCandidate(1.5, corpus_id, uuid.uuid4(), "vec2")]
+    assert [x.score for x in ScoreFusion().fuse([], vec_results)] == [1.5, 0.5]
+
+
+def test_reciprocal_rank_fusion():
+    corpus_id = uuid.uuid4()
+    document_id1 = uuid.uuid4()
+    document_id2 = uuid.uuid4()
+
+    doc_results = [SearchCandidate(1.0, corpus_id, document_id1, "The sun is high. California sunshine is great.",
+                                   0, 46),
+                   SearchCandidate(30.0, corpus_id, document_id2, "My umbrella is in the repair shop.", 0, 34)]
+    vec_results = [SearchCandidate(0.9, corpus_id, uuid.uuid4(), "It is sunny today.", 0, 18),
+                   SearchCandidate(0.5, corpus_id, document_id1, "California sunshine is great.", 17, 46)]
+
+    results = ReciprocalRankFusion(k=60).fuse(doc_results, vec_results)
+
+    assert len(results) == 3
+    # second ranked chunk, plus the first ranked sentence it contains
+    assert results[0].score == pytest.approx(1 / 62 + 1 / 61)
+    assert results[1].score == pytest.approx(1 / 61)
+    assert results[2].score == pytest.approx(1 / 62)
+
+
+def test_get_fusion_strategy():
+    assert isinstance(get_fusion_strategy("score"), ScoreFusion)
+    assert isinstance(get_fusion_strategy("rrf"), ReciprocalRankFusion)
+    with pytest.raises(IllegalArgumentException):
+        get_fusion_strategy("nope")
+
+
+def test_top_k():
+    corpus_id = uuid.uuid4()
+    candidates = [SearchCandidate(score, corpus_id, uuid.uuid4(), str(score)) for score in [0.3, 2.0, 1.5, 0.1, 1.9]]
+
+    assert [x.score for x in top_k(candidates, 3)] == [2.0, 1.9, 1.5]
+    assert [x.score for x in top_k(candidates)] == [2.0, 1.9, 1.5, 0.3, 0.1]
+    assert [x.score for x in top_k(candidates, 10)] == [2.0, 1.9, 1.5, 0.3, 0.1]
+    assert top_k(candidates, 0) == []
+    assert top_k([], 3) == []
+
+
+def test_top_k_ties_keep_order():
+    corpus_id = uuid.uuid4()
+    candidates = [SearchCandidate(1.0, corpus_id, uuid.uuid4(), str(i)) for i in range(4)]
+    assert [x.text for x in top_k(candidates, 2)] == ["0", "1"]
+
+
+def test_interleave():
+    def stream(name: str, size: int):
+        for i in range(size):
+            # Fail if the stream is consumed further than needed
+            assert i < 2
+            yield name + str(i)
+
+    assert interleave([["a0", "a1", "a2"], ["b0"], ["c0", "c1"]], 10) == ["a0", "b0", "c0", "a1", "c1", "a2"]
+    assert interleave([stream("a", 5), stream("b", 5)], 3) == ["a0", "b0", "a1"]
+    assert interleave([], 3) == []
@@ -0,0 +1,75 @@
+import threading
+import numpy as np
+import pytest
+from unittest import mock
+from memas.encoder.batching_encoder import MicroBatchingTextEncoder
+from memas.interface.encoder import TextEncoder
+
+
+def make_encoder() -> TextEncoder:
+    encoder = mock.Mock(spec=TextEncoder)
+    encoder.ENCODER_NAME = "TEST"
+    encoder.VECTOR_DIMENSION = 2
+    encoder.embed_multiple.side_effect = lambda text_list: [np.array([len(x), 1.0]) for x in text_list]
+    return encoder
+
+
+def embed_concurrently(batching_encoder: MicroBatchingTextEncoder, requests: list[list[str]]) -> list:
+    results = [None] * len(requests)
+    barrier = threading.Barrier(len(requests))
+
+    def embed(i):
+        barrier.wait()
+        results[i] = batching_encoder.embed_multiple(requests[i])
+
+    threads = [threading.Thread(target=embed, args=(i,)) for i in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_requests_share_a_batch():
+    encoder = make_encoder()
+    batching_encoder = MicroBatchingTextEncoder(encoder, max_batch_size=10, window_ms=500, name="test_batching")
+    batching_encoder.init()
+
+    requests = [["a"], ["bb", "ccc"], ["dddd"]]
+    results = embed_concurrently(batching_encoder, requests)
+    batching_encoder.shutdown()
+
+    assert encoder.embed_multiple.call_count == 1
+    assert sorted(encoder.embed_multiple.call_args.args[0]) == ["a", "bb", "ccc", "dddd"]
+    # Each caller gets back the embeddings of its own sentences
+    for request, result in zip(requests, results):
+        assert [x[0] for x in result] == [len(x) for x in request]
+
+
+def test_max_batch_size():
+    encoder = make_encoder()
+    batching_encoder = MicroBatchingTextEncoder(encoder, max_batch_size=2, window_ms=200)
+    batching_encoder.init()
+
+    requests = [["a"], ["b"], ["c"], ["d", "e", "f"]]
+    results = embed_concurrently(batching_encoder, requests)
+    batching_encoder.shutdown()
+
+    # Requests are never split, so larger ones run on their own
+    batches = [x.args[0] for x in encoder.embed_multiple.call_args_list]
+    assert ["d", "e", "f"] in batches
+    assert all(len(batch) <= 2 for batch in batches if batch != ["d", "e", "f"])
+    assert sorted(sum([x.args[0] for x in encoder.embed_multiple.call_args_list], [])) == ["a", "b", "c", "d", "e", "f"]
+    assert [len(x) for x in results] == [1, 1, 1, 3]
+
+
+def test_errors_are_propagated():
+    encoder = make_encoder()
+    encoder.embed_multiple.side_effect = ValueError("oops")
+    batching_encoder = MicroBatchingTextEncoder(encoder, window_ms=1)
+    batching_encoder.init()
+
+    with pytest.raises(ValueError):
+        batching_encoder.embed("hello")
+    batching_encoder.shutdown()
+
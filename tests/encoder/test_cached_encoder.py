@@ -0,0 +1,60 @@
+import numpy as np
+from unittest import mock
+from memas.encoder.cached_encoder import CachingTextEncoder, PersistentCachingTextEncoder, normalize_text
+from memas.interface.encoder import TextEncoder
+
+
+def make_encoder() -> TextEncoder:
+    encoder = mock.Mock(spec=TextEncoder)
+    encoder.ENCODER_NAME = "TEST"
+    encoder.VECTOR_DIMENSION = 2
+    encoder.embed_multiple.side_effect = lambda text_list: [np.array([len(x), 1.0]) for x in text_list]
+    return encoder
+
+
+def test_normalize_text():
+    assert normalize_text("  How's   the\tweather? ") == "How's the weather?"
+
+
+def test_only_misses_are_embedded():
+    encoder = make_encoder()
+    cached_encoder = CachingTextEncoder(encoder, 10)
+
+    first = cached_encoder.embed_multiple(["hello there", "general kenobi"])
+    second = cached_encoder.embed_multiple(["hello  there", "you are a bold one", "you are a bold one"])
+
+    assert encoder.embed_multiple.call_args_list == [
+        mock.call(["hello there", "general kenobi"]),
+        mock.call(["you are a bold one"]),
+    ]
+    assert np.array_equal(second[0], first[0])
+    assert np.array_equal(second[1], second[2])
+    assert cached_encoder.cache.hits.value == 1
+    assert cached_encoder.cache.misses.value == 4
+
+
+def test_cache_keyed_by_encoder_name():
+    encoder = make_encoder()
+    cached_encoder = CachingTextEncoder(encoder, 10)
+
+    assert cached_encoder.ENCODER_NAME == "TEST"
+    assert cached_encoder._cache_key("hi") == ("TEST", "hi")
+
+
+def test_persistent_cache_survives_restart(tmp_path):
+    encoder = make_encoder()
+    cached_encoder = PersistentCachingTextEncoder(encoder, str(tmp_path / "cache"), 10, name=None)
+
+    first = cached_encoder.embed_multiple(["ok", "thanks", "ok"])
+    cached_encoder.shutdown()
+    restarted = PersistentCachingTextEncoder(encoder, str(tmp_path / "cache"), 10, name=None)
+    second = restarted.embed_multiple(["thanks", " ok ", "hello there"])
+
+    assert encoder.embed_multiple.call_args_list == [
+        mock.call(["ok", "thanks"]),
+        mock.call(["hello there"]),
+    ]
+    assert np.array_equal(second[0], first[1])
+    assert np.array_equal(second[1], first[0])
+    assert np.array_equal(second[2], [11.0, 1.0])
+    assert (restarted.cache.hits.value, restarted.cache.misses.value) == (2, 1)
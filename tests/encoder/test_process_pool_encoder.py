@@ -0,0 +1,96 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+from memas.encoder.process_pool_encoder import ProcessPoolTextEncoder
+from memas.interface.encoder import TextEncoder
+
+
+class LengthEncoder(TextEncoder):
+    """
+    Picklable test encoder, since it's sent to the worker processes
+    """
+
+    def __init__(self) -> None:
+        super().__init__(ENCODER_NAME="LENGTH", VECTOR_DIMENSION=2)
+
+    def init(self):
+        pass
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_multiple([text])[0]
+
+    def embed_multiple(self, text_list: list[str]) -> list[np.ndarray]:
+        if "fail" in text_list:
+            raise ValueError("asked to fail")
+        return [np.array([len(x), 1.0]) for x in text_list]
+
+
+@pytest.fixture(scope="module")
+def pool_encoder():
+    encoder = ProcessPoolTextEncoder(LengthEncoder(), num_workers=2)
+    encoder.init()
+    yield encoder
+    encoder.shutdown()
+
+
+def test_embed_multiple(pool_encoder):
+    embeddings = pool_encoder.embed_multiple(["a", "bb", "héllo"])
+    assert [x.tolist() for x in embeddings] == [[1, 1], [2, 1], [5, 1]]
+    assert pool_encoder.embed("ccc").tolist() == [3, 1]
+    assert pool_encoder.embed_multiple([]) == []
+
+
+def test_worker_errors(pool_encoder):
+    with pytest.raises(RuntimeError, match="asked to fail"):
+        pool_encoder.embed_multiple(["fail"])
+    # The worker keeps serving after an error
+    assert pool_encoder.embed("a").tolist() == [1, 1]
+
+
+def test_restart_dead_workers(pool_encoder):
+    for worker in pool_encoder.workers:
+        worker.kill()
+        worker.join()
+
+    # The next request notices that every worker died, instead of waiting in the listen backlog until it times out
+    assert pool_encoder.embed("bb").tolist() == [2, 1]
+    assert all(worker.is_alive() for worker in pool_encoder.workers)
+
+
+def test_embed_from_forked_process(pool_encoder):
+    # Like celery's prefork workers, which inherit the encoder of their parent
+    pid = os.fork()
+    if pid == 0:
+        # The child must never return into pytest
+        ok = False
+        try:
+            ok = pool_encoder.embed("aaa").tolist() == [3, 1]
+        finally:
+            os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    # The forked process didn't touch the workers
+    assert all(worker.is_alive() for worker in pool_encoder.workers)
+
+
+def test_eventlet_monkey_patched_parent():
+    pytest.importorskip("eventlet")
+    # Monkey patching is global, so it runs in a process of its own, like gunicorn's eventlet workers
+    script = """
+import eventlet
+eventlet.monkey_patch()
+from memas.encoder.process_pool_encoder import ProcessPoolTextEncoder
+from test_process_pool_encoder import LengthEncoder
+
+encoder = ProcessPoolTextEncoder(LengthEncoder(), num_workers=2)
+encoder.init()
+try:
+    assert [x.tolist() for x in encoder.embed_multiple(["a", "bb"])] == [[1, 1], [2, 1]]
+finally:
+    encoder.shutdown()
+"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.dirname(__file__), *sys.path]))
+    result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
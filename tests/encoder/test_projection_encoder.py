@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from unittest import mock
+from memas.encoder.projection_encoder import (Projection, ProjectionTextEncoder, fit_pca, fit_projection,
+                                              fit_random)
+from memas.interface.encoder import TextEncoder
+from memas.interface.exceptions import IllegalArgumentException
+
+
+def make_encoder(embeddings: dict[str, np.ndarray]) -> TextEncoder:
+    encoder = mock.Mock(spec=TextEncoder)
+    encoder.ENCODER_NAME = "TEST"
+    encoder.VECTOR_DIMENSION = 3
+    encoder.embed_multiple.side_effect = lambda text_list: [embeddings[x] for x in text_list]
+    return encoder
+
+
+def test_fit_pca_keeps_directions_of_most_variance():
+    rng = np.random.default_rng(0)
+    # Nearly all the variance lies along the first two axes
+    samples = rng.normal(size=(200, 3)) * np.array([5.0, 2.0, 0.01]) + 1
+
+    projection = fit_pca(samples, 2, "v1")
+
+    assert projection.name == "pca2_v1"
+    assert projection.output_dimension == 2
+    assert np.allclose(np.abs(projection.components[:, 2]), 0, atol=1e-2)
+    # Directions around the mean survive the projection, since the dropped dimension barely varies
+    centered = samples[:2] - samples.mean(axis=0)
+    projected = projection.apply(samples[:2])
+    assert projected[0] @ projected[1] == pytest.approx(
+        centered[0] @ centered[1] / np.linalg.norm(centered[0]) / np.linalg.norm(centered[1]), abs=1e-2)
+
+    with pytest.raises(IllegalArgumentException):
+        fit_pca(samples[:1], 2, "v1")
+
+
+def test_projection_version_must_fit_collection_name():
+    with pytest.raises(IllegalArgumentException):
+        fit_random(3, 2, "v1-beta")
+
+
+def test_projections_are_unit_vectors():
+    rng = np.random.default_rng(0)
+    samples = rng.normal(size=(50, 8))
+    samples /= np.linalg.norm(samples, axis=1, keepdims=True)
+
+    for projection in [fit_pca(samples, 3, "v1"), fit_random(8, 3, "v1")]:
+        projected = projection.apply(samples)
+        # Score fusion maps L2 distances onto 2 - distance, which only holds for unit vectors
+        assert np.allclose(np.linalg.norm(projected, axis=1), 1, atol=1e-5)
+
+
+def test_save_and_load(tmp_path):
+    projection = fit_random(3, 2, "v1")
+    path = str(tmp_path / "projections" / "TEST_random2_v1.npz")
+
+    projection.save(path)
+    loaded = Projection.load(path)
+
+    assert loaded.method == "random" and loaded.version == "v1"
+    assert np.array_equal(loaded.components, projection.components)
+    assert np.array_equal(loaded.mean, projection.mean)
+
+
+def test_projection_encoder():
+    embeddings = {"a": np.array([[1.0, 2.0, 3.0]]), "b": np.array([0.0, 1.0, 0.0])}
+    encoder = make_encoder(embeddings)
+    projection = Projection("pca", "v1", np.array([0.0, 1.0, 0.0]), np.array([[1.0, 0.0, 0.0], [0.0, 0.0, 1.0]]))
+
+    projection_encoder = ProjectionTextEncoder(encoder, projection)
+
+    # The projection is part of the name, so its vectors get their own collection
+    assert projection_encoder.ENCODER_NAME == "TEST_pca2_v1"
+    assert projection_encoder.VECTOR_DIMENSION == 2
+    result = projection_encoder.embed_multiple(["a", "b"])
+    # [1, 3] scaled to unit length, while "b" projects onto the origin
+    assert np.allclose(result[0], np.array([1.0, 3.0]) / np.sqrt(10)) and result[0].dtype == np.float32
+    assert np.array_equal(result[1], [0.0, 0.0])
+    assert np.allclose(projection_encoder.embed("a"), np.array([1.0, 3.0]) / np.sqrt(10))
+    assert projection_encoder.embed_multiple([]) == []
+
+    with pytest.raises(IllegalArgumentException):
+        ProjectionTextEncoder(encoder, fit_random(4, 2, "v1"))
+
+
+def test_fit_projection_embeds_in_batches():
+    rng = np.random.default_rng(0)
+    embeddings = {str(i): rng.normal(size=3) for i in range(10)}
+    encoder = make_encoder(embeddings)
+
+    projection = fit_projection(encoder, list(embeddings.keys()), "pca", 2, "v1", batch_size=4)
+
+    assert encoder.embed_multiple.call_count == 3
+    assert projection.input_dimension == 3 and projection.output_dimension == 2
+
+    random_projection = fit_projection(encoder, [], "random", 2, "v1")
+    assert random_projection.name == "random2_v1"
+    assert encoder.embed_multiple.call_count == 3
@@ -0,0 +1,19 @@
+import uuid
+from memas.storage_driver.corpus_doc_metadata import group_document_keys
+
+
+def test_group_document_keys():
+    corpus_id1 = uuid.uuid4()
+    corpus_id2 = uuid.uuid4()
+    document_id1 = uuid.uuid4()
+    document_id2 = uuid.uuid4()
+    document_id3 = uuid.uuid4()
+
+    keys = [(corpus_id1, document_id1), (corpus_id2, document_id3), (corpus_id1, document_id2),
+            (corpus_id1, document_id1), (corpus_id2, document_id3)]
+
+    assert group_document_keys(keys) == {corpus_id1: [document_id1, document_id2], corpus_id2: [document_id3]}
+
+
+def test_group_document_keys_empty():
+    assert group_document_keys([]) == {}
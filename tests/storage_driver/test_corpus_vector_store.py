@@ -1,7 +1,16 @@
 import uuid
 import time
 import re
-from memas.storage_driver.corpus_vector_store import hash_sentence_id
+from unittest import mock
+import numpy as np
+import pytest
+from pymilvus import MilvusException
+from memas.interface.storage_driver import DocumentEntity
+from memas.interface.corpus import SearchSettings
+from memas.interface.exceptions import IllegalStateException
+from memas.storage_driver.corpus_vector_store import (MilvusSentenceVectorStore, aggregate_hits, hash_sentence_id,
+                                                     locate_chunks, pool_embeddings)
+from memas.storage_driver.milvus_partitions import BucketPlacement, CorpusPlacement
 from memas.text_parsing.text_parsers import split_doc
 
 
@@ -56,3 +65,342 @@ def test_sentence_splitting():
             print("about to print WRODS")
             print(word)
             assert False
+
+
+def make_vec_store(embed=lambda sentence: [1.0, 0.0], **kwargs) -> MilvusSentenceVectorStore:
+    """Creates a vector store with a mock encoder and collection, where inserts succeed and searches find nothing
+
+    Args:
+        embed (optional): embeds a single sentence
+        kwargs: passed on to the vector store
+    """
+    encoder = mock.Mock(ENCODER_NAME="test", VECTOR_DIMENSION=2)
+    encoder.embed_multiple.side_effect = lambda sentences: [np.array(embed(x)) for x in sentences]
+    vec_store = MilvusSentenceVectorStore(encoder, **kwargs)
+    vec_store.collection = mock.Mock()
+    vec_store.collection.insert.side_effect = lambda data, **kwargs: mock.Mock(insert_count=len(data[0]))
+    vec_store.collection.search.return_value = []
+    return vec_store
+
+
+@pytest.fixture
+def split_on_pipes():
+    """Splits documents and clues into sentences on "|", instead of with nltk"""
+    with mock.patch("memas.storage_driver.corpus_vector_store.split_doc",
+                    side_effect=lambda doc, _: doc.split("|")) as split_doc:
+        yield split_doc
+
+
+@mock.patch("memas.storage_driver.corpus_vector_store.MAX_INSERT_ROWS", 3)
+@mock.patch("memas.storage_driver.corpus_vector_store.ENCODER_BATCH_SIZE", 2)
+def test_save_documents_batching(split_on_pipes):
+    vec_store = make_vec_store(lambda sentence: [len(sentence), 0.0])
+
+    corpus_id = uuid.uuid4()
+    doc1 = DocumentEntity(corpus_id, uuid.uuid4(), "doc1", "a|bb|ccc")
+    doc2 = DocumentEntity(corpus_id, uuid.uuid4(), "doc2", "dddd|eeeee")
+    assert vec_store.save_documents([doc1, doc2])
+
+    # Sentences across both documents are embedded in fixed size batches
+    embedded = [x.args[0] for x in vec_store.encoder.embed_multiple.call_args_list]
+    assert embedded == [["a", "bb"], ["ccc", "dddd"], ["eeeee"]]
+
+    # Then inserted in bounded batches, with the offsets still relative to each document
+    batches = [x.args[0] for x in vec_store.collection.insert.call_args_list]
+    assert [len(batch[0]) for batch in batches] == [3, 2]
+    assert sum([batch[5] for batch in batches], []) == [0, 2, 5, 0, 5]
+    assert sum([batch[6] for batch in batches], []) == [1, 4, 8, 4, 10]
+    assert [x[0] for x in np.row_stack([batch[4] for batch in batches])] == [1, 2, 3, 4, 5]
+    assert [x[:32] for batch in batches for x in batch[0]] == [doc1.document_id.hex] * 3 + [doc2.document_id.hex] * 2
+
+
+@mock.patch("memas.storage_driver.corpus_vector_store.MAX_INSERT_ROWS", 2)
+def test_save_documents_batch_statuses(split_on_pipes):
+    vec_store = make_vec_store()
+    # The second insert batch fails, which holds the sentences of doc2 and doc3
+    vec_store.collection.insert.side_effect = [mock.Mock(insert_count=2), MilvusException(message="boom"),
+                                               mock.Mock(insert_count=1)]
+
+    corpus_id = uuid.uuid4()
+    docs = [DocumentEntity(corpus_id, uuid.uuid4(), f"doc{i}", text) for i, text in enumerate(["a|b", "c", "d", "e"])]
+    assert vec_store.save_documents_batch(docs) == [True, False, False, True]
+
+
+def make_iterator(batches):
+    iterator = mock.Mock()
+    iterator.next.side_effect = batches + [[]]
+    return iterator
+
+
+@mock.patch("memas.storage_driver.corpus_vector_store.time.time", return_value=2)
+@mock.patch("memas.storage_driver.corpus_vector_store.utility")
+@mock.patch("memas.storage_driver.corpus_vector_store.Collection")
+def test_rebuild_index(collection_cls, utility, _):
+    vec_store = make_vec_store(index_type="HNSW", index_params={"M": 16})
+    alias = vec_store.collection_name
+    utility.list_collections.return_value = ["other", f"{alias}_1"]
+    utility.list_aliases.side_effect = lambda name: [alias] if name == f"{alias}_1" else []
+
+    collections = {}
+    collection_cls.side_effect = lambda name, *args: collections.setdefault(name, mock.Mock())
+    row1 = {field.name: f"1_{field.name}" for field in vec_store.sentance_schema.fields}
+    row2 = {field.name: f"2_{field.name}" for field in vec_store.sentance_schema.fields}
+    old_collection = collection_cls(f"{alias}_1")
+    # row2 is inserted into the old collection after the initial copy
+    old_collection.query_iterator.side_effect = [make_iterator([[row1]]), make_iterator([[row1, row2]])]
+    new_collection = collection_cls(f"{alias}_2")
+    new_collection.query_iterator.return_value = make_iterator([[{"composite_id": row1["composite_id"]}]])
+    new_collection.insert.side_effect = lambda data, **kwargs: mock.Mock(insert_count=len(data[0]))
+
+    new_name = vec_store.rebuild_index()
+
+    assert new_name == f"{alias}_2"
+    new_collection.create_index.assert_called_once_with(
+        "embedding", {"index_type": "HNSW", "metric_type": "L2", "params": {"M": 16}})
+    utility.alter_alias.assert_called_once_with(new_name, alias)
+    utility.drop_collection.assert_called_once_with(f"{alias}_1")
+    # The vectors inserted during the rebuild are caught up on, without copying the others twice
+    inserted_ids = [x.args[0][0] for x in new_collection.insert.call_args_list]
+    assert inserted_ids == [[row1["composite_id"]], [row2["composite_id"]]]
+
+
+@mock.patch("memas.storage_driver.corpus_vector_store.time.time", return_value=2)
+@mock.patch("memas.storage_driver.corpus_vector_store.utility")
+@mock.patch("memas.storage_driver.corpus_vector_store.Collection")
+def test_rebuild_index_legacy_collection(collection_cls, utility, _):
+    vec_store = make_vec_store()
+    alias = vec_store.collection_name
+    # Created before aliases were used, so the collection holds the name itself
+    utility.list_collections.return_value = [alias]
+    utility.list_aliases.return_value = []
+    collections = {}
+    collection_cls.side_effect = lambda name, *args: collections.setdefault(name, mock.Mock())
+    for name in [alias, f"{alias}_2"]:
+        collection_cls(name).query_iterator.side_effect = lambda **kwargs: make_iterator([])
+
+    with pytest.raises(IllegalStateException):
+        vec_store.rebuild_index()
+    utility.drop_collection.assert_not_called()
+
+    vec_store.rebuild_index(allow_downtime=True)
+    utility.drop_collection.assert_called_once_with(alias)
+    utility.create_alias.assert_called_once_with(f"{alias}_2", alias)
+
+
+@mock.patch("memas.storage_driver.corpus_vector_store.time.time", return_value=2)
+@mock.patch("memas.storage_driver.corpus_vector_store.utility")
+@mock.patch("memas.storage_driver.corpus_vector_store.Collection")
+def test_first_init_creates_alias(collection_cls, utility, _):
+    vec_store = make_vec_store()
+    vec_store.first_init()
+
+    # New collections are served through an alias from the start, so rebuilds never need downtime
+    collection_cls.assert_any_call(f"{vec_store.collection_name}_2", vec_store.sentance_schema)
+    utility.create_alias.assert_called_once_with(f"{vec_store.collection_name}_2", vec_store.collection_name)
+    assert vec_store.collection == collection_cls(vec_store.collection_name)
+
+
+@mock.patch("memas.storage_driver.corpus_vector_store.time.time", return_value=2)
+@mock.patch("memas.storage_driver.corpus_vector_store.utility")
+@mock.patch("memas.storage_driver.corpus_vector_store.Collection")
+def test_rebuild_index_moves_default_partition_rows(collection_cls, utility, _):
+    vec_store = make_vec_store(placement=BucketPlacement(4))
+    alias = vec_store.collection_name
+    utility.list_collections.return_value = [f"{alias}_1"]
+    utility.list_aliases.return_value = [alias]
+    collections = {}
+    collection_cls.side_effect = lambda name, *args: collections.setdefault(name, mock.Mock())
+    collection_cls(f"{alias}_1").query_iterator.side_effect = lambda **kwargs: make_iterator([])
+
+    # A process still serving the old collection inserted a row without a placement after the switch
+    corpus_id = uuid.UUID(int=5)
+    row = {field.name: f"1_{field.name}" for field in vec_store.sentance_schema.fields}
+    row["corpus_id"] = corpus_id.hex
+    new_collection = collection_cls(f"{alias}_2")
+    new_collection.query_iterator.side_effect = lambda **kwargs: make_iterator(
+        [[row]] if kwargs["partition_names"] == ["_default"] else [])
+    new_collection.has_partition.return_value = False
+    new_collection.insert.side_effect = lambda data, **kwargs: mock.Mock(insert_count=len(data[0]))
+
+    vec_store.rebuild_index()
+
+    new_collection.insert.assert_called_once_with(mock.ANY, partition_name="bucket_1")
+    new_collection.delete.assert_called_once_with(f"composite_id in [\"{row['composite_id']}\"]",
+                                                  partition_name="_default")
+
+
+@mock.patch("memas.storage_driver.corpus_vector_store.Collection")
+def test_fallback_placement_switches_after_rebuild(collection_cls, split_on_pipes):
+    # Serving a collection with a partition key, while a bucket placement is configured
+    vec_store = make_vec_store(placement=BucketPlacement(4))
+    vec_store.active_placement = None
+    vec_store.collection.schema = make_vec_store().sentance_schema
+    collection_cls.return_value = vec_store.collection
+
+    corpus_id = uuid.UUID(int=5)
+    assert vec_store.save_documents([DocumentEntity(corpus_id, uuid.uuid4(), "doc", "a")])
+    assert "partition_name" not in vec_store.collection.insert.call_args.kwargs
+
+    # The maintenance process rebuilt the collection onto buckets, and released it
+    old_collection = vec_store.collection
+    old_collection.search.side_effect = MilvusException(message="collection not loaded")
+    new_collection = make_vec_store(placement=BucketPlacement(4)).collection
+    new_collection.schema = vec_store.sentance_schema
+    new_collection.has_partition.return_value = True
+    new_collection.partition.return_value = mock.Mock(num_entities=2)
+    collection_cls.return_value = new_collection
+
+    # Searches switch to the partitions of the rebuilt collection instead of failing
+    assert vec_store.search_corpora([corpus_id], "clue") == []
+    assert vec_store.active_placement is vec_store.placement
+    new_collection.load.assert_called_once_with(partition_names=["bucket_1"])
+    assert new_collection.search.call_args.kwargs["partition_names"] == ["bucket_1"]
+
+    # And inserts are routed to the partition of their corpus, rather than the never searched default partition
+    assert vec_store.save_documents([DocumentEntity(corpus_id, uuid.uuid4(), "doc", "b")])
+    assert new_collection.insert.call_args.kwargs["partition_name"] == "bucket_1"
+
+
+def test_fallback_placement_inserts_check_for_rebuild(split_on_pipes):
+    vec_store = make_vec_store(placement=BucketPlacement(4))
+    vec_store.active_placement = None
+    old_collection = vec_store.collection
+    rebuilt = make_vec_store(placement=BucketPlacement(4)).collection
+    rebuilt.schema = vec_store.sentance_schema
+    rebuilt.has_partition.return_value = True
+
+    with mock.patch("memas.storage_driver.corpus_vector_store.Collection", return_value=rebuilt):
+        assert vec_store.save_documents([DocumentEntity(uuid.UUID(int=5), uuid.uuid4(), "doc", "a")])
+    # The insert noticed the rebuild without any search failing first
+    assert rebuilt.insert.call_args.kwargs["partition_name"] == "bucket_1"
+    old_collection.insert.assert_not_called()
+
+
+def test_pool_embeddings():
+    embeddings = [np.array([1.0, 0.0]), np.array([0.0, 1.0]), np.array([0.0, 1.0])]
+    assert pool_embeddings(embeddings, 3) == embeddings
+
+    # Consecutive sentences are pooled into unit vectors
+    pooled = pool_embeddings(embeddings, 2)
+    assert len(pooled) == 2
+    assert np.allclose(pooled[0], [np.sqrt(0.5), np.sqrt(0.5)])
+    assert np.allclose(pooled[1], [0.0, 1.0])
+
+    assert pool_embeddings([], 4) == []
+
+
+def make_hit(hit_id: str, distance: float):
+    return mock.Mock(id=hit_id, distance=distance, entity=hit_id)
+
+
+def test_aggregate_hits():
+    hit_lists = [[make_hit("a", 0.2), make_hit("b", 0.5)], [make_hit("b", 0.3), make_hit("c", 1.0)]]
+
+    merged = aggregate_hits(hit_lists, "max", 10)
+    assert [(x.id, x.distance) for x in merged] == [("a", 0.2), ("b", 0.3), ("c", 1.0)]
+
+    # b matches both clue sentences, so its summed similarity ranks it first
+    merged = aggregate_hits(hit_lists, "sum", 2)
+    assert [x.id for x in merged] == ["b", "a"]
+    assert np.isclose(merged[0].distance, 2 - (1.5 + 1.7))
+
+
+def test_search_corpora_clue_vectors(split_on_pipes):
+    vec_store = make_vec_store()
+
+    vec_store.search_corpora([uuid.uuid4()], "a|b|c|d|e|f", SearchSettings(max_clue_vectors=3))
+    assert len(vec_store.collection.search.call_args.kwargs["data"]) == 3
+
+    vec_store.search_corpora([uuid.uuid4()], "a|b|c|d|e|f", SearchSettings(clue_aggregation="pooled"))
+    assert len(vec_store.collection.search.call_args.kwargs["data"]) == 1
+
+
+def test_partition_placement(split_on_pipes):
+    vec_store = make_vec_store(placement=CorpusPlacement())
+    vec_store.collection.has_partition.return_value = False
+    vec_store.collection.partition.return_value = mock.Mock(num_entities=2)
+
+    corpus_id1, corpus_id2 = uuid.uuid4(), uuid.uuid4()
+    assert vec_store.save_documents([DocumentEntity(corpus_id1, uuid.uuid4(), "doc1", "a|b"),
+                                     DocumentEntity(corpus_id2, uuid.uuid4(), "doc2", "c")])
+    # Each corpus' vectors are inserted into its own partition
+    vec_store.collection.create_partition.assert_has_calls(
+        [mock.call(f"corpus_{corpus_id1.hex}"), mock.call(f"corpus_{corpus_id2.hex}")])
+    assert [x.kwargs["partition_name"] for x in vec_store.collection.insert.call_args_list] == [
+        f"corpus_{corpus_id1.hex}", f"corpus_{corpus_id2.hex}"]
+
+    # Only the partitions of the searched corpora are loaded and searched
+    unknown_id = uuid.uuid4()
+    vec_store.search_corpora([corpus_id1, unknown_id], "clue")
+    vec_store.collection.load.assert_called_once_with(partition_names=[f"corpus_{corpus_id1.hex}"])
+    search_kwargs = vec_store.collection.search.call_args.kwargs
+    assert search_kwargs["partition_names"] == [f"corpus_{corpus_id1.hex}"]
+    assert search_kwargs["expr"] == f"corpus_id in [\"{corpus_id1.hex}\", \"{unknown_id.hex}\"]"
+
+
+def test_delete_corpus_partition_placement(split_on_pipes):
+    vec_store = make_vec_store(placement=BucketPlacement(4))
+    vec_store.collection.has_partition.side_effect = lambda partition: partition == "bucket_1"
+    vec_store.collection.partition.return_value = mock.Mock(num_entities=2)
+
+    corpus_id = uuid.UUID(int=5)
+    vec_store.delete_corpus(corpus_id)
+    # Milvus needs the partition loaded to delete by corpus id, since it's not the primary key
+    vec_store.collection.load.assert_called_once_with(partition_names=["bucket_1"])
+    vec_store.collection.delete.assert_called_once_with(f"corpus_id in [\"{corpus_id.hex}\"]",
+                                                        partition_name="bucket_1")
+
+    # Corpora without a partition have nothing to delete
+    vec_store.delete_corpus(uuid.UUID(int=6))
+    assert vec_store.collection.delete.call_count == 1
+
+
+def test_locate_chunks():
+    chunk_offsets = [(0, 10), (11, 20), (22, 30)]
+    assert locate_chunks(chunk_offsets, 2, 8) == (0, 0)
+    assert locate_chunks(chunk_offsets, 11, 20) == (1, 1)
+    # The sentence spans the whitespace between chunks
+    assert locate_chunks(chunk_offsets, 5, 15) == (0, 1)
+    assert locate_chunks(chunk_offsets, 5, 30) == (0, 2)
+
+
+def test_slim_schema(split_on_pipes):
+    vec_store = make_vec_store(slim_schema=True)
+    assert "text_preview" not in vec_store._field_names()
+
+    corpus_id, document_id = uuid.uuid4(), uuid.uuid4()
+    assert vec_store.save_documents([DocumentEntity(corpus_id, document_id, "doc", "aa|bb")], [[(0, 2), (3, 5)]])
+    columns = dict(zip(vec_store._field_names(), vec_store.collection.insert.call_args.args[0]))
+    assert (columns["first_chunk"], columns["last_chunk"]) == ([0, 1], [0, 1])
+
+    hit = mock.Mock(id=document_id.hex + "0" * 32, distance=0.5)
+    hit.entity = mock.Mock(corpus_id=corpus_id.hex, start_index=3, end_index=5, first_chunk=1, last_chunk=1)
+    vec_store.collection.search.return_value = [[hit]]
+    [(distance, doc_entity, start, end)] = vec_store.search_corpora([corpus_id], "clue")
+    # Only the chunk reference is returned, the text is resolved from the document store later on
+    assert doc_entity.document is None
+    assert doc_entity.chunk_ids == [document_id.hex + "{:032b}".format(1)]
+    assert "text_preview" not in vec_store.collection.search.call_args.kwargs["output_fields"]
+
+
+def test_search_corpora_rerank(split_on_pipes):
+    vec_store = make_vec_store(rerank_oversample=3)
+
+    # The quantized index ranks the first hit best, while its exact distance is the worst
+    document_id = uuid.uuid4()
+    hits = [mock.Mock(id=document_id.hex + str(i) * 32, distance=distance)
+            for i, distance in enumerate([0.1, 0.2, 0.3])]
+    for hit in hits:
+        hit.entity = mock.Mock(corpus_id=uuid.uuid4().hex, start_index=0, end_index=1, document_name="doc",
+                               text_preview=hit.id)
+    vec_store.collection.search.return_value = [hits]
+    vec_store.collection.query.return_value = [
+        {"composite_id": hits[0].id, "embedding": [0.0, 1.0]},
+        {"composite_id": hits[1].id, "embedding": [1.0, 0.0]},
+        {"composite_id": hits[2].id, "embedding": [0.6, 0.8]},
+    ]
+
+    result = vec_store.search_corpora([uuid.uuid4()], "clue", SearchSettings(vec_search_count=2))
+    assert vec_store.collection.search.call_args.kwargs["limit"] == 6
+    assert [doc_entity.document for _, doc_entity, _, _ in result] == [hits[1].id, hits[2].id]
+    assert [distance for distance, _, _, _ in result] == pytest.approx([0.0, 0.8])
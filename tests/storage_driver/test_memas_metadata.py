@@ -1,7 +1,9 @@
+import uuid
 import pytest
 from unittest import mock
 from cassandra.cqlengine.query import DoesNotExist
 
+from memas.interface.corpus import CorpusInfo, CorpusType
 from memas.interface.exceptions import NamespaceDoesNotExistException
 from memas.interface.namespace import ROOT_ID
 from memas.storage_driver.memas_metadata import split_corpus_pathname, split_namespace_pathname
@@ -28,3 +30,37 @@ def test_get_id_by_name_doesnt_exist(name_to_id):
     store = MemasMetadataStoreImpl()
     with pytest.raises(NamespaceDoesNotExistException):
         store._get_id_by_name("XD")
+
+
+def test_query_corpora_cache():
+    store = MemasMetadataStoreImpl()
+    store.enable_query_corpora_cache(10)
+    corpus_info = CorpusInfo("ns:corpus", uuid.uuid4(), uuid.uuid4(), CorpusType.CONVERSATION)
+
+    with mock.patch.object(store, "_get_query_corpora", return_value={corpus_info}) as get_query_corpora:
+        assert store.get_query_corpora("ns") == {corpus_info}
+        assert store.get_query_corpora("ns") == {corpus_info}
+        assert get_query_corpora.call_count == 1
+
+        # Creating a corpus under the namespace invalidates it
+        store._invalidate_query_corpora("ns")
+        assert store.get_query_corpora("ns") == {corpus_info}
+        assert get_query_corpora.call_count == 2
+
+
+def test_query_corpora_cache_negative():
+    store = MemasMetadataStoreImpl()
+    store.enable_query_corpora_cache(10)
+
+    with mock.patch.object(store, "_get_query_corpora",
+                           side_effect=NamespaceDoesNotExistException("ns")) as get_query_corpora:
+        with pytest.raises(NamespaceDoesNotExistException):
+            store.get_query_corpora("ns")
+        with pytest.raises(NamespaceDoesNotExistException):
+            store.get_query_corpora("ns")
+        assert get_query_corpora.call_count == 1
+
+        store._invalidate_query_corpora()
+        with pytest.raises(NamespaceDoesNotExistException):
+            store.get_query_corpora("ns")
+        assert get_query_corpora.call_count == 2
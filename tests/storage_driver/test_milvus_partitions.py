@@ -0,0 +1,107 @@
+import threading
+import uuid
+import pytest
+from memas.interface.exceptions import IllegalArgumentException
+from memas.storage_driver.milvus_partitions import (BucketPlacement, CorpusPlacement, PartitionLoader,
+                                                    get_partition_placement)
+
+
+def test_placements():
+    corpus_id = uuid.uuid4()
+    assert BucketPlacement(8).partition_of(corpus_id) == f"bucket_{corpus_id.int % 8}"
+    assert CorpusPlacement().partition_of(corpus_id) == f"corpus_{corpus_id.hex}"
+
+    assert get_partition_placement("partition_key") is None
+    assert isinstance(get_partition_placement("bucket", 8), BucketPlacement)
+    with pytest.raises(IllegalArgumentException):
+        get_partition_placement("nope")
+
+
+def make_loader(budget: int):
+    events = []
+    loader = PartitionLoader(lambda p: events.append(("load", p)), lambda p: events.append(("release", p)),
+                             lambda p: 10, budget)
+    return loader, events
+
+
+def test_partition_loader_evicts_least_recently_used():
+    loader, events = make_loader(25)
+
+    for partitions in [["a"], ["b"], ["a"], ["c"]]:
+        with loader.acquire(partitions):
+            pass
+
+    # a was searched again after b, so b is the one released once c exceeds the budget
+    assert events == [("load", "a"), ("load", "b"), ("load", "c"), ("release", "b")]
+    assert list(loader.loaded.keys()) == ["a", "c"]
+
+
+def test_partition_loader_keeps_searched_partitions():
+    loader, events = make_loader(15)
+
+    with loader.acquire(["a"]):
+        # a is still being searched, so it can't be released even though the budget is exceeded
+        with loader.acquire(["b"]):
+            assert ("release", "a") not in events
+        assert loader.loaded_bytes() == 20
+
+    with loader.acquire(["c"]):
+        pass
+    assert ("release", "a") in events and ("release", "b") in events
+    assert loader.pins == {}
+
+
+def test_partition_loader_invalidate():
+    loader, events = make_loader(0)
+    with loader.acquire(["a"]):
+        pass
+    loader.invalidate(["a"])
+    with loader.acquire(["a"]):
+        pass
+    assert events == [("load", "a"), ("load", "a")]
+
+
+def test_partition_loader_loads_outside_the_lock():
+    started, finish = threading.Event(), threading.Event()
+    loads = []
+
+    def load(partition: str):
+        loads.append(partition)
+        if partition == "slow":
+            started.set()
+            assert finish.wait(5)
+
+    loader = PartitionLoader(load, lambda p: None, lambda p: 10)
+    with loader.acquire(["fast"]):
+        pass
+
+    def search_slow():
+        with loader.acquire(["slow"]):
+            pass
+
+    searches = [threading.Thread(target=search_slow) for _ in range(2)]
+    searches[0].start()
+    assert started.wait(5)
+    searches[1].start()
+    # Searches of loaded partitions don't wait behind the slow load
+    with loader.acquire(["fast"]):
+        assert "slow" in loader.loading
+    finish.set()
+    for search in searches:
+        search.join(5)
+
+    # The second search of the slow partition waited for the first load, instead of loading it again
+    assert loads == ["fast", "slow"]
+    assert list(loader.loaded.keys()) == ["fast", "slow"]
+    assert loader.loading == {} and loader.pins == {}
+
+
+def test_partition_loader_failed_load():
+    def load(partition: str):
+        raise RuntimeError("boom")
+
+    loader = PartitionLoader(load, lambda p: None, lambda p: 10)
+    with pytest.raises(RuntimeError):
+        with loader.acquire(["a", "b"]):
+            pass
+    assert loader.loading == {} and loader.pins == {} and loader.loaded == {}
@@ -0,0 +1,31 @@
+from memas.metrics import Histogram, MetricsRegistry, Stopwatch
+
+
+def test_histogram():
+    histogram = Histogram((1, 5, 10))
+    for value in [0.5, 1, 3, 7, 20]:
+        histogram.observe(value)
+
+    assert histogram.snapshot() == {"count": 5, "sum": 31.5, "buckets": {"1": 2, "5": 3, "10": 4, "+Inf": 5}}
+
+
+def test_registry():
+    registry = MetricsRegistry()
+    registry.counter("test.count").inc(2)
+    registry.histogram("test.latency", (1,)).observe(2)
+
+    assert registry.snapshot() == {
+        "test.count": 2,
+        "test.latency": {"count": 1, "sum": 2, "buckets": {"1": 0, "+Inf": 1}},
+    }
+
+
+def test_stopwatch():
+    clock = iter([0, 1, 1.5, 4]).__next__
+    stopwatch = Stopwatch(clock)
+    stopwatch.lap("clients")
+    stopwatch.lap("datastores")
+    stopwatch.lap("clients")
+
+    assert stopwatch.phases == {"clients": 3.5, "datastores": 0.5}
+    assert stopwatch.summary() == "[total=4.000s] [clients=3.500s] [datastores=0.500s]"
@@ -0,0 +1,53 @@
+import threading
+from unittest import mock
+from memas.context_manager import ContextManager, Role
+from memas.encoder.cached_encoder import PersistentCachingTextEncoder
+
+
+def make_ctx(role: Role):
+    ctx = mock.Mock()
+    ctx.role = role
+    ctx.consts.warmup_embed_batch_sizes = [1, 4]
+    ctx.consts.warmup_hot_namespaces = ["hot1", "hot2"]
+    ctx.ready = threading.Event()
+    for store in ["memas_metadata", "corpus_metadata", "ingestion_jobs", "corpus_doc", "corpus_vec"]:
+        setattr(ctx, store, mock.Mock())
+    return ctx
+
+
+def test_warm_up():
+    ctx = make_ctx(Role.WEB)
+    # A failing step doesn't stop the rest of the warm up
+    ctx.corpus_doc.warm_up.side_effect = ConnectionError("es is down")
+
+    ContextManager.warm_up(ctx)
+
+    for store in [ctx.memas_metadata, ctx.corpus_metadata, ctx.ingestion_jobs, ctx.corpus_doc, ctx.corpus_vec]:
+        store.warm_up.assert_called_once()
+    assert [len(set(x.args[0])) for x in ctx.corpus_vec.encoder.embed_multiple.call_args_list] == [1, 4]
+    ctx.corpus_vec.search_corpora.assert_called_once()
+    assert ctx.memas_metadata.get_query_corpora.call_args_list == [mock.call("hot1"), mock.call("hot2")]
+    assert ctx.ready.is_set()
+
+
+def test_warm_up_skips_the_embedding_cache():
+    ctx = make_ctx(Role.INGESTION)
+    ctx.corpus_vec.encoder = mock.Mock(spec=PersistentCachingTextEncoder)
+    ctx.corpus_vec.encoder.encoder = mock.Mock()
+
+    ContextManager.warm_up(ctx)
+
+    # The wrapped encoder sees every batch size, and the cache isn't opened
+    assert [len(x.args[0]) for x in ctx.corpus_vec.encoder.encoder.embed_multiple.call_args_list] == [1, 4]
+    ctx.corpus_vec.encoder.embed_multiple.assert_not_called()
+
+
+def test_warm_up_maintenance():
+    ctx = make_ctx(Role.MAINTENANCE)
+
+    ContextManager.warm_up(ctx)
+
+    # Maintenance workers never load the encoder, nor serve recalls
+    ctx.corpus_vec.encoder.embed_multiple.assert_not_called()
+    ctx.memas_metadata.get_query_corpora.assert_not_called()
+    assert ctx.ready.is_set()